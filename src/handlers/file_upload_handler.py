@@ -5,13 +5,14 @@ from fastapi import HTTPException, UploadFile, Request
 
 from src.models.client_config import ClientConfig
 from src.models.file_upload import FileUpload
-from src.services import audit_service, s3_service
+from src.services import async_storage_service, upload_pipeline_service
 from src.services.checksum_service import get_file_checksum
 from src.utils.operation_types import OperationType
 from src.utils.request_types import RequestType
+from src.validation.client_configured_validator import get_validator_chain
 from src.validation.header_validator import run_header_validators
-from src.validation.mandatory_file_validator import run_mandatory_validators
-from src.validation import client_configured_validator
+from src.validation.file_validator import ValidatorCost
+from src.validation.validation_scheduler import run_file_validators
 
 
 logger = structlog.get_logger()
@@ -23,31 +24,50 @@ async def handle_file_upload_logic(
     client_config: ClientConfig,
     request_type: RequestType,
     body: Optional[FileUpload] = None,
-    filename_position: int = 0
+    filename_position: int = 0,
+    existence_hint: Optional[bool] = None
 ) -> Tuple[Dict, bool]:
+    """
+    Checks and saves a single uploaded file, then records the outcome in the audit table.
+
+    If whether the file already exists is known, e.g. from a listing made for a bulk upload, it can be given as
+    existence_hint to save checking the bucket again.
+    """
     if body is None:
         body = FileUpload()
 
+    # In pipeline mode the virus scan and checksum happen as the file is saved, reading it only once
+    pipeline_mode = upload_pipeline_service.pipeline_mode_enabled()
+
     # Initial file checks - virus scan, mandatory validators, client config validators ...
-    checksum, error_status = await run_initial_file_checks(request, file, client_config)
+    checksum, error_status = await run_initial_file_checks(request, file, client_config,
+                                                           scan_and_checksum=not pipeline_mode)
 
     metadata = body.model_dump() or {}
     folder_prefix = metadata.pop("folder", "")
-    full_filename = os.path.join(folder_prefix, file.filename) if folder_prefix else file.filename
+    full_filename = get_full_filename(file.filename, folder_prefix)
 
     file_existed = False
 
     # Check file not already in S3 when POST request
     if not error_status:
-        file_existed = s3_service.file_exists(client_config, full_filename)
+        if existence_hint is None:
+            file_existed = await async_storage_service.file_exists(client_config, full_filename)
+        else:
+            file_existed = existence_hint
         if file_existed and request_type == RequestType.POST:
             error_status = (409, f"File {full_filename} already exists and cannot be overwritten "
                             "via the /save_file endpoint. Use PUT endpoint /save_or_update_file to overwrite.")
 
+    # Scan and save file to bucket in a single pass
+    if not error_status and pipeline_mode:
+        checksum, error_status = await upload_pipeline_service.scan_and_save(client_config, file,
+                                                                             full_filename, metadata)
+
     # Save file to bucket
-    if not error_status:
+    if not error_status and not pipeline_mode:
         try:
-            success = s3_service.save(client_config, file.file, full_filename, checksum, metadata)
+            success = await async_storage_service.save(client_config, file.file, full_filename, checksum, metadata)
             if not success:
                 # This is retained for consistency but might never happen, with Exception handling
                 # below actually reporting the error when save fails
@@ -58,13 +78,13 @@ async def handle_file_upload_logic(
 
     # Update audit table
     try:
-        audit_service.add_record(request=request,
-                                 filename_position=filename_position,
-                                 service_id=client_config.azure_display_name,
-                                 file_id=str(full_filename),
-                                 operation_type=OperationType.UPDATE if file_existed
-                                 else OperationType.CREATE,
-                                 error_status=error_status)
+        await async_storage_service.add_audit_record(request=request,
+                                                     filename_position=filename_position,
+                                                     service_id=client_config.azure_display_name,
+                                                     file_id=str(full_filename),
+                                                     operation_type=OperationType.UPDATE if file_existed
+                                                     else OperationType.CREATE,
+                                                     error_status=error_status)
     except Exception as e:
         logger.error(f"Error writing to audit table {str(e)}")
         # Potential issue - if there was an Exception on writing to S3, followed by an exception
@@ -81,32 +101,53 @@ async def handle_file_upload_logic(
     }, file_existed
 
 
+def get_full_filename(filename: str, folder: str | None) -> str:
+    "Returns the bucket key for a file, which is its name within the optional folder"
+    return os.path.join(folder, filename) if folder else filename
+
+
 async def run_initial_file_checks(request: Request,
                                   file: UploadFile,
-                                  client_config: ClientConfig) -> tuple[str, tuple[str | list]]:
+                                  client_config: ClientConfig,
+                                  scan_and_checksum: bool = True) -> tuple[str, tuple[str | list]]:
+    """
+    Runs the checks needed before a file can be saved. When scan_and_checksum is False, the virus scan and
+    checksum are left for the caller to carry out, and the returned checksum is empty. Every other validator
+    still runs.
+    """
     error_status = ()
+    validator_chain = get_validator_chain(client_config.file_validators)
 
     # Request header validation
     header_status_code, header_message = run_header_validators(request.headers)
     if header_status_code != 200:
         error_status = (header_status_code, header_message)
 
-    # Mandatory validation (includes av scan) - must run before client-specific validation
+    # Mandatory and client-specific validation, cheapest first, except for the av scan
     if not error_status:
-        status_code, detail = await run_mandatory_validators(file)
+        status_code, detail = await run_file_validators(file, validator_chain,
+                                                        costs=(ValidatorCost.METADATA, ValidatorCost.CONTENT))
         if status_code != 200:
             error_status = (status_code, detail)
 
-    # Client-specific validation
-    if not error_status:
-        status_code, detail = await client_configured_validator.validate_file(file, client_config.file_validators)
-        if status_code != 200:
-            error_status = (status_code, detail)
-
-    # Get checksum from file
+    # Get checksum from file before the av scan, so the scan can reuse a verdict for identical content. Both are
+    # left until last, so a file rejected by the other checks is neither read for its checksum nor scanned
     checksum = ""
-    if not error_status:
+    if not error_status and scan_and_checksum:
         checksum, error_message = get_file_checksum(file)
         if error_message:
             error_status = (500, error_message)
+
+    if not error_status and scan_and_checksum:
+        status_code, detail = await run_file_validators(file, validator_chain,
+                                                        costs=(ValidatorCost.EXTERNAL_SERVICE,), checksum=checksum)
+        if status_code != 200:
+            error_status = (status_code, detail)
+    elif not error_status:
+        # Any other validators that call an external service still run, only the av scan is left to the caller
+        status_code, detail = await run_file_validators(file, validator_chain, include_virus_check=False,
+                                                        costs=(ValidatorCost.EXTERNAL_SERVICE,))
+        if status_code != 200:
+            error_status = (status_code, detail)
+
     return checksum, error_status
@@ -1,5 +1,7 @@
+import asyncio
 import logging.config
 import os
+from contextlib import asynccontextmanager
 from typing import Any
 
 import sentry_sdk
@@ -15,12 +17,16 @@ from fastapi_authz import CasbinMiddleware
 
 from src.config import logging_config
 from src.middleware.auth import BearerTokenAuthBackend, BearerTokenMiddleware
+from src.services import audit_service, warm_up_service
 from src.services.authz_service import AuthzService
+from src.validation import suspicious_content_validator
 
 from src.routers.delete_files import router as delete_files
+from src.routers.download_file import router as download_file
 from src.routers.health import router as health
 from src.routers.ping import router as ping
 from src.routers.retrieve_file import router as retrieve_file
+from src.routers.retrieve_files import router as retrieve_files
 from src.routers.root import router as root
 from src.routers.save_file import router as save_file
 from src.routers.save_or_update_file import router as save_or_update_file
@@ -31,6 +37,8 @@ from src.routers.bulk_upload import router as bulk_upload
 from src.routers.scan_for_suspicious_content import router as scan_for_suspicious_content
 from src.routers.file_details import router as get_file_details
 
+logger = structlog.get_logger()
+
 
 def add_correlation(
         logger: logging.Logger, method_name: str, event_dict: dict[str, Any]) \
@@ -61,9 +69,28 @@ if sentry_dsn:
         ]
     )
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Start taking requests once warm-up finishes, or after a timeout with warm-up carrying on in the background.
+    # Either way the service does not report itself ready until warm-up has finished.
+    warm_up = asyncio.create_task(warm_up_service.warm_up())
+    done, _ = await asyncio.wait({warm_up}, timeout=float(os.getenv('WARM_UP_TIMEOUT', '30')))
+    if not done:
+        logger.warning("Warm-up still running, starting to take requests")
+    yield
+    if not warm_up.done():
+        warm_up.cancel()
+    # Write any audit records still queued for background writing before the process exits
+    await asyncio.to_thread(audit_service.flush_pending_records,
+                            float(os.getenv('AUDIT_SHUTDOWN_FLUSH_TIMEOUT', '30')))
+    suspicious_content_validator.shutdown_executor()
+
+
 app = FastAPI(
     title='LAA Secure Document Storage API',
     version=api_version,
+    lifespan=lifespan,
 )
 
 structlog.configure(
@@ -88,6 +115,8 @@ app.add_middleware(BearerTokenMiddleware, backend=BearerTokenAuthBackend())
 app.add_middleware(CorrelationIdMiddleware)
 
 app.include_router(retrieve_file)
+app.include_router(retrieve_files)
+app.include_router(download_file)
 app.include_router(save_or_update_file)
 app.include_router(save_file)
 app.include_router(bulk_upload)
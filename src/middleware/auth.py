@@ -82,15 +82,26 @@ class BearerTokenAuthBackend(AuthenticationBackend):
         return auth_creds, user
 
 
+def http_timeout() -> float:
+    "Seconds to wait for the identity provider when fetching the OpenID configuration and signing keys"
+    return float(os.getenv('AUTH_HTTP_TIMEOUT', '10'))
+
+
 @cached(TTLCache(maxsize=100, ttl=3600))
 def fetch_oidc_config(tenant_id):
     url = f"https://login.microsoftonline.com/{tenant_id}/v2.0/.well-known/openid-configuration"
-    return requests.get(url).json()
+    return requests.get(url, timeout=http_timeout()).json()
 
 
 @cached(TTLCache(maxsize=100, ttl=3600))
 def fetch_jwks(jwks_uri):
-    return requests.get(jwks_uri).json()
+    return requests.get(jwks_uri, timeout=http_timeout()).json()
+
+
+def prefetch_signing_keys():
+    "Fetches and caches the OpenID configuration and signing keys used to validate tokens"
+    oidc_config = fetch_oidc_config(os.getenv('TENANT_ID'))
+    fetch_jwks(oidc_config['jwks_uri'])
 
 
 def validate_token(token: str, aud: str, tenant_id: str) -> dict:
@@ -0,0 +1,5 @@
+class InvalidRangeException(Exception):
+    def __init__(self, message, filename):
+        self.message = message
+        self.filename = filename
+        super().__init__(message)
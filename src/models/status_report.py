@@ -23,9 +23,13 @@ class CategoryObservation(BaseModel):
 class ServiceObservations(BaseModel):
     """
     The set of checks a service makes to verify its overall status.
+
+    Details are optional figures a service reports for information, such as per-backend load; they do not affect
+    whether the service has failures.
     """
     label: str = 'service'
     observations: list[CategoryObservation] = Field(default_factory=list)
+    details: dict[str, dict] = Field(default_factory=dict)
 
     def add_check(self, phenomenon: str) -> CategoryObservation:
         """
@@ -1,3 +1,6 @@
+import asyncio
+import os
+
 import structlog
 from fastapi import APIRouter, Depends, UploadFile, Request, HTTPException
 
@@ -6,8 +9,9 @@ from src.validation.json_validator import validate_optional_body_json
 from src.models.client_config import ClientConfig
 from src.models.file_upload import FileUpload, BulkUploadFileResponse
 from src.utils.request_types import RequestType
-from src.handlers.file_upload_handler import handle_file_upload_logic
-from src.validation.client_configured_validator import validate_file_collection
+from src.handlers.file_upload_handler import get_full_filename, handle_file_upload_logic
+from src.services import async_storage_service
+from src.validation.client_configured_validator import get_validator_chain, validate_file_collection
 
 router = APIRouter()
 logger = structlog.get_logger()
@@ -25,6 +29,9 @@ async def bulk_upload(
     Process a list of upload files. If the same filename is included more than once, it will be
     updated when subsequent instances are reached.
 
+    Files with different names are processed concurrently, up to BULK_UPLOAD_CONCURRENCY at a time
+    for each request.
+
     The response status code just indicates success/failure in the ability to process the supplied
     files, not the sucess of each file operation, and should always be 200 unless the submitted
     file details are invalid , or optional client-configured file collection validator failure,
@@ -73,7 +80,8 @@ async def bulk_upload(
     # Not included validation for empty files list because Fast API gives 422 error automatically
 
     # File-collection validation - raise HTTP Exception on failure
-    validation_outcome = await validate_file_collection(files, client_config.file_collection_validators)
+    validation_outcome = await validate_file_collection(files,
+                                                        get_validator_chain(client_config.file_collection_validators))
     if validation_outcome != (200, ""):
         raise HTTPException(status_code=validation_outcome[0], detail=validation_outcome[1])
 
@@ -85,35 +93,92 @@ async def bulk_upload(
     if len(results) < len(files):
         logger.warning("Duplicate filnames present in the bulk load. Files with same name will be updated.")
 
-    for fi, file in enumerate(files):
-        logger.info(f"Attempting to upload file number {fi+1}: {file.filename}")
-        results[file.filename].positions.append(fi)
-
-        try:
-            # Upload file
-            file_result, file_existed = await handle_file_upload_logic(
-                request=request,
-                file=file,
-                body=body,
-                client_config=client_config,
-                request_type=RequestType.PUT,
-                filename_position=fi)
-
-            outcome = {"status_code": 200, "detail": "updated"} if file_existed \
-                else {"status_code": 201, "detail": "saved"}
-
-            results[file.filename].checksum = file_result.get("checksum")
-
-        except HTTPException as httpe:
-            msg = f"HTTP error uploading {file.filename}: {httpe.__class__.__name__} - {httpe}"
-            logger.exception(msg)
-            outcome = {"status_code": httpe.status_code, "detail": httpe.detail}
-
-        except Exception as e:
-            msg = f"Unexpected error uploading {file.filename}: {e.__class__.__name__} - {e}"
-            logger.exception(msg)
-            outcome = {"status_code": 500, "detail": str(e)}
-
+    # List the target folder once to find which files already exist, rather than checking each file in turn
+    full_filenames = [get_full_filename(f.filename, body.folder if body else None) for f in files]
+    try:
+        existing_files = await async_storage_service.find_existing_files(client_config, full_filenames)
+    except Exception as e:
+        logger.warning(f"Could not list existing files, checking each file instead: {e.__class__.__name__} {e}")
+        existing_files = None
+
+    # Files with different names are uploaded concurrently, up to the configured limit, while a file sharing its
+    # name with an earlier one waits for that upload, so later positions still apply after earlier ones
+    concurrency_limit = asyncio.Semaphore(int(os.getenv('BULK_UPLOAD_CONCURRENCY', '8')))
+
+    async def upload_after(previous_upload: asyncio.Task | None, file: UploadFile, fi: int):
+        if previous_upload is not None:
+            await previous_upload
+        existence_hint = None if existing_files is None else full_filenames[fi] in existing_files
+        async with concurrency_limit:
+            outcome, checksum = await upload_single_file(request, file, fi, body, client_config, existence_hint)
+        if existing_files is not None and outcome["status_code"] in (200, 201):
+            existing_files.add(full_filenames[fi])
+        return outcome, checksum
+
+    # Audit records for all the files are written together once the uploads are done
+    upload_results = None
+    try:
+        async with async_storage_service.buffered_audit_records():
+            uploads = []
+            latest_uploads = {}
+            for fi, file in enumerate(files):
+                results[file.filename].positions.append(fi)
+                latest_uploads[file.filename] = asyncio.create_task(
+                    upload_after(latest_uploads.get(file.filename), file, fi))
+                uploads.append(latest_uploads[file.filename])
+            upload_results = await asyncio.gather(*uploads)
+    except Exception as e:
+        if upload_results is None:
+            # Not an audit failure, as the uploads did not finish
+            raise
+        logger.error(f"Error writing to audit table {str(e)}")
+        # As when a single upload cannot be audited, each file's outcome is an error
+        upload_results = [({"status_code": 500, "detail": "An error occurred while recording the upload"}, None)
+                          for _ in upload_results]
+
+    for file, (outcome, checksum) in zip(files, upload_results):
+        if checksum is not None:
+            results[file.filename].checksum = checksum
         results[file.filename].outcomes.append(outcome)
 
     return results
+
+
+async def upload_single_file(request: Request,
+                             file: UploadFile,
+                             fi: int,
+                             body: FileUpload,
+                             client_config: ClientConfig,
+                             existence_hint: bool | None = None) -> tuple[dict, str | None]:
+    """
+    Uploads one file of the bulk load, returning its outcome and, if the upload succeeded, its checksum.
+    """
+    logger.info(f"Attempting to upload file number {fi+1}: {file.filename}")
+    checksum = None
+    try:
+        # Upload file
+        file_result, file_existed = await handle_file_upload_logic(
+            request=request,
+            file=file,
+            body=body,
+            client_config=client_config,
+            request_type=RequestType.PUT,
+            filename_position=fi,
+            existence_hint=existence_hint)
+
+        outcome = {"status_code": 200, "detail": "updated"} if file_existed \
+            else {"status_code": 201, "detail": "saved"}
+
+        checksum = file_result.get("checksum")
+
+    except HTTPException as httpe:
+        msg = f"HTTP error uploading {file.filename}: {httpe.__class__.__name__} - {httpe}"
+        logger.exception(msg)
+        outcome = {"status_code": httpe.status_code, "detail": httpe.detail}
+
+    except Exception as e:
+        msg = f"Unexpected error uploading {file.filename}: {e.__class__.__name__} - {e}"
+        logger.exception(msg)
+        outcome = {"status_code": 500, "detail": str(e)}
+
+    return outcome, checksum
@@ -1,3 +1,4 @@
+import asyncio
 from typing import List
 
 import structlog
@@ -7,7 +8,8 @@ from starlette.responses import JSONResponse
 
 from src.middleware.client_config_middleware import client_config_middleware
 from src.models.client_config import ClientConfig
-from src.services import audit_service, authz_service, s3_service
+from src.services import async_storage_service, authz_service
+from src.services.s3_service import S3Service
 from src.utils.operation_types import OperationType
 
 router = APIRouter()
@@ -41,20 +43,23 @@ async def delete_files(
     logger.info(f'Deleting {len(file_keys)} file(s)')
 
     outcomes = {}
-    for fi, file_key in enumerate(file_keys):
-        error_status = delete_all_file_versions(client_config, file_key)
-        outcomes[file_key] = error_status[0] if error_status else 204
-        # Update audit table (could later extend to record delete of each version)
-        try:
-            audit_service.add_record(request=request,
-                                     filename_position=fi,
-                                     service_id=client_config.azure_display_name,
-                                     file_id=str(file_key),
-                                     operation_type=OperationType.DELETE,
-                                     error_status=error_status)
-        except Exception as e:
-            logger.error(f"Error writing to audit table {str(e)}")
-            error_status = (500, "An error occurred while deleting the file")
+    # Audit records for all the files are written together once the deletes are done
+    try:
+        async with async_storage_service.buffered_audit_records():
+            error_statuses = await delete_all_file_versions(client_config, file_keys)
+            for fi, file_key in enumerate(file_keys):
+                error_status = error_statuses[file_key]
+                outcomes[file_key] = error_status[0] if error_status else 204
+                # Update audit table (could later extend to record delete of each version)
+                await async_storage_service.add_audit_record(request=request,
+                                                             filename_position=fi,
+                                                             service_id=client_config.azure_display_name,
+                                                             file_id=str(file_key),
+                                                             operation_type=OperationType.DELETE,
+                                                             error_status=error_status)
+    except Exception as e:
+        logger.error(f"Error writing to audit table {str(e)}")
+        error_status = (500, "An error occurred while deleting the file")
 
     # Consistent with previous behaviour and concerns receiving no filenames
     if error_status == (400, "File key is missing"):
@@ -63,39 +68,66 @@ async def delete_files(
     return JSONResponse(outcomes, status_code=200)  # OK
 
 
-def delete_all_file_versions(client_config:  ClientConfig, file_key: str) -> tuple[int, str]:
-    error_status = ()
-    # List all versions of the object
+async def delete_all_file_versions(client_config: ClientConfig, file_keys: List[str]) -> dict[str, tuple]:
+    """
+    Deletes every version of each of the given files, returning the error status for each file, which is empty if
+    all of its versions were deleted.
+
+    The versions of all the files are listed concurrently, then deleted together in DeleteObjects requests of up to
+    1000 versions each rather than one request per version.
+    """
+    unique_keys = list(dict.fromkeys(file_keys))
+    listings = await asyncio.gather(*(list_versions_to_delete(client_config, file_key) for file_key in unique_keys))
+
+    error_statuses = {}
+    versions = []
+    for file_key, (error_status, version_ids) in zip(unique_keys, listings):
+        error_statuses[file_key] = error_status
+        versions.extend((file_key, version_id) for version_id in version_ids)
+
+    batch_size = S3Service.delete_objects_max_keys
+    batches = [versions[i:i + batch_size] for i in range(0, len(versions), batch_size)]
+    results = await asyncio.gather(*(async_storage_service.delete_file_versions(client_config, batch)
+                                     for batch in batches),
+                                   return_exceptions=True)
+
+    # A file is only deleted if none of its versions failed
+    for batch, result in zip(batches, results):
+        if isinstance(result, Exception):
+            logger.error(f"Failed to delete {len(batch)} version(s): {result.__class__.__name__} - {str(result)}")
+            failures = [(file_key, str(result)) for file_key, _ in batch]
+        else:
+            failures = [(error.get("Key"), f"{error.get('Code')} - {error.get('Message')}") for error in result]
+        for file_key, message in failures:
+            if error_statuses.get(file_key) == ():
+                error_statuses[file_key] = (500, message)
+
+    return error_statuses
+
+
+async def list_versions_to_delete(client_config: ClientConfig, file_key: str) -> tuple[tuple, list[str]]:
+    """
+    Returns the error status and the version IDs to delete for a file. No versions are deleted for a file with an
+    error status.
+    """
     try:
-        # List all versions of the object
-        versions = s3_service.list_file_versions(client_config, file_key)
+        versions = await async_storage_service.list_file_versions(client_config, file_key)
     except FileNotFoundError:
         logger.error(f"File to be deleted {file_key} not found for client {client_config.azure_client_id}")
-        error_status = (404, "")  # NOT FOUND
+        return (404, ""), []  # NOT FOUND
     except Exception as e:
         msg = f"Unexpected error deleting {file_key}: {e.__class__.__name__} - {str(e)}"
         logger.exception(msg)
-        error_status = (500, "")  # SERVER ERROR
-        versions = []
+        return (500, ""), []  # SERVER ERROR
 
-    # Want to avoid overwriting previous error status - redundancy with 404 above?
-    if len(versions) < 1 and not error_status:
+    if len(versions) < 1:
         logger.warning(f"No versions found for {file_key}")
-        error_status = (404, f"No versions found for {file_key}")
-        return error_status
-
-    # Delete each version
-    for version in versions:
-        version_id = version.get("VersionId")
-        if not version_id:
-            logger.error(f"Missing VersionId for file {file_key}")
-            error_status = (500, f"Missing VersionId for file {file_key}")
-            break
-        try:
-            logger.info(f"Attempting to delete version with versionId {version_id}")
-            s3_service.delete_file_version(client_config, file_key, version_id)
-            logger.info(f"Deleted version {version_id} of file {file_key}")
-        except Exception as e:
-            logger.error(f"Failed to delete version {version_id} of {file_key}: {e}")
-            error_status = (500, str(e))
-    return error_status
+        return (404, f"No versions found for {file_key}"), []
+
+    version_ids = [version.get("VersionId") for version in versions]
+    if not all(version_ids):
+        logger.error(f"Missing VersionId for file {file_key}")
+        return (500, f"Missing VersionId for file {file_key}"), []
+
+    logger.info(f"Attempting to delete {len(version_ids)} version(s) of file {file_key}")
+    return (), version_ids
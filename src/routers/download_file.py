@@ -0,0 +1,95 @@
+import os
+import re
+from typing import AsyncIterator
+
+import structlog
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from fastapi.params import Query
+from starlette.responses import Response, StreamingResponse
+
+from src.middleware.client_config_middleware import client_config_middleware
+from src.models.client_config import ClientConfig
+from src.models.execeptions.file_not_found import FileNotFoundException
+from src.models.execeptions.invalid_range import InvalidRangeException
+from src.services import async_storage_service
+from src.utils.operation_types import OperationType
+
+router = APIRouter()
+logger = structlog.get_logger()
+
+download_chunk_size = int(os.getenv('DOWNLOAD_CHUNK_SIZE', str(1024 * 1024)))
+# S3 only serves a single range, so other forms of the Range header are ignored and the whole file is sent
+single_byte_range = re.compile(r'^bytes=(\d+-\d*|-\d+)$')
+
+
+@router.get('/download_file')
+async def download_file(
+            request: Request,
+            file_key: str = Query(None, min_length=1),
+            range_header: str | None = Header(None, alias='Range'),
+            if_none_match: str | None = Header(None),
+            client_config: ClientConfig = Depends(client_config_middleware),
+        ):
+    """
+    Downloads the content of the specified file through the API, for clients that cannot reach S3 links directly.
+
+    Supports a single `Range` of bytes, returning 206 Partial Content with only those bytes, and `If-None-Match`,
+    returning 304 Not Modified if the file's `ETag` matches.
+    """
+    error_status = ()
+    response = None
+    if not file_key:
+        error_status = (400, "File key is missing")
+
+    byte_range = range_header if range_header and single_byte_range.match(range_header.strip()) else None
+
+    if not error_status:
+        try:
+            response = await async_storage_service.open_file(client_config, file_key, byte_range, if_none_match)
+        except FileNotFoundException as e:
+            logger.error(f"File {file_key} not found for client {client_config.azure_client_id}")
+            error_status = (404, str(e))
+        except InvalidRangeException as e:
+            logger.warning(f"Unsatisfiable range {byte_range} requested for {file_key}")
+            error_status = (416, str(e))
+        except Exception as e:
+            logger.error(f"Error downloading file: {e.__class__.__name__} {str(e)}")
+            # Generic message to avoid exposing technical details externally
+            error_status = (500, "An error occurred while downloading the file")
+    try:
+        await async_storage_service.add_audit_record(request=request,
+                                                     filename_position=0,
+                                                     service_id=client_config.azure_display_name,
+                                                     file_id=file_key,
+                                                     operation_type=OperationType.READ,
+                                                     error_status=error_status)
+    except Exception as e:
+        logger.error(f"Error writing to audit table {str(e)}")
+        error_status = (500, "An error occurred while downloading the file")
+
+    if error_status:
+        if response is not None and 'Body' in response:
+            response['Body'].close()
+        raise HTTPException(status_code=error_status[0], detail=error_status[1])
+
+    status_code = response['ResponseMetadata']['HTTPStatusCode']
+    headers = {'ETag': response['ETag'], 'Accept-Ranges': 'bytes'}
+    if status_code == 304:
+        return Response(status_code=304, headers=headers)
+
+    headers['Content-Length'] = str(response['ContentLength'])
+    if 'ContentRange' in response:
+        headers['Content-Range'] = response['ContentRange']
+    return StreamingResponse(stream_body(response['Body']),
+                             status_code=status_code,
+                             headers=headers,
+                             media_type=response.get('ContentType', 'application/octet-stream'))
+
+
+async def stream_body(body) -> AsyncIterator[bytes]:
+    "Yields an S3 object body in chunks, so only one chunk is held in memory at a time"
+    try:
+        while chunk := await async_storage_service.run_blocking(body.read, download_chunk_size):
+            yield chunk
+    finally:
+        body.close()
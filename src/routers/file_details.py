@@ -1,3 +1,5 @@
+from typing import Optional
+
 import structlog
 from fastapi import APIRouter, HTTPException, Depends, Request
 from fastapi.params import Query
@@ -5,8 +7,7 @@ from fastapi.params import Query
 from src.middleware.client_config_middleware import client_config_middleware
 from src.models.client_config import ClientConfig
 
-from src.services.s3_service import list_file_versions
-from src.services import audit_service
+from src.services import async_storage_service
 from src.utils.operation_types import OperationType
 
 
@@ -18,6 +19,7 @@ logger = structlog.get_logger()
 async def get_file_details(
     request: Request,
     file_key: str = Query(None, min_length=1),
+    max_versions: Optional[int] = Query(None, ge=1),
     client_config: ClientConfig = Depends(client_config_middleware),
 ):
     """
@@ -27,22 +29,24 @@ async def get_file_details(
     ```
     {"version_history":[{"Key":"README.md","VersionId":"AZ2.eOOs_UrTIR36qVsTPRm7lJupRZTI","IsLatest":true,"Size":320,"LastModified":"2026-04-24T13:39:38+00:00"},{"Key":"README.md","VersionId":"AZ2.eOOinemjh3PiPMRoTQzUpoxcqMKo","IsLatest":false,"Size":260,"LastModified":"2026-04-23T07:51:26+00:00"}]}
     ```
+
+    If `max_versions` is given, only that many of the most recent versions are returned.
     """
     error_status = ()
     if not file_key:
         error_status = (400, "File key is missing")
 
     if not error_status:
-        file_versions = list_file_versions(client_config, file_key)
+        file_versions = await async_storage_service.list_file_versions(client_config, file_key, max_versions)
         if file_versions == []:
             error_status = (404, f"No details found for file: {file_key}")
 
-    audit_service.add_record(request=request,
-                             filename_position=0,
-                             service_id=client_config.azure_display_name,
-                             file_id=file_key,
-                             operation_type=OperationType.INFO,
-                             error_status=error_status)
+    await async_storage_service.add_audit_record(request=request,
+                                                 filename_position=0,
+                                                 service_id=client_config.azure_display_name,
+                                                 file_id=file_key,
+                                                 operation_type=OperationType.INFO,
+                                                 error_status=error_status)
 
     if error_status:
         raise HTTPException(status_code=error_status[0], detail=error_status[1])
@@ -5,7 +5,7 @@ from fastapi.params import Query
 from src.middleware.client_config_middleware import client_config_middleware
 from src.models.client_config import ClientConfig
 from src.models.execeptions.file_not_found import FileNotFoundException
-from src.services import audit_service, s3_service
+from src.services import async_storage_service
 from src.utils.operation_types import OperationType
 
 router = APIRouter()
@@ -31,7 +31,7 @@ async def retrieve_file(
     if not error_status:
         try:
             logger.info("calling retrieve file operation")
-            response = s3_service.retrieve_file_url(client_config, file_key)
+            response = await async_storage_service.retrieve_file_url(client_config, file_key)
             if response is None:
                 logger.error("Error whilst retrieving file from S3, got None response")
                 raise FileNotFoundException(
@@ -46,12 +46,12 @@ async def retrieve_file(
             # Generic message to avoid exposing technical details externally
             error_status = (500, "An error occurred while retrieving the file")
     try:
-        audit_service.add_record(request=request,
-                                 filename_position=0,
-                                 service_id=client_config.azure_display_name,
-                                 file_id=file_key,
-                                 operation_type=OperationType.READ,
-                                 error_status=error_status)
+        await async_storage_service.add_audit_record(request=request,
+                                                     filename_position=0,
+                                                     service_id=client_config.azure_display_name,
+                                                     file_id=file_key,
+                                                     operation_type=OperationType.READ,
+                                                     error_status=error_status)
     except Exception as e:
         logger.error(f"Error writing to audit table {str(e)}")
         # Potential issue - if there was a FileNotFoundException followed by an exception
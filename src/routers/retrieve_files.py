@@ -0,0 +1,86 @@
+import asyncio
+from typing import List
+
+import structlog
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.params import Query
+
+from src.middleware.client_config_middleware import client_config_middleware
+from src.models.client_config import ClientConfig
+from src.models.execeptions.file_not_found import FileNotFoundException
+from src.services import async_storage_service
+from src.utils.operation_types import OperationType
+
+router = APIRouter()
+logger = structlog.get_logger()
+
+
+@router.get('/get_files')
+async def retrieve_files(
+    request: Request,
+    file_keys: List[str] = Query(default_factory=list),
+    client_config: ClientConfig = Depends(client_config_middleware)
+):
+    """
+    Gets short-lifetime links to download each of the specified files, saving a separate `/get_file` request for
+    each one.
+
+    If we don't have any file_keys, return a 400 response.
+
+    Otherwise always return a 200 OK response, with the body containing each of the specified files and either its
+    link or the error that prevented one being made:
+    * `{"status_code": 200, "fileURL": "--link to resource--"}` if the file was found
+    * `{"status_code": 404, "detail": "..."}` if the file was not found
+    * `{"status_code": 500, "detail": "..."}` if an internal error occurred, including for every file when the
+      access could not be recorded in the audit table
+    """
+    if len(file_keys) == 0:
+        raise HTTPException(status_code=400, detail="File key is missing")
+
+    # Log total number of files requested to help trace large requests
+    logger.info(f'Retrieving {len(file_keys)} file(s)')
+
+    unique_keys = list(dict.fromkeys(file_keys))
+    results = await asyncio.gather(*(get_file_url(client_config, file_key) for file_key in unique_keys))
+    results_by_key = dict(zip(unique_keys, results))
+
+    # Audit records for all the files are written together once the links are made
+    try:
+        async with async_storage_service.buffered_audit_records():
+            for fi, file_key in enumerate(file_keys):
+                await async_storage_service.add_audit_record(request=request,
+                                                             filename_position=fi,
+                                                             service_id=client_config.azure_display_name,
+                                                             file_id=file_key,
+                                                             operation_type=OperationType.READ,
+                                                             error_status=results_by_key[file_key][1])
+    except Exception as e:
+        logger.error(f"Error writing to audit table {str(e)}")
+        # As with /get_file, no link is given out unless its access is audited
+        results_by_key = {file_key: (None, (500, "An error occurred while retrieving the file"))
+                          for file_key in results_by_key}
+
+    outcomes = {}
+    for file_key, (url, error_status) in results_by_key.items():
+        if error_status:
+            outcomes[file_key] = {'status_code': error_status[0], 'detail': error_status[1]}
+        else:
+            outcomes[file_key] = {'status_code': 200, 'fileURL': url}
+    return outcomes
+
+
+async def get_file_url(client_config: ClientConfig, file_key: str) -> tuple[str | None, tuple]:
+    "Returns the link to download a file, or the error status explaining why there is none"
+    try:
+        url = await async_storage_service.retrieve_file_url(client_config, file_key)
+        if url is None:
+            logger.error("Error whilst retrieving file from S3, got None response")
+            raise FileNotFoundException(f"File not found for client {client_config.azure_client_id}", file_key)
+        return url, ()
+    except FileNotFoundException as e:
+        logger.error(f"File {file_key} not found for client {client_config.azure_client_id}")
+        return None, (404, str(e))
+    except Exception as e:
+        logger.error(f"Error retrieving file {file_key}: {e.__class__.__name__} {str(e)}")
+        # Generic message to avoid exposing technical details externally
+        return None, (500, "An error occurred while retrieving the file")
@@ -16,6 +16,7 @@ async def scan_for_suspicious_content(
             file: UploadFile = File(...),
             delimiter: str = ",",
             scan_types: list[str] | None = None,
+            parse_xml: bool = False,
             client_config: ClientConfig = Depends(client_config_middleware),
         ):
     """
@@ -31,6 +32,9 @@ async def scan_for_suspicious_content(
     expected to contain tags. Alternatively it is possible to manually specify by using the `scan_types`
     optional parameter, e.g. `"scan_types": ["html_tag_check", "excel_char_check"]`
 
+    With `parse_xml` set, an XML file is parsed and only its text and attribute values are scanned, so all four
+    types of scan are run by default. A problem is reported with the path of the element or attribute it is in.
+
     * 200 - No suspected malicious content was detected
     * 400 - Suspected malicious content was detected
     """
@@ -41,7 +45,8 @@ async def scan_for_suspicious_content(
         mode_text = "(XML Scan) "
 
     validator = suspicious_content_validator.ScanForSuspiciousContent()
-    status_code, message = validator.validate(file, delimiter, xml_mode=xml_mode, scan_types=scan_types)
+    status_code, message = await validator.validate(file, delimiter, xml_mode=xml_mode, scan_types=scan_types,
+                                                    parse_xml=parse_xml)
     if status_code != 200:
         logger.info((f"Scan attempted for {file.filename}:"
                      f" Possible malicious content detected or scan failed. {mode_text}{message}"))
@@ -0,0 +1,118 @@
+import asyncio
+import contextlib
+import contextvars
+import functools
+import os
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Any, AsyncIterator, Callable, Iterable
+
+import structlog
+from fastapi import Request
+
+from src.models.audit_record import AuditRecord
+from src.models.client_config import ClientConfig
+from src.services import audit_service, s3_service
+from src.utils.operation_types import OperationType
+
+"""
+Async facade over the blocking boto3 calls made by s3_service and audit_service.
+
+Calls run on a dedicated, sized thread pool so a slow S3 or DynamoDB round trip does not stall the event loop,
+letting one worker overlap many in-flight storage calls. The number of calls queued or running is capped per event
+loop, so callers wait for a slot rather than building an unbounded backlog on the pool.
+"""
+
+logger = structlog.get_logger()
+
+_max_workers = int(os.getenv('STORAGE_MAX_WORKERS', '64'))
+_max_pending = int(os.getenv('STORAGE_MAX_PENDING', '512'))
+_executor = ThreadPoolExecutor(max_workers=_max_workers, thread_name_prefix='storage')
+_pending_limits: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def _get_pending_limit() -> asyncio.Semaphore:
+    # asyncio primitives belong to one event loop, so each loop gets its own limit
+    loop = asyncio.get_running_loop()
+    if loop not in _pending_limits:
+        _pending_limits[loop] = asyncio.Semaphore(_max_pending)
+    return _pending_limits[loop]
+
+
+async def run_blocking(func: Callable, *args, **kwargs) -> Any:
+    """
+    Runs a blocking function on the storage thread pool and awaits its result. The current context is copied to the
+    worker thread, so log messages keep their correlation ID.
+    """
+    async with _get_pending_limit():
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(_executor, context.run, functools.partial(func, *args, **kwargs))
+
+
+async def file_exists(client: str | ClientConfig, file_name: str) -> bool:
+    return await run_blocking(s3_service.file_exists, client, file_name)
+
+
+async def find_existing_files(client: str | ClientConfig, file_names: Iterable[str]) -> set[str]:
+    return await run_blocking(s3_service.find_existing_files, client, list(file_names))
+
+
+async def retrieve_file_url(client: str | ClientConfig, file_name: str):
+    return await run_blocking(s3_service.retrieve_file_url, client, file_name)
+
+
+async def open_file(client: str | ClientConfig, file_name: str,
+                    byte_range: str | None = None, if_none_match: str | None = None) -> dict:
+    return await run_blocking(s3_service.open_file, client, file_name, byte_range, if_none_match)
+
+
+async def save(client: str | ClientConfig, file: BytesIO, file_name: str,
+               checksum: str, metadata: dict | None = None) -> bool:
+    return await run_blocking(s3_service.save, client, file, file_name, checksum, metadata)
+
+
+async def list_file_versions(client: str | ClientConfig, file_name: str,
+                             max_versions: int | None = None) -> list[dict]:
+    return await run_blocking(s3_service.list_file_versions, client, file_name, max_versions)
+
+
+async def delete_file_versions(client: str | ClientConfig, versions: list[tuple[str, str]]) -> list[dict]:
+    return await run_blocking(s3_service.delete_file_versions, client, versions)
+
+
+async def add_audit_record(request: Request,
+                           filename_position: int,
+                           service_id: str,
+                           file_id: str | None,
+                           operation_type: OperationType | None,
+                           error_status: tuple = ()) -> AuditRecord:
+    return await run_blocking(audit_service.add_record,
+                              request=request,
+                              filename_position=filename_position,
+                              service_id=service_id,
+                              file_id=file_id,
+                              operation_type=operation_type,
+                              error_status=error_status)
+
+
+@contextlib.asynccontextmanager
+async def buffered_audit_records() -> AsyncIterator[list[AuditRecord]]:
+    """
+    Holds back audit records added within the block and writes them together with BatchWriteItem as the block
+    exits, so a request touching many files makes a few batch calls, and the records are stored before it responds.
+    """
+    with audit_service.buffered_records() as records:
+        try:
+            yield records
+        except Exception:
+            # Keep the records of whatever was done before the failure
+            if records:
+                try:
+                    await run_blocking(audit_service.put_items, records)
+                except Exception as e:
+                    logger.error(f"Error writing to audit table {str(e)}")
+            raise
+    if records:
+        await run_blocking(audit_service.put_items, records)
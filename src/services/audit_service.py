@@ -1,11 +1,16 @@
-import boto3
+import contextlib
+import contextvars
 import os
+import queue
+import threading
+import time
 
 from botocore.exceptions import ClientError
 from dotenv import load_dotenv
 import structlog
 from src.models.status_report import ServiceObservations, Category
 from src.models.audit_record import AuditRecord
+from src.services import aws_session_service
 from src.utils.status_reporter import StatusReporter
 from fastapi import Request
 from src.utils.operation_types import OperationType
@@ -19,32 +24,35 @@ load_dotenv()
 class AuditService:
 
     _instance = None
+    # Audit records are written from the storage thread pool, so the first uses can be at the same time
+    _instance_lock = threading.Lock()
 
     @staticmethod
     def get_instance():
         """ Static access method. """
         if AuditService._instance is None:
-            AuditService()
+            with AuditService._instance_lock:
+                if AuditService._instance is None:
+                    # Only published once set up, so other threads never see a partly built instance
+                    AuditService._instance = AuditService()
         return AuditService._instance
 
     def __init__(self):
         """ Virtually private constructor. """
         if AuditService._instance is not None:
             raise Exception("This class is a singleton!")
-        else:
-            AuditService._instance = self
-            self.dynamodb_client = self.get_dynamodb_client()
-            self.table_name = os.getenv('AUDIT_TABLE')
-            if not self.table_name:
-                raise ValueError("Failed to get value from AUDIT_TABLE environment variable")
+        self.dynamodb_client = self.get_dynamodb_client()
+        self.table_name = os.getenv('AUDIT_TABLE')
+        if not self.table_name:
+            raise ValueError("Failed to get value from AUDIT_TABLE environment variable")
 
     def get_dynamodb_client(self):
         if os.getenv('ENV') != 'local':
             logger.info("Using production DynamoDB client")
-            dynamodb_client = boto3.resource('dynamodb',   region_name=os.getenv('AWS_REGION'))
+            dynamodb_client = aws_session_service.get_resource('dynamodb', region_name=os.getenv('AWS_REGION'))
         else:
             logger.info("Using local DynamoDB client")
-            dynamodb_client = boto3.resource(
+            dynamodb_client = aws_session_service.get_resource(
                 'dynamodb',
                 region_name=os.getenv('AWS_REGION'),
                 aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
@@ -55,6 +63,75 @@ class AuditService:
         return dynamodb_client
 
 
+# BatchWriteItem accepts at most 25 items per call
+BATCH_SIZE = 25
+
+# Records added while a buffer is set are held back to be written together, see buffered_records
+_buffered_records: contextvars.ContextVar[list[AuditRecord] | None] = contextvars.ContextVar(
+    'buffered_audit_records', default=None)
+
+
+class BackgroundAuditWriter:
+    """
+    Writes audit records from a bounded queue on a background thread, in batches, so requests do not wait on
+    DynamoDB. When the queue is full, adding a record waits up to AUDIT_QUEUE_PUT_TIMEOUT seconds for space.
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    @staticmethod
+    def get_instance():
+        if BackgroundAuditWriter._instance is None:
+            with BackgroundAuditWriter._instance_lock:
+                if BackgroundAuditWriter._instance is None:
+                    # Only published once its queue and thread exist
+                    BackgroundAuditWriter._instance = BackgroundAuditWriter()
+        return BackgroundAuditWriter._instance
+
+    def __init__(self):
+        if BackgroundAuditWriter._instance is not None:
+            raise Exception("This class is a singleton!")
+        self._queue = queue.Queue(maxsize=int(os.getenv('AUDIT_QUEUE_SIZE', '10000')))
+        self._put_timeout = float(os.getenv('AUDIT_QUEUE_PUT_TIMEOUT', '5'))
+        self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+        self._thread.start()
+
+    def add(self, audit_record: AuditRecord):
+        self._queue.put(audit_record, timeout=self._put_timeout)
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """
+        Waits until every queued record has been written, or the timeout has passed.
+        Returns True if the queue was emptied.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                put_items(batch)
+            except Exception as e:
+                # Recorded in full in the log so the records can still be recovered
+                logger.error(f"Failed to write {len(batch)} audit records: {e.__class__.__name__} {e} "
+                             f"{[r.model_dump() for r in batch]}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+
 def put_item(audit_record: AuditRecord):
     auditDb = AuditService.get_instance()
     dynamodb_resource = auditDb.dynamodb_client
@@ -62,6 +139,77 @@ def put_item(audit_record: AuditRecord):
     table.put_item(Item=audit_record.model_dump())
 
 
+def put_items(audit_records: list[AuditRecord]):
+    """
+    Writes audit records with BatchWriteItem, up to 25 in each call, retrying any items DynamoDB reports as
+    unprocessed with exponential backoff. Raises RuntimeError if items remain unprocessed after the last retry.
+    """
+    auditDb = AuditService.get_instance()
+    max_retries = int(os.getenv('AUDIT_BATCH_MAX_RETRIES', '5'))
+    retry_delay = float(os.getenv('AUDIT_BATCH_RETRY_DELAY', '0.05'))
+    for batch in get_batches(audit_records):
+        request_items = {auditDb.table_name: [{'PutRequest': {'Item': r.model_dump()}} for r in batch]}
+        attempt = 0
+        while request_items:
+            response = auditDb.dynamodb_client.batch_write_item(RequestItems=request_items)
+            request_items = response.get('UnprocessedItems')
+            if request_items:
+                if attempt >= max_retries:
+                    unprocessed = len(request_items[auditDb.table_name])
+                    raise RuntimeError(f"{unprocessed} audit records not written after {max_retries} retries")
+                time.sleep(retry_delay * 2 ** attempt)
+                attempt += 1
+
+
+def get_batches(audit_records: list[AuditRecord]) -> list[list[AuditRecord]]:
+    """
+    Splits records into batches small enough for BatchWriteItem. As one batch cannot hold the same key twice, a
+    repeated key starts a new batch, so the later record still overwrites the earlier one.
+    """
+    batches = []
+    keys = set()
+    for audit_record in audit_records:
+        key = (audit_record.request_id, audit_record.filename_position)
+        if not batches or len(batches[-1]) >= BATCH_SIZE or key in keys:
+            batches.append([])
+            keys = set()
+        batches[-1].append(audit_record)
+        keys.add(key)
+    return batches
+
+
+@contextlib.contextmanager
+def buffered_records():
+    """
+    Within this block, records from add_record are held in the yielded list rather than written, so the caller can
+    write them together with put_items once it has finished, instead of making one put_item call for each.
+    """
+    records = []
+    token = _buffered_records.set(records)
+    try:
+        yield records
+    finally:
+        _buffered_records.reset(token)
+
+
+def background_writes_enabled() -> bool:
+    """
+    Background writes are switched on with environment variable AUDIT_WRITE_MODE="background" (case insensitive).
+    Otherwise each record is written before add_record returns.
+    """
+    return os.getenv('AUDIT_WRITE_MODE', 'immediate').lower() == 'background'
+
+
+def flush_pending_records(timeout: float | None = None) -> bool:
+    "Waits for records queued for background writing to be written, returning True if none remain"
+    if BackgroundAuditWriter._instance is None:
+        return True
+    flushed = BackgroundAuditWriter._instance.flush(timeout)
+    if not flushed:
+        logger.error(f"Audit records were still queued after waiting {timeout} seconds for them to be written")
+    return flushed
+
+
 def add_record(request: Request,
                filename_position: int,
                service_id: str,
@@ -83,7 +231,13 @@ def add_record(request: Request,
                                file_id=str(file_id),  # str() as file_key can be None if missing
                                operation_type=operation_type,
                                error_details=error_text)
-    put_item(audit_record)
+    records = _buffered_records.get()
+    if records is not None:
+        records.append(audit_record)
+    elif background_writes_enabled():
+        BackgroundAuditWriter.get_instance().add(audit_record)
+    else:
+        put_item(audit_record)
     # Return value added so audit_record can be conveniently examined in unit tests
     return audit_record
 
@@ -0,0 +1,82 @@
+import os
+import threading
+
+import boto3
+import structlog
+from botocore.config import Config
+
+"""
+One AWS session for the whole process, handing out clients that are shared by every service and every client
+configuration that calls AWS.
+
+Sharing a client shares its connection pool and credentials, so adding tenants does not add TLS handshakes or
+connection pools. boto3 clients are thread-safe, so one client serves all the storage worker threads.
+"""
+
+logger = structlog.get_logger()
+
+
+class AwsSessionService:
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    @staticmethod
+    def get_instance() -> 'AwsSessionService':
+        """ Static access method. """
+        if AwsSessionService._instance is None:
+            with AwsSessionService._instance_lock:
+                if AwsSessionService._instance is None:
+                    AwsSessionService._instance = AwsSessionService()
+        return AwsSessionService._instance
+
+    def __init__(self):
+        self.session = boto3.session.Session()
+        self.config = get_config()
+        self._clients = {}
+        # Creating clients from a session is not thread-safe, using them is
+        self._lock = threading.Lock()
+
+    def get_client(self, service_name: str, **client_args):
+        "Returns the shared client for the AWS service, creating it on first use"
+        key = ('client', service_name, tuple(sorted(client_args.items())))
+        with self._lock:
+            if key not in self._clients:
+                logger.info(f"Creating shared {service_name} client")
+                self._clients[key] = self.session.client(service_name, config=self.config, **client_args)
+            return self._clients[key]
+
+    def get_resource(self, service_name: str, **resource_args):
+        "Returns the shared resource for the AWS service, creating it on first use"
+        key = ('resource', service_name, tuple(sorted(resource_args.items())))
+        with self._lock:
+            if key not in self._clients:
+                logger.info(f"Creating shared {service_name} resource")
+                self._clients[key] = self.session.resource(service_name, config=self.config, **resource_args)
+            return self._clients[key]
+
+
+def get_config() -> Config:
+    """
+    Connection settings for all AWS clients. The pool should have room for every storage worker thread and
+    multipart upload thread to hold a connection at once.
+    """
+    return Config(
+        max_pool_connections=int(os.getenv('AWS_MAX_POOL_CONNECTIONS', '100')),
+        tcp_keepalive=os.getenv('AWS_TCP_KEEPALIVE', 'true').lower() == 'true',
+        connect_timeout=float(os.getenv('AWS_CONNECT_TIMEOUT', '5')),
+        read_timeout=float(os.getenv('AWS_READ_TIMEOUT', '60')),
+        retries={
+            'mode': os.getenv('AWS_RETRY_MODE', 'standard'),
+            # Includes the first attempt, as with the AWS_MAX_ATTEMPTS setting of the AWS CLI
+            'total_max_attempts': int(os.getenv('AWS_MAX_ATTEMPTS', '3')),
+        }
+    )
+
+
+def get_client(service_name: str, **client_args):
+    return AwsSessionService.get_instance().get_client(service_name, **client_args)
+
+
+def get_resource(service_name: str, **resource_args):
+    return AwsSessionService.get_instance().get_resource(service_name, **resource_args)
@@ -1,9 +1,19 @@
+import asyncio
+import contextlib
+import inspect
 import os
-from io import BytesIO
+import re
+import struct
+import threading
+import time
+import weakref
+from typing import AsyncIterator, BinaryIO
 
 import clamd
 import structlog
+from cachetools import TTLCache
 from dotenv import load_dotenv
+from fastapi import UploadFile
 
 from src.models.status_report import ServiceObservations, Category
 from src.utils.status_reporter import StatusReporter
@@ -11,6 +21,9 @@ from src.utils.status_reporter import StatusReporter
 load_dotenv()
 logger = structlog.get_logger()
 
+# Matches replies such as "stream: OK" and "stream: Eicar-Signature FOUND"
+_scan_reply = re.compile(r'^(?P<path>.*): ((?P<virus>.+) )?(?P<status>FOUND|OK|ERROR)$')
+
 
 class ClamAVService:
     _instance = None
@@ -20,11 +33,10 @@ class ClamAVService:
             raise Exception("This class a singleton!")
         else:
             ClamAVService._instance = self
-            _host = os.getenv('CLAMD_HOST', 'localhost')
-            _port = int(os.getenv('CLAMD_PORT', '3310'))
-            _clamd = clamd.ClamdNetworkSocket()
-            _clamd.__init__(host=_host, port=_port, timeout=None)
-            self._clamd = _clamd
+            self.scan_timeout = float(os.getenv('CLAMD_SCAN_TIMEOUT', '60'))
+            self.endpoints = [ClamdEndpoint(host, port) for host, port in get_endpoint_addresses()]
+            self.verdict_cache = VerdictCache(maxsize=int(os.getenv('CLAMD_VERDICT_CACHE_SIZE', '10000')),
+                                              ttl=float(os.getenv('CLAMD_VERDICT_CACHE_TTL', '3600')))
 
     @staticmethod
     def get_instance():
@@ -32,46 +44,447 @@ class ClamAVService:
             ClamAVService()
         return ClamAVService._instance
 
+    async def warm_up(self) -> int:
+        """
+        Opens a pooled session to each endpoint and reads its signature version, so the first scans neither wait
+        to connect nor to ask for the version. Returns the number of endpoints that could be reached.
+        """
+        versions = await asyncio.gather(*(endpoint.get_signature_version(self.scan_timeout)
+                                          for endpoint in self.endpoints))
+        return sum(1 for version in versions if version)
+
     # documentation used for this https://docs.clamav.net/manual/Usage/Scanning.html
-    async def check(self, file: BytesIO) -> tuple[int, str]:
-        status = 200
-        scan_result = self._clamd.instream(file)
-        if scan_result['stream'][0] == 'OK':
-            message = ''
-        elif scan_result['stream'][0] == 'FOUND':
-            message = 'Virus Found'
-            status = 400
+    async def check(self, file: BinaryIO | UploadFile, checksum: str = "") -> tuple[int, str]:
+        """
+        Streams the file to clamd in chunks as it is read, without holding the whole file in memory.
+
+        When the SHA-256 checksum of the file is given, a clean verdict already reached for the same content with
+        the same signature database is reused instead of scanning again.
+        """
+        endpoint = self.choose_endpoint()
+        signature_version = ""
+        if checksum:
+            signature_version = await endpoint.get_signature_version(self.scan_timeout)
+            verdict = self.verdict_cache.get(checksum, signature_version) if signature_version else None
+            if verdict is not None:
+                return verdict
+
+        # The endpoint may have been ejected while its version was asked, in which case another one scans
+        scan_endpoint = endpoint if endpoint.is_healthy() else self.choose_endpoint()
+        try:
+            async with self.instream(scan_endpoint) as scan:
+                async with asyncio.timeout(self.scan_timeout):
+                    async for chunk in read_chunks(file, ClamdSession.max_chunk_size):
+                        await scan.send(chunk)
+                    verdict = await scan.finish()
+        except TimeoutError:
+            logger.error(f"Virus scan did not complete within {self.scan_timeout} seconds")
+            return 500, 'Virus scan timed out'
+
+        # The verdict is only cached against the signature version of the endpoint that reached it
+        if signature_version and scan_endpoint is endpoint:
+            self.verdict_cache.put(checksum, signature_version, verdict)
+        return verdict
+
+    @contextlib.asynccontextmanager
+    async def instream(self, endpoint: 'ClamdEndpoint | None' = None) -> AsyncIterator['ClamdSession']:
+        """
+        Starts an INSTREAM scan on a pooled session, so content can be sent as it is read. Call send for each chunk,
+        then finish to get the verdict. Leaving the block without finishing discards the connection.
+
+        Unless an endpoint is given, the scan goes to the healthy endpoint with the fewest scans in flight. An
+        endpoint whose connection fails or times out is ejected from routing until a later PING shows it has
+        recovered.
+        """
+        endpoint = endpoint or self.choose_endpoint()
+        endpoint.outstanding += 1
+        try:
+            async with endpoint.get_pool(self.scan_timeout).session() as session:
+                await session.start_instream()
+                yield session
+            if session.reply_seconds is not None:
+                endpoint.record_latency(session.reply_seconds)
+        except (OSError, EOFError, TimeoutError) as error:
+            endpoint.eject(error)
+            raise
+        finally:
+            endpoint.outstanding -= 1
+
+    def choose_endpoint(self) -> 'ClamdEndpoint':
+        """
+        Picks the healthy endpoint with the fewest outstanding scans, preferring the faster one when tied. Ejected
+        endpoints are probed in the background once their ejection period is over. If every endpoint is ejected the
+        scan is still attempted, as failing it outright would be no better.
+        """
+        healthy = []
+        for endpoint in self.endpoints:
+            if endpoint.is_healthy():
+                healthy.append(endpoint)
+            elif endpoint.is_due_probe():
+                endpoint.start_probe(self.scan_timeout)
+        return min(healthy or self.endpoints, key=lambda e: (e.outstanding, e.latency or 0.0))
+
+
+class ClamdEndpoint:
+    """
+    A single clamd daemon, tracking the scans in flight on it and how quickly it answers, so scans can be spread
+    across several daemons.
+    """
+    # Weight given to each new latency sample in the moving average
+    latency_smoothing = 0.2
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.outstanding = 0
+        self.latency: float | None = None
+        self.ping_latency: float | None = None
+        self.ejected_until: float | None = None
+        self._failures = 0
+        self._signature_version = ""
+        self._signature_checked = 0.0
+        self._signature_ttl = float(os.getenv('CLAMD_VERSION_TTL', '60'))
+        self._probe: asyncio.Task | None = None
+        self._pools: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        self._pool_size = int(os.getenv('CLAMD_POOL_SIZE', '8'))
+        self._max_idle = float(os.getenv('CLAMD_SESSION_MAX_IDLE', '20'))
+        self._eject_seconds = float(os.getenv('CLAMD_EJECT_SECONDS', '10'))
+        self._max_eject_seconds = float(os.getenv('CLAMD_MAX_EJECT_SECONDS', '300'))
+        self._ping_timeout = float(os.getenv('CLAMD_PING_TIMEOUT', '2'))
+
+    @property
+    def name(self) -> str:
+        return f'{self.host}:{self.port}'
+
+    def get_pool(self, timeout: float) -> 'ClamdSessionPool':
+        # asyncio streams belong to one event loop, so each loop gets its own pool
+        loop = asyncio.get_running_loop()
+        if loop not in self._pools:
+            self._pools[loop] = ClamdSessionPool(self.host, self.port, self._pool_size, self._max_idle, timeout)
+        return self._pools[loop]
+
+    async def get_signature_version(self, timeout: float) -> str:
+        """
+        Returns the version reported by clamd, which changes whenever its signature database is updated. It is asked
+        again at most every CLAMD_VERSION_TTL seconds. An empty string is returned if clamd cannot be asked.
+        """
+        if time.monotonic() - self._signature_checked >= self._signature_ttl or not self._signature_version:
+            try:
+                async with self.get_pool(timeout).session() as session:
+                    self._signature_version = await session.version()
+            except (OSError, EOFError, TimeoutError) as error:
+                self.eject(error)
+                return ""
+            self._signature_checked = time.monotonic()
+        return self._signature_version
+
+    def is_healthy(self) -> bool:
+        return self.ejected_until is None
+
+    def is_due_probe(self) -> bool:
+        return (self.ejected_until is not None
+                and time.monotonic() >= self.ejected_until
+                and (self._probe is None or self._probe.done()))
+
+    def record_latency(self, seconds: float):
+        if self.latency is None:
+            self.latency = seconds
         else:
-            message = 'Virus scan gave non-standard result'
-            status = 500
-            logger.error(f"Virus scan gave non-standard result: {scan_result['stream'][0]}")
-        return status, message
+            self.latency += self.latency_smoothing * (seconds - self.latency)
+
+    def eject(self, reason: Exception):
+        """
+        Removes the endpoint from routing, backing off for longer each time it fails in a row.
+        """
+        self._failures += 1
+        period = min(self._eject_seconds * 2 ** (self._failures - 1), self._max_eject_seconds)
+        self.ejected_until = time.monotonic() + period
+        logger.warning(f"Ejecting clamd endpoint {self.name} for {period:.0f} seconds: "
+                       f"{reason.__class__.__name__} {reason}")
+
+    def reinstate(self):
+        if self.ejected_until is not None:
+            logger.info(f"Reinstating clamd endpoint {self.name}")
+        self._failures = 0
+        self.ejected_until = None
+
+    def start_probe(self, timeout: float):
+        self._probe = asyncio.create_task(self.probe(timeout))
+
+    async def probe(self, timeout: float) -> bool:
+        """
+        Sends clamd a PING on a new connection. The endpoint is reinstated if it answers within CLAMD_PING_TIMEOUT,
+        otherwise it is ejected again.
+        """
+        started = time.monotonic()
+        writer = None
+        try:
+            async with asyncio.timeout(min(self._ping_timeout, timeout)):
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+                writer.write(b'zPING\0')
+                await writer.drain()
+                reply = await reader.readuntil(b'\0')
+            if reply != b'PONG\0':
+                raise ConnectionError(f"Unexpected reply to PING: {reply!r}")
+        except (OSError, EOFError, TimeoutError) as error:
+            self.eject(error)
+            return False
+        finally:
+            if writer is not None:
+                writer.close()
+        self.ping_latency = time.monotonic() - started
+        self.reinstate()
+        return True
+
+    def get_details(self) -> dict:
+        return {
+            'healthy': self.is_healthy(),
+            'outstanding': self.outstanding,
+            'latency_ms': None if self.latency is None else round(self.latency * 1000, 1),
+            'ping_ms': None if self.ping_latency is None else round(self.ping_latency * 1000, 1),
+        }
+
+
+def get_endpoint_addresses() -> list[tuple[str, int]]:
+    """
+    Reads the clamd endpoints from CLAMD_ENDPOINTS, a comma-separated list of host:port entries. The port is
+    optional and defaults to CLAMD_PORT. Without CLAMD_ENDPOINTS, the single CLAMD_HOST and CLAMD_PORT are used.
+    """
+    default_port = os.getenv('CLAMD_PORT', '3310')
+    endpoints = os.getenv('CLAMD_ENDPOINTS', '') or os.getenv('CLAMD_HOST', 'localhost')
+    addresses = []
+    for entry in endpoints.split(','):
+        if entry.strip():
+            host, _, port = entry.strip().partition(':')
+            addresses.append((host, int(port or default_port)))
+    return addresses
+
+
+class ClamdSession:
+    """
+    A long-lived clamd connection in IDSESSION mode, which lets several commands share one connection.
+    Commands are sent one at a time and each reply is checked against the id clamd gives the command.
+    """
+    # Chunks must be smaller than StreamMaxLength in clamd.conf, so larger chunks are split before sending
+    max_chunk_size = 64 * 1024
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, timeout: float):
+        self._reader = reader
+        self._writer = writer
+        self._timeout = timeout
+        self._command_id = 0
+        self.in_command = False
+        self.reply_seconds: float | None = None
+        self.last_used = time.monotonic()
+
+    @classmethod
+    async def connect(cls, host: str, port: int, timeout: float) -> 'ClamdSession':
+        async with asyncio.timeout(timeout):
+            reader, writer = await asyncio.open_connection(host, port)
+            writer.write(b'zIDSESSION\0')
+            await writer.drain()
+        return cls(reader, writer, timeout)
+
+    def is_usable(self, max_idle: float) -> bool:
+        """
+        clamd ends idle sessions after its IdleTimeout, so sessions unused for max_idle seconds are not reused.
+        """
+        return (not self.in_command
+                and not self._reader.at_eof()
+                and not self._writer.is_closing()
+                and time.monotonic() - self.last_used < max_idle)
+
+    async def start_instream(self):
+        await self._send_command(b'zINSTREAM\0')
+
+    async def send(self, chunk: bytes):
+        view = memoryview(chunk)
+        for start in range(0, len(view), self.max_chunk_size):
+            piece = view[start:start + self.max_chunk_size]
+            self._writer.write(struct.pack(b'!L', len(piece)))
+            self._writer.write(piece)
+        await self._drain()
+
+    async def finish(self) -> tuple[int, str]:
+        self._writer.write(struct.pack(b'!L', 0))
+        await self._drain()
+        sent = time.monotonic()
+        result = await self._read_reply()
+        # Time clamd took to scan once it had all the content
+        self.reply_seconds = self.last_used - sent
+        if result == 'INSTREAM size limit exceeded. ERROR':
+            raise clamd.BufferTooLongError(result)
+        match = _scan_reply.match(result)
+        return interpret_scan_result(match.group('status') if match else result)
+
+    async def version(self) -> str:
+        "Returns the clamd version string, which includes the signature database version"
+        await self._send_command(b'zVERSION\0')
+        return await self._read_reply()
+
+    async def _send_command(self, command: bytes):
+        self._command_id += 1
+        self.in_command = True
+        self._writer.write(command)
+        await self._drain()
+
+    async def _read_reply(self) -> str:
+        async with asyncio.timeout(self._timeout):
+            reply = await self._reader.readuntil(b'\0')
+        self.in_command = False
+        self.last_used = time.monotonic()
+        command_id, _, result = reply.rstrip(b'\0').decode('utf-8', errors='replace').partition(': ')
+        if command_id != str(self._command_id):
+            raise ConnectionError(f"Expected reply to clamd command {self._command_id}, got {command_id}")
+        return result
+
+    async def _drain(self):
+        async with asyncio.timeout(self._timeout):
+            await self._writer.drain()
 
+    def close(self):
+        if not self._writer.is_closing():
+            if not self.in_command:
+                self._writer.write(b'zEND\0')
+            self._writer.close()
 
-async def virus_check(file: BytesIO):
+
+class ClamdSessionPool:
+    """
+    Holds up to max_size clamd sessions, reusing idle ones so a scan does not pay the connect cost.
+    """
+    def __init__(self, host: str, port: int, max_size: int, max_idle: float, timeout: float):
+        self._host = host
+        self._port = port
+        self._max_idle = max_idle
+        self._timeout = timeout
+        self._slots = asyncio.Semaphore(max_size)
+        self._idle: list[ClamdSession] = []
+
+    @contextlib.asynccontextmanager
+    async def session(self) -> AsyncIterator[ClamdSession]:
+        async with self._slots:
+            session = self._take_idle()
+            if session is None:
+                session = await ClamdSession.connect(self._host, self._port, self._timeout)
+            try:
+                yield session
+            except BaseException:
+                # The protocol state is unknown after a failure, so the connection is not reused
+                session.close()
+                raise
+            if session.is_usable(self._max_idle):
+                self._idle.append(session)
+            else:
+                session.close()
+
+    def _take_idle(self) -> ClamdSession | None:
+        while self._idle:
+            session = self._idle.pop()
+            if session.is_usable(self._max_idle):
+                return session
+            session.close()
+        return None
+
+
+class VerdictCache:
+    """
+    Remembers clean scan verdicts by content SHA-256 and clamd signature version, so identical content is not
+    scanned again until the signatures change. Only clean verdicts are kept, so infected content is always rescanned.
+    """
+    def __init__(self, maxsize: int, ttl: float):
+        self._verdicts = TTLCache(maxsize=maxsize, ttl=ttl)
+        # Scans can run on more than one event loop thread
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, checksum: str, signature_version: str) -> tuple[int, str] | None:
+        with self._lock:
+            verdict = self._verdicts.get((checksum, signature_version))
+            if verdict is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return verdict
+
+    def put(self, checksum: str, signature_version: str, verdict: tuple[int, str]):
+        if verdict[0] == 200:
+            with self._lock:
+                self._verdicts[(checksum, signature_version)] = verdict
+
+    def get_details(self) -> dict:
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._verdicts)}
+
+
+async def read_chunks(file: BinaryIO | UploadFile, chunk_size: int) -> AsyncIterator[bytes]:
+    "Yields the content of a file object in chunks, whether its read method is blocking or a coroutine"
+    while True:
+        chunk = file.read(chunk_size)
+        if inspect.isawaitable(chunk):
+            chunk = await chunk
+        if not chunk:
+            break
+        yield chunk
+
+
+def interpret_scan_result(scan_status: str) -> tuple[int, str]:
+    "Converts the status part of a clamd stream scan response to a status code and message"
+    status = 200
+    if scan_status == 'OK':
+        message = ''
+    elif scan_status == 'FOUND':
+        message = 'Virus Found'
+        status = 400
+    else:
+        message = 'Virus scan gave non-standard result'
+        status = 500
+        logger.error(f"Virus scan gave non-standard result: {scan_status}")
+    return status, message
+
+
+async def virus_check(file: BinaryIO | UploadFile, checksum: str = ""):
     clamAv = ClamAVService.get_instance()
-    return await clamAv.check(file)
+    return await clamAv.check(file, checksum)
 
 
 class ClamAvServiceStatusReporter(StatusReporter):
 
     @classmethod
-    def get_status(cls) -> ServiceObservations:
+    async def get_status(cls) -> ServiceObservations:
         """
-        Reachable if the API is usable.
-        Responding if the service responds to ping.
+        Reachable if the API of any endpoint is usable.
+        Responding if any endpoint responds to ping.
+
+        Each endpoint's health, outstanding scans and latency are included in the details, along with the verdict
+        cache hits and misses. An endpoint that does not respond is ejected from scan routing. The endpoints are
+        checked at the same time, without blocking the event loop.
         """
         checks = ServiceObservations(label='antivirus')
         reachable, responding = checks.add_checks('reachable', 'responding')
 
-        try:
-            clam_av = ClamAVService.get_instance()
-            # Check we can reach the API...
-            clam_av._clamd.version()
-            reachable.category = Category.success
-            # ...and check we can reach the actual service
-            clam_av._clamd.ping()
-            responding.category = Category.success
-        except Exception as e:
-            logger.error(f'Status check {cls.label} failed: {e.__class__.__name__} {e}')
+        clam_av = ClamAVService.get_instance()
+        outcomes = await asyncio.gather(*(cls.check_endpoint(endpoint, clam_av.scan_timeout)
+                                          for endpoint in clam_av.endpoints))
+        for endpoint, (is_reachable, is_responding) in zip(clam_av.endpoints, outcomes):
+            if is_reachable:
+                reachable.category = Category.success
+            if is_responding:
+                responding.category = Category.success
+            checks.details[endpoint.name] = endpoint.get_details()
+        checks.details['verdict_cache'] = clam_av.verdict_cache.get_details()
         return checks
+
+    @classmethod
+    async def check_endpoint(cls, endpoint: ClamdEndpoint, timeout: float) -> tuple[bool, bool]:
+        "Returns whether the endpoint's API is usable and whether it responds to ping"
+        # Check we can reach the API...
+        if not await endpoint.get_signature_version(timeout):
+            logger.error(f'Status check {cls.label} failed for {endpoint.name}: version not available')
+            return False, False
+        # ...and check we can reach the actual service
+        if not await endpoint.probe(timeout):
+            logger.error(f'Status check {cls.label} failed for {endpoint.name}: no reply to ping')
+            return True, False
+        return True, True
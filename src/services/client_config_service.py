@@ -1,8 +1,10 @@
 import os
 import pathlib
-import datetime
+import threading
+from concurrent.futures import Future
 from typing import Dict
 
+from cachetools import LRUCache, TTLCache
 from fastapi import HTTPException
 
 from src.models.client_config import ClientConfig
@@ -10,6 +12,7 @@ import structlog
 
 from src.models.status_report import ServiceObservations, Category
 from src.utils.status_reporter import StatusReporter
+from src.validation.client_configured_validator import get_validator_chain
 
 logger = structlog.get_logger()
 
@@ -19,10 +22,18 @@ class ClientConfigService:
     Service for loading and caching ClientConfigs keyed on username (subject in authentication token).
 
     To get a ClientConfig, use `ClientConfigService.get_instance(username).config`.
+
+    Found configs are held in an LRU cache of CONFIG_CACHE_SIZE entries. Usernames with no config are remembered for
+    only CONFIG_NEGATIVE_TTL seconds in a separate cache, so unknown callers cannot push out known clients. Cached
+    configs are dropped whenever the config file index changes, so a config is reloaded once its file is added, edited
+    or removed. Concurrent requests for a username that is not cached wait for a single load.
     """
-    _configs: Dict = {}
-    _config_ttls: Dict = {}
-    _config_default_ttl = int(os.getenv('CONFIG_TTL', '300'))
+    _configs = LRUCache(maxsize=int(os.getenv('CONFIG_CACHE_SIZE', '1000')))
+    _missing_configs = TTLCache(maxsize=int(os.getenv('CONFIG_NEGATIVE_CACHE_SIZE', '1000')),
+                                ttl=float(os.getenv('CONFIG_NEGATIVE_TTL', '30')))
+    _pending_loads: Dict[str, Future] = {}
+    # Configs are requested from the event loop and from storage worker threads
+    _lock = threading.Lock()
     _config_sources = None
 
     @staticmethod
@@ -30,37 +41,72 @@ class ClientConfigService:
         if not isinstance(username, str):
             raise ValueError(f"Invalid type for username: {type(username)}")
 
-        access_time = datetime.datetime.now()
-        if username in ClientConfigService._config_ttls and access_time > ClientConfigService._config_ttls[username]:
-            if ClientConfigService._config_ttls[username] is not None:
-                # Only log the cache clear if there is a value that is being cleared
-                logger.info(f"ClientConfig for '{username}' TTL expired, clearing cached config")
-            # Clear cache, including any cached 'None' values from a failed auth attempt
-            del ClientConfigService._configs[username]
-            del ClientConfigService._config_ttls[username]
-
-        if username not in ClientConfigService._configs:
-            ClientConfigService._configs[username] = ClientConfigService(username)
-            ClientConfigService._config_ttls[username] = datetime.datetime.now() + datetime.timedelta(
-                seconds=ClientConfigService._config_default_ttl
-            )
+        # The config file index is only built when configs are loaded from files
+        generation = ClientConfigIndex.get_instance().generation if ClientConfigService.uses_source('file') else 0
+        with ClientConfigService._lock:
+            instance = ClientConfigService._configs.get(username) or ClientConfigService._missing_configs.get(username)
+            if instance is not None and instance.generation == generation:
+                return instance
+            pending = ClientConfigService._pending_loads.get(username)
+            loading = pending is None
+            if loading:
+                pending = ClientConfigService._pending_loads[username] = Future()
+
+        if not loading:
+            return pending.result()
 
-        return ClientConfigService._configs[username]
+        try:
+            instance = ClientConfigService(username, generation)
+            found = instance.config is not None
+        except BaseException as e:
+            with ClientConfigService._lock:
+                if ClientConfigService._pending_loads.get(username) is pending:
+                    del ClientConfigService._pending_loads[username]
+            pending.set_exception(e)
+            raise
+        with ClientConfigService._lock:
+            # If the cache was cleared during the load, hand the result to the waiting requests but don't keep it
+            if ClientConfigService._pending_loads.get(username) is pending:
+                del ClientConfigService._pending_loads[username]
+                # Only one of the caches may hold the username, otherwise a stale entry could be found first
+                ClientConfigService._configs.pop(username, None)
+                ClientConfigService._missing_configs.pop(username, None)
+                if found:
+                    ClientConfigService._configs[username] = instance
+                else:
+                    ClientConfigService._missing_configs[username] = instance
+        pending.set_result(instance)
+        return instance
+
+    @staticmethod
+    def uses_source(source: str) -> bool:
+        """ Returns whether configs are loaded from the given source, one of those listed in CONFIG_SOURCES. """
+        # Effectively cache source list on first use, works more reliably than on startup
+        if ClientConfigService._config_sources is None:
+            logger.info("Setting config sources from environment variable")
+            ClientConfigService._config_sources = os.getenv('CONFIG_SOURCES', 'file').lower().split(',')
+        return source in ClientConfigService._config_sources
 
     @staticmethod
     def clear_cache():
-        logger.info(f'Clearing {len(ClientConfigService._configs)} cached ClientConfigs')
-        ClientConfigService._configs.clear()
-        ClientConfigService._config_ttls.clear()
+        with ClientConfigService._lock:
+            logger.info(f'Clearing {len(ClientConfigService._configs)} cached ClientConfigs')
+            ClientConfigService._configs.clear()
+            ClientConfigService._missing_configs.clear()
+            ClientConfigService._pending_loads.clear()
 
-    def __init__(self, username: str):
+    def __init__(self, username: str, generation: int = 0):
         self.username = username
+        # The config index generation the config was loaded from
+        self.generation = generation
         self._config = None
+        self._loaded = False
 
     @property
     def config(self) -> ClientConfig | None:
-        if self._config is None:
+        if not self._loaded:
             self._config = self.load()
+            self._loaded = True
         return self._config
 
     def load(self) -> ClientConfig | None:
@@ -68,20 +114,15 @@ class ClientConfigService:
         if self.username is None or self.username == 'anonymous':
             return None
 
-        # Effectively cache source list on first use, works more reliably than on startup
-        if ClientConfigService._config_sources is None:
-            logger.info("Setting config sources from environment variable")
-            ClientConfigService._config_sources = os.getenv('CONFIG_SOURCES', 'file').lower().split(',')
-
         loaded_config = None
 
-        if 'file' in ClientConfigService._config_sources \
+        if ClientConfigService.uses_source('file') \
                 and loaded_config is None:
             logger.info(f"Looking for ClientConfig for '{self.username}' from file")
             loaded_config = self.load_from_file()
 
         # Only load from environment if other sources are also specified, bit of safety to avoid only trusting the env
-        if 'env' in ClientConfigService._config_sources \
+        if ClientConfigService.uses_source('env') \
                 and len(ClientConfigService._config_sources) > 1 \
                 and loaded_config is None:
             logger.warning(f"Looking for ClientConfig for '{self.username}' from environment variables")
@@ -122,31 +163,128 @@ class ClientConfigService:
 
     def load_from_file(self) -> ClientConfig | None:
         """
-        Attempts to find then load a file named {username}.json from the CONFIG_DIR directory, returning None if the
-        file does not exist.
+        Looks up the config with this username as its azure_client_id in the index of config files in the CONFIG_DIR
+        directory, returning None if there is no such config.
 
-        :return: ClientConfig instance if found and loaded, else None
+        :return: ClientConfig instance if found, else None
         """
-        loaded_config = None
+        loaded_config = ClientConfigIndex.get_instance().get(self.username)
+        if loaded_config is None:
+            config_dir = os.getenv('CONFIG_DIR', '/app/clientconfigs')
+            logger.error(f"Found no config for {self.username} in {os.path.abspath(config_dir)}")
+        return loaded_config
+
+
+class ClientConfigIndex:
+    """
+    Index of the config files in a config directory, mapping each azure_client_id to its parsed ClientConfig, so a
+    config is found without searching the directory.
+
+    The index is refreshed from the directory every CONFIG_REFRESH_INTERVAL seconds on a background thread. Only files
+    whose modification time or size has changed are parsed again, and the new mapping replaces the old one in a single
+    assignment, so lookups never see a partly refreshed index. The generation counts the refreshes that changed the
+    mapping.
+    """
+    _instances: Dict = {}
+    _instances_lock = threading.Lock()
+    _refresh_interval = float(os.getenv('CONFIG_REFRESH_INTERVAL', '30'))
+
+    @staticmethod
+    def get_instance() -> 'ClientConfigIndex':
+        """ Returns the index of the current CONFIG_DIR, building it on first use. """
         config_dir = os.getenv('CONFIG_DIR', '/app/clientconfigs')
+        with ClientConfigIndex._instances_lock:
+            if config_dir not in ClientConfigIndex._instances:
+                index = ClientConfigIndex(config_dir)
+                index.refresh()
+                index.start_refreshing(ClientConfigIndex._refresh_interval)
+                ClientConfigIndex._instances[config_dir] = index
+            return ClientConfigIndex._instances[config_dir]
+
+    def __init__(self, config_dir: str):
+        self.config_dir = config_dir
+        self.generation = 0
+        self._configs: dict[str, ClientConfig] = {}
+        # For each file: its modification time and size when last parsed, and the config parsed from it
+        self._files: dict[pathlib.Path, tuple[int, int, ClientConfig | None]] = {}
+        self._refresh_lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def get(self, azure_client_id: str) -> ClientConfig | None:
+        return self._configs.get(azure_client_id)
+
+    def get_all(self) -> list[ClientConfig]:
+        return list(self._configs.values())
+
+    def refresh(self) -> bool:
+        """
+        Brings the index up to date with the config directory, returning True if any config changed.
+        """
+        with self._refresh_lock:
+            files = {}
+            for path in pathlib.Path(self.config_dir).rglob("*.json"):
+                try:
+                    stat = path.stat()
+                except OSError as e:
+                    logger.error(f"Error {e.__class__.__name__} reading config file {path}: {e}")
+                    continue
+                previous = self._files.get(path)
+                if previous is not None and previous[:2] == (stat.st_mtime_ns, stat.st_size):
+                    files[path] = previous
+                else:
+                    files[path] = (stat.st_mtime_ns, stat.st_size, self.parse(path))
+
+            if files == self._files:
+                return False
+            self._files = files
+            self._configs = self.build_mapping(files)
+            self.generation += 1
+            logger.info(f"Indexed {len(self._configs)} ClientConfigs from {os.path.abspath(self.config_dir)}, "
+                        f"generation {self.generation}")
+            return True
+
+    @staticmethod
+    def parse(path: pathlib.Path) -> ClientConfig | None:
         try:
-            # Config files are JSON files named after the requesting application (client) id.
-            # Use a regular expression glob to find all files in any subdirectory of config_dir which are named
-            # {username}.json
-            candidates = [p for p in pathlib.Path(config_dir).rglob(f"{self.username}.json")]
-            # There should be exactly 1 file match: Too many means possibly conflicting configs, none means not found
-            if len(candidates) == 1:
-                config_path = candidates[0]
-                logger.info(f"Loading ClientConfig for '{self.username}' from {config_path}")
-                cfg_json = pathlib.Path(config_path).read_text()
-                loaded_config = ClientConfig.model_validate_json(cfg_json)
-            else:
-                logger.error(f"Found {len(candidates)} configs for {self.username} in {os.path.abspath(config_dir)}")
+            logger.info(f"Loading ClientConfig from {path}")
+            config = ClientConfig.model_validate_json(path.read_text())
+            # Compiled now, so a misconfigured validator stops the config loading rather than failing every request
+            get_validator_chain(config.file_validators)
+            get_validator_chain(config.file_collection_validators)
+            return config
         except Exception as e:
-            logger.error(f"Error {e.__class__.__name__} during load of config for '{self.username}': {e}")
-            loaded_config = None
+            logger.error(f"Error {e.__class__.__name__} during load of config from {path}: {e}")
+            return None
 
-        return loaded_config
+    @staticmethod
+    def build_mapping(files: dict[pathlib.Path, tuple[int, int, ClientConfig | None]]) -> dict[str, ClientConfig]:
+        "Maps each azure_client_id to its config, leaving out any client with more than one, maybe conflicting, file"
+        paths_by_client: dict[str, list[pathlib.Path]] = {}
+        configs = {}
+        for path, (_, _, config) in files.items():
+            if config is not None:
+                paths_by_client.setdefault(config.azure_client_id, []).append(path)
+                configs[config.azure_client_id] = config
+        for azure_client_id, paths in paths_by_client.items():
+            if len(paths) > 1:
+                logger.error(f"Found {len(paths)} configs for {azure_client_id}: {sorted(map(str, paths))}")
+                del configs[azure_client_id]
+        return configs
+
+    def start_refreshing(self, interval: float):
+        if interval > 0:
+            threading.Thread(target=self._refresh_periodically, args=(interval,), name='client-config-index',
+                             daemon=True).start()
+
+    def stop_refreshing(self):
+        self._stopped.set()
+
+    def _refresh_periodically(self, interval: float):
+        while not self._stopped.wait(interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Error {e.__class__.__name__} refreshing config index: {e}")
 
 
 def get_config_for_client(username: str) -> ClientConfig | None:
@@ -159,6 +297,21 @@ def get_config_for_client(username: str) -> ClientConfig | None:
     return ClientConfigService.get_instance(username).config
 
 
+def load_all_configs() -> list[ClientConfig]:
+    """
+    Builds the index of config files in the CONFIG_DIR directory and caches the ClientConfig of every client in it,
+    so the first request from each client finds its config ready. Nothing is loaded unless CONFIG_SOURCES includes
+    file.
+
+    :return: the ClientConfigs loaded
+    """
+    if not ClientConfigService.uses_source('file'):
+        return []
+    usernames = [config.azure_client_id for config in ClientConfigIndex.get_instance().get_all()]
+    configs = [get_config_for_client(username) for username in usernames]
+    return [config for config in configs if config is not None]
+
+
 def get_config_for_client_or_error(username: str) -> ClientConfig:
     """
     Convenience method to get a ClientConfig instance for a given username, raising an exception if the config is not
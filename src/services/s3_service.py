@@ -1,16 +1,22 @@
+import base64
+import hashlib
+import itertools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
 from io import BytesIO
-from typing import Dict
+from typing import Callable, Dict, Iterable, Iterator
 
-import boto3
 import os
 
 import structlog
 from botocore.exceptions import ClientError
+from cachetools import TLRUCache
 
 from src.models.client_config import ClientConfig
 from src.models.execeptions.file_not_found import FileNotFoundException
+from src.models.execeptions.invalid_range import InvalidRangeException
 from src.models.status_report import ServiceObservations, Category
-from src.services import client_config_service
+from src.services import aws_session_service, client_config_service
 from src.utils.status_reporter import StatusReporter
 from src.services.checksum_service import hex_string_to_base64_encoded
 
@@ -19,6 +25,10 @@ logger = structlog.get_logger()
 
 class S3Service:
     _instances: Dict = {}
+    # Presigned URL caches by bucket. Clients can share a bucket, so a change made through one client must
+    # invalidate the URLs cached for the others.
+    _url_caches: Dict[str, 'PresignedUrlCache'] = {}
+    _url_caches_lock = threading.Lock()
 
     @staticmethod
     def get_instance(client: str | ClientConfig) -> 'S3Service':
@@ -41,15 +51,35 @@ class S3Service:
     def clear_cache():
         logger.info(f'Clearing {len(S3Service._instances)} cached S3Service instances')
         S3Service._instances.clear()
+        with S3Service._url_caches_lock:
+            S3Service._url_caches.clear()
+
+    @staticmethod
+    def get_url_cache(bucket_name: str) -> 'PresignedUrlCache':
+        """ Returns the presigned URL cache shared by every S3Service for the bucket. """
+        with S3Service._url_caches_lock:
+            if bucket_name not in S3Service._url_caches:
+                S3Service._url_caches[bucket_name] = PresignedUrlCache(
+                    maxsize=int(os.getenv('S3_URL_CACHE_SIZE', '1000')),
+                    lifetime_fraction=float(os.getenv('S3_URL_CACHE_LIFETIME_FRACTION', '0.5')),
+                    wait_timeout=float(os.getenv('S3_URL_CACHE_WAIT_TIMEOUT', '2')))
+            return S3Service._url_caches[bucket_name]
+
+    # Listing more keys than this to find which keys exist costs more than a HEAD for each remaining key
+    existence_listing_max_keys = int(os.getenv('S3_EXISTENCE_LISTING_MAX_KEYS', '5000'))
+    # S3 limit on the number of objects in one DeleteObjects request
+    delete_objects_max_keys = 1000
 
     def __init__(self, client_config: ClientConfig):
         self.client_config = client_config
         self.s3_client = self.get_s3_client()
+        self.url_cache = self.get_url_cache(client_config.bucket_name)
 
     @classmethod
     def get_s3_client(cls):
+        "Returns the S3 client shared by all S3Service instances, which differ only in their bucket"
         if os.getenv('ENV') == 'local':
-            s3_client = boto3.client(
+            s3_client = aws_session_service.get_client(
                 's3',
                 region_name=os.getenv('AWS_REGION', 'eu-west-2'),
                 aws_access_key_id=os.getenv('AWS_KEY_ID', ''),
@@ -57,23 +87,19 @@ class S3Service:
                 endpoint_url=os.getenv('AWS_ENDPOINT_URL', 'http://localhost:4566')
             )
         else:
-            s3_client = boto3.client(
+            s3_client = aws_session_service.get_client(
                 's3',
                 region_name=os.getenv('AWS_REGION', 'eu-west-2')
             )
         return s3_client
 
     def generate_file_url(self, key, expiration=60):
+        """
+        Returns a presigned URL for the key, reusing one generated recently for the same key so repeated requests do
+        not each need a HEAD request to S3.
+        """
         try:
-            logger.info(f"Generating URL for file {key} from bucket {self.client_config.bucket_name}")
-            # Check if the file exists by trying to get its metadata
-            self.s3_client.head_object(Bucket=self.client_config.bucket_name, Key=key)
-            response = self.s3_client.generate_presigned_url(
-                'get_object',
-                Params={'Bucket': self.client_config.bucket_name, 'Key': key},
-                ExpiresIn=expiration
-            )
-            return response
+            return self.url_cache.get_or_create(key, expiration, lambda: self.create_file_url(key, expiration))
         except ClientError as e:
             if e.response['Error']['Code'] == '404':
                 raise FileNotFoundException(f'The file {key} could not be found.', key)
@@ -83,6 +109,16 @@ class S3Service:
         except Exception as e:
             logger.error(f"{e.__class__.__name__} generating file URL from S3: {str(e)}")
 
+    def create_file_url(self, key, expiration=60):
+        logger.info(f"Generating URL for file {key} from bucket {self.client_config.bucket_name}")
+        # Check if the file exists by trying to get its metadata
+        self.s3_client.head_object(Bucket=self.client_config.bucket_name, Key=key)
+        return self.s3_client.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': self.client_config.bucket_name, 'Key': key},
+            ExpiresIn=expiration
+        )
+
     def read_file_from_s3_bucket(self, key):
         try:
             file_object = self.s3_client.get_object(Bucket=self.client_config.bucket_name, Key=key)
@@ -90,9 +126,37 @@ class S3Service:
         except Exception as e:
             logger.debug(f"{e.__class__.__name__} reading file from S3: {str(e)}")
 
+    def open_object(self, key: str, byte_range: str | None = None, if_none_match: str | None = None) -> dict:
+        """
+        Starts reading an object, returning the get_object response, whose Body streams the content rather than
+        holding it in memory. If byte_range is given, in HTTP Range header form, only those bytes are read from S3.
+
+        If if_none_match matches the object's ETag, the response has an HTTPStatusCode of 304 and no Body.
+        """
+        get_args = {'Bucket': self.client_config.bucket_name, 'Key': key}
+        if byte_range:
+            get_args['Range'] = byte_range
+        if if_none_match:
+            get_args['IfNoneMatch'] = if_none_match
+        try:
+            return self.s3_client.get_object(**get_args)
+        except ClientError as e:
+            error_code = e.response['Error']['Code']
+            if error_code in ('NoSuchKey', '404'):
+                raise FileNotFoundException(f'The file {key} could not be found.', key)
+            elif error_code == 'InvalidRange':
+                raise InvalidRangeException(f'The range {byte_range} is not satisfiable for file {key}.', key)
+            elif error_code == '304':
+                headers = e.response.get('ResponseMetadata', {}).get('HTTPHeaders', {})
+                return {'ResponseMetadata': {'HTTPStatusCode': 304}, 'ETag': headers.get('etag', if_none_match)}
+            raise
+
     def upload_file_obj(self, file: BytesIO, filename: str, checksum: str, metadata: dict | None = None):
         if metadata is None:
             metadata = {}
+        if get_remaining_size(file) > get_multipart_threshold():
+            self.upload_file_obj_in_parts(file, filename, checksum, metadata)
+            return
         logger.debug(f"Uploading file with name {filename} to S3 bucket {self.client_config.bucket_name}")
         checksum_base64 = hex_string_to_base64_encoded(checksum)
         try:
@@ -107,47 +171,122 @@ class S3Service:
         except Exception as e:
             logger.error(f"{e.__class__.__name__} uploading file to S3: {str(e)}")
             raise e
+        finally:
+            self.url_cache.invalidate(filename)
 
-    def list_object_versions(self, file_key):
+    def upload_file_obj_in_parts(self, file: BytesIO, filename: str, checksum: str, metadata: dict | None = None):
+        """
+        Uploads the file as concurrent multipart upload parts, reading no more than one part at a time for each
+        upload slot rather than the whole file.
+        """
+        logger.debug(f"Uploading file with name {filename} to S3 bucket {self.client_config.bucket_name} in parts")
+        writer = self.open_object_writer(filename, metadata)
         try:
-            response = self.s3_client.list_object_versions(
-                Bucket=self.client_config.bucket_name,
-                Prefix=file_key
-            )
-            return response.get('Versions', [])
+            while part := file.read(writer.part_size):
+                writer.write(part)
+            writer.commit(checksum)
+        except Exception as e:
+            logger.error(f"{e.__class__.__name__} uploading file to S3 in parts: {str(e)}")
+            writer.abort()
+            raise e
+
+    def open_object_writer(self, filename: str, metadata: dict | None = None) -> 'S3ObjectWriter':
+        logger.debug(f"Opening writer for file with name {filename} to S3 bucket {self.client_config.bucket_name}")
+        self.url_cache.invalidate(filename)
+        return S3ObjectWriter(self.s3_client, self.client_config.bucket_name, filename, metadata)
+
+    def list_object_versions(self, file_key: str, max_versions: int | None = None) -> list[dict]:
+        """
+        Lists the versions of exactly file_key, newest first, up to max_versions if given.
+        """
+        try:
+            return list(itertools.islice(self.iter_object_versions(file_key, max_versions), max_versions))
         except ClientError as e:
             raise RuntimeError(f"Failed to list versions for {file_key}: {e}")
 
-    def delete_object_version(self, filename: str, version_id: str):
-        try:
-            logger.debug(
-                f"Attempting to delete version {version_id} of file {filename} "
-                f"from S3 bucket {self.client_config.bucket_name}"
-            )
+    def iter_object_versions(self, file_key: str, max_versions: int | None = None) -> Iterator[dict]:
+        """
+        Yields the versions of exactly file_key, newest first, fetching further pages only as they are needed.
 
-            self.s3_client.delete_object(
-                Bucket=self.client_config.bucket_name,
-                Key=filename,
-                VersionId=version_id
-            )
-            logger.info(
-                f"Version {version_id} of file {filename} "
-                f"successfully deleted from bucket {self.client_config.bucket_name}"
-            )
-        except ClientError as e:
-            error_code = e.response.get("Error", {}).get("Code", "")
-            if error_code == "NoSuchKey" or error_code == "404":
-                logger.warning(
-                    f"Version {version_id} of file {filename} not found in bucket {self.client_config.bucket_name}"
-                )
-                raise FileNotFoundError(
-                    f"Version {version_id} of file {filename} not found in bucket {self.client_config.bucket_name}"
-                )
-            else:
-                logger.error(
-                    f"{e.__class__.__name__} deleting version {version_id} of file {filename} from S3: {str(e)}"
-                )
-                raise
+        The listing is by prefix, so versions of other keys starting with file_key are skipped, and listing stops
+        once it moves past file_key as versions are listed in key order. max_versions limits the page size so a
+        caller wanting only the latest few versions does not wait for a full page of 1000.
+        """
+        list_args = {'Bucket': self.client_config.bucket_name, 'Prefix': file_key}
+        if max_versions:
+            list_args['PaginationConfig'] = {'PageSize': min(max_versions, 1000)}
+        for page in self.s3_client.get_paginator('list_object_versions').paginate(**list_args):
+            for version in page.get('Versions', []):
+                if version.get('Key') == file_key:
+                    yield version
+                elif version.get('Key', '') > file_key:
+                    return
+
+    def delete_object_versions(self, versions: list[tuple[str, str]]) -> list[dict]:
+        """
+        Deletes the given (key, version ID) pairs with a single DeleteObjects request, so no more than
+        delete_objects_max_keys pairs may be given at once.
+
+        Returns the entries S3 could not delete, each a dict with Key, VersionId, Code and Message.
+        """
+        if len(versions) > self.delete_objects_max_keys:
+            raise ValueError(f"Cannot delete more than {self.delete_objects_max_keys} versions in one request")
+        if not versions:
+            return []
+        logger.debug(f"Attempting to delete {len(versions)} version(s) from S3 bucket "
+                     f"{self.client_config.bucket_name}")
+        for key in {key for key, _ in versions}:
+            self.url_cache.invalidate(key)
+        # Quiet mode only reports the entries that failed, which is all we need to work out the outcome for each key
+        response = self.s3_client.delete_objects(
+            Bucket=self.client_config.bucket_name,
+            Delete={
+                'Objects': [{'Key': key, 'VersionId': version_id} for key, version_id in versions],
+                'Quiet': True
+            }
+        )
+        errors = response.get('Errors', [])
+        for error in errors:
+            logger.error(f"{error.get('Code')} deleting version {error.get('VersionId')} of file {error.get('Key')} "
+                         f"from S3: {error.get('Message')}")
+        logger.info(f"Deleted {len(versions) - len(errors)} of {len(versions)} version(s) from bucket "
+                    f"{self.client_config.bucket_name}")
+        return errors
+
+    def find_existing_keys(self, keys: Iterable[str]) -> set[str]:
+        """
+        Finds which of the given keys exist in the bucket by listing the smallest range of keys that covers them
+        all, so many keys sharing a folder are checked in one or two list requests rather than a HEAD each.
+
+        If the range holds more than existence_listing_max_keys objects, the listing stops and any keys it has not
+        reached are checked with HEAD requests instead.
+        """
+        wanted = set(keys)
+        if not wanted:
+            return set()
+        first, last = min(wanted), max(wanted)
+        list_args = {'Bucket': self.client_config.bucket_name, 'Prefix': os.path.commonprefix([first, last])}
+        if first[:-1]:
+            # StartAfter is exclusive, so start after a key just before the first one wanted
+            list_args['StartAfter'] = first[:-1]
+
+        found = set()
+        listed = 0
+        for page in self.s3_client.get_paginator('list_objects_v2').paginate(**list_args):
+            for item in page.get('Contents', []):
+                key = item['Key']
+                if key > last:
+                    return found
+                if key in wanted:
+                    found.add(key)
+                listed += 1
+            if listed >= self.existence_listing_max_keys and page.get('IsTruncated'):
+                unlisted = [k for k in wanted if k > key]
+                logger.info(f"Listed {listed} keys without reaching all wanted keys, checking {len(unlisted)} "
+                            f"remaining keys individually")
+                found.update(k for k in unlisted if self.file_exists_in_bucket(k))
+                return found
+        return found
 
     def file_exists_in_bucket(self, key: str) -> bool:
         try:
@@ -160,16 +299,255 @@ class S3Service:
                 raise e  # something else went wrong (e.g. permissions)
 
 
+class PresignedUrlCache:
+    """
+    Remembers the presigned URLs generated for a bucket, so a key requested many times in a few seconds costs a
+    single HEAD request. Each URL is kept for lifetime_fraction of its ExpiresIn, so a cached URL always has time left
+    to be used. Concurrent requests for a key that is not cached wait for the first one rather than each sending a
+    HEAD request. A request that has waited wait_timeout seconds stops waiting and creates the URL itself, so a slow
+    HEAD request does not hold a storage thread for each request waiting on it.
+    """
+    def __init__(self, maxsize: int, lifetime_fraction: float, wait_timeout: float = 2.0):
+        # Entries are (expiration, url) and are kept for a fraction of their own expiration
+        self._urls = TLRUCache(maxsize=maxsize, ttu=lambda key, entry, now: now + entry[0] * lifetime_fraction)
+        self._pending: dict[str, Future] = {}
+        self._wait_timeout = wait_timeout
+        # URLs are generated on the storage thread pool, so the cache is shared between threads
+        self._lock = threading.Lock()
+
+    def get_or_create(self, key: str, expiration: int, create_url: Callable[[], str | None]) -> str | None:
+        with self._lock:
+            entry = self._urls.get(key)
+            if entry is not None and entry[0] == expiration:
+                return entry[1]
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = self._pending[key] = Future()
+                creating = True
+            else:
+                creating = False
+
+        if not creating:
+            try:
+                return pending.result(timeout=self._wait_timeout)
+            except TimeoutError:
+                if pending.done():
+                    # Raised by the request creating the URL, rather than from waiting for it
+                    raise
+                logger.warning(f"URL for {key} not ready after {self._wait_timeout} seconds, creating it directly")
+                return create_url()
+
+        try:
+            url = create_url()
+        except BaseException as e:
+            with self._lock:
+                if self._pending.get(key) is pending:
+                    del self._pending[key]
+            pending.set_exception(e)
+            raise
+        with self._lock:
+            # If the key was invalidated while the URL was created, hand it to the waiting requests but don't keep it
+            if self._pending.get(key) is pending:
+                del self._pending[key]
+                if url is not None:
+                    self._urls[key] = (expiration, url)
+        pending.set_result(url)
+        return url
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._urls.pop(key, None)
+            self._pending.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._urls.clear()
+            self._pending.clear()
+
+
+class S3ObjectWriter:
+    """
+    Writes a single S3 object from content supplied in chunks, without needing the whole object in memory.
+
+    Content is buffered until a full part is available, at which point a multipart upload is started and each part is
+    sent with its own SHA-256 checksum. Up to `concurrency` parts are uploaded at the same time, on a thread pool
+    shared by all writers and created on first use. Nothing is visible in the bucket until commit is called, and
+    abort discards any parts already sent. Objects smaller than one part are sent with a single put_object call on
+    commit.
+    """
+    # S3 requires every part except the last to be at least 5 MiB
+    minimum_part_size = 5 * 1024 * 1024
+
+    def __init__(self, s3_client, bucket_name: str, key: str, metadata: dict | None = None,
+                 part_size: int | None = None, concurrency: int | None = None):
+        if part_size is None:
+            part_size = get_part_size()
+        if concurrency is None:
+            concurrency = int(os.getenv('S3_MULTIPART_CONCURRENCY', '4'))
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+        self.key = key
+        self.metadata = metadata or {}
+        self.part_size = max(part_size, self.minimum_part_size)
+        self.concurrency = max(concurrency, 1)
+        self.upload_id = None
+        self._part_uploads = []
+        self._buffer = bytearray()
+        # SHA-256 of the parts submitted so far, in order
+        self._parts_digest = hashlib.sha256()
+
+    def write(self, chunk: bytes):
+        self._buffer.extend(chunk)
+        while len(self._buffer) >= self.part_size:
+            part = bytes(self._buffer[:self.part_size])
+            del self._buffer[:self.part_size]
+            self._submit_part(part)
+
+    def commit(self, checksum: str):
+        """
+        Makes the object visible in the bucket. The checksum is the SHA-256 hex digest of the whole object, which
+        is verified by S3 when the object is sent in one request.
+
+        S3 only keeps a composite SHA-256 for an object sent in parts, built from the part checksums, so the
+        checksum is compared with the digest of the parts sent before the upload is completed. A mismatch raises
+        ValueError and leaves the upload to be aborted, so nothing is stored. S3 verifies each part it receives,
+        and the composite checksum it reports is compared with one built from the part checksums sent.
+        """
+        if self.upload_id is None:
+            self.s3_client.put_object(
+                Bucket=self.bucket_name,
+                Key=self.key,
+                Body=bytes(self._buffer),
+                ChecksumAlgorithm="SHA256",
+                ChecksumSHA256=hex_string_to_base64_encoded(checksum),
+                Metadata=self.metadata
+            )
+        else:
+            if self._buffer:
+                self._submit_part(bytes(self._buffer))
+                self._buffer = bytearray()
+            if self._parts_digest.hexdigest() != checksum.lower():
+                raise ValueError(f"Checksum for {self.key} does not match the content sent")
+            parts = [upload.result() for upload in self._part_uploads]
+            response = self.s3_client.complete_multipart_upload(
+                Bucket=self.bucket_name,
+                Key=self.key,
+                UploadId=self.upload_id,
+                MultipartUpload={'Parts': parts}
+            )
+            reported_checksum = response.get('ChecksumSHA256')
+            if reported_checksum is not None and reported_checksum != composite_checksum(parts):
+                raise ValueError(f"Checksum reported by S3 for {self.key} does not match the uploaded parts")
+        self._buffer = bytearray()
+
+    def abort(self):
+        self._buffer = bytearray()
+        if self.upload_id is not None:
+            logger.info(f"Aborting multipart upload of {self.key} to bucket {self.bucket_name}")
+            # Let in-flight parts finish first, otherwise they can be stored after the abort
+            wait(self._part_uploads)
+            self.s3_client.abort_multipart_upload(Bucket=self.bucket_name, Key=self.key, UploadId=self.upload_id)
+            self.upload_id = None
+            self._part_uploads = []
+
+    def _submit_part(self, part: bytes):
+        if self.upload_id is None:
+            response = self.s3_client.create_multipart_upload(
+                Bucket=self.bucket_name,
+                Key=self.key,
+                ChecksumAlgorithm="SHA256",
+                Metadata=self.metadata
+            )
+            self.upload_id = response['UploadId']
+        # Limit the parts held in memory by waiting for an upload slot, and stop early if any upload has failed
+        while True:
+            in_flight = [u for u in self._part_uploads if not u.done()]
+            for upload in self._part_uploads:
+                if upload.done() and upload.exception() is not None:
+                    raise upload.exception()
+            if len(in_flight) < self.concurrency:
+                break
+            wait(in_flight, return_when=FIRST_COMPLETED)
+        part_number = len(self._part_uploads) + 1
+        self._parts_digest.update(part)
+        self._part_uploads.append(get_part_executor().submit(self._upload_part, part_number, part))
+
+    def _upload_part(self, part_number: int, part: bytes) -> dict:
+        part_checksum = base64.b64encode(hashlib.sha256(part).digest()).decode()
+        response = self.s3_client.upload_part(
+            Bucket=self.bucket_name,
+            Key=self.key,
+            UploadId=self.upload_id,
+            PartNumber=part_number,
+            Body=part,
+            ChecksumAlgorithm="SHA256",
+            ChecksumSHA256=part_checksum
+        )
+        return {'ETag': response['ETag'], 'PartNumber': part_number, 'ChecksumSHA256': part_checksum}
+
+
+_part_executor: ThreadPoolExecutor | None = None
+_part_executor_lock = threading.Lock()
+
+
+def get_part_executor() -> ThreadPoolExecutor:
+    global _part_executor
+    with _part_executor_lock:
+        if _part_executor is None:
+            _part_executor = ThreadPoolExecutor(max_workers=int(os.getenv('S3_MULTIPART_MAX_WORKERS', '16')),
+                                                thread_name_prefix='s3-part-upload')
+        return _part_executor
+
+
+def get_multipart_threshold() -> int:
+    "Files larger than this are sent as a multipart upload"
+    return int(os.getenv('S3_MULTIPART_THRESHOLD', str(16 * 1024 * 1024)))
+
+
+def get_part_size() -> int:
+    "Size of each part of a multipart upload, apart from the last"
+    return int(os.getenv('S3_PART_SIZE', str(8 * 1024 * 1024)))
+
+
+def composite_checksum(parts: list[dict]) -> str:
+    """
+    The checksum S3 gives a multipart object: the base 64 encoded SHA-256 of the concatenated part digests,
+    suffixed with the number of parts.
+    """
+    digests = b"".join(base64.b64decode(p['ChecksumSHA256']) for p in parts)
+    checksum = base64.b64encode(hashlib.sha256(digests).digest()).decode()
+    return f"{checksum}-{len(parts)}"
+
+
+def get_remaining_size(file: BytesIO) -> int:
+    "Number of bytes between the current position of a seekable file and its end"
+    position = file.tell()
+    size = file.seek(0, os.SEEK_END) - position
+    file.seek(position)
+    return size
+
+
 def file_exists(client: str | ClientConfig, file_name: str) -> bool:
     s3_service = S3Service.get_instance(client)
     return s3_service.file_exists_in_bucket(file_name)
 
 
+def find_existing_files(client: str | ClientConfig, file_names: Iterable[str]) -> set[str]:
+    s3_service = S3Service.get_instance(client)
+    return s3_service.find_existing_keys(file_names)
+
+
 def retrieve_file(client: str | ClientConfig, file_name: str):
     s3_service = S3Service.get_instance(client)
     return s3_service.read_file_from_s3_bucket(file_name)
 
 
+def open_file(client: str | ClientConfig, file_name: str,
+              byte_range: str | None = None, if_none_match: str | None = None) -> dict:
+    s3_service = S3Service.get_instance(client)
+    return s3_service.open_object(file_name, byte_range, if_none_match)
+
+
 def retrieve_file_url(client: str | ClientConfig, file_name: str):
     s3_service = S3Service.get_instance(client)
     logger.info(f"bucket name is {s3_service.client_config.bucket_name}")
@@ -187,14 +565,19 @@ def save(client: str | ClientConfig, file: BytesIO, file_name: str,
     return True
 
 
-def list_file_versions(client: str | ClientConfig, file_name: str):
+def open_object_writer(client: str | ClientConfig, file_name: str, metadata: dict | None = None) -> S3ObjectWriter:
+    s3_service = S3Service.get_instance(client)
+    return s3_service.open_object_writer(file_name, metadata)
+
+
+def list_file_versions(client: str | ClientConfig, file_name: str, max_versions: int | None = None) -> list[dict]:
     s3_service = S3Service.get_instance(client)
-    return s3_service.list_object_versions(file_name)
+    return s3_service.list_object_versions(file_name, max_versions)
 
 
-def delete_file_version(client: str | ClientConfig, file_name: str, version_id: str):
+def delete_file_versions(client: str | ClientConfig, versions: list[tuple[str, str]]) -> list[dict]:
     s3_service = S3Service.get_instance(client)
-    return s3_service.delete_object_version(file_name, version_id)
+    return s3_service.delete_object_versions(versions)
 
 
 class S3ServiceStatusReporter(StatusReporter):
@@ -1,3 +1,5 @@
+import inspect
+
 import structlog
 
 from src.utils.status_reporter import StatusReporter
@@ -8,12 +10,16 @@ logger = structlog.get_logger()
 
 async def get_status() -> StatusReport:
     """
-    Runs all available StatusReporters and returns a StatusReport with all outcomes.
+    Runs all available StatusReporters and returns a StatusReport with all outcomes. Reporters that check other
+    services over the network may be async, and are awaited.
     """
     report = StatusReport()
     for reporter in StatusReporter.__subclasses__():
         try:
-            report.services.append(reporter.get_status())
+            status = reporter.get_status()
+            if inspect.isawaitable(status):
+                status = await status
+            report.services.append(status)
         except Exception as error:
             logger.error(f'Error gathering {reporter.__class__.__name__} status {error.__class__.__name__} {error}')
             # Add a report for the failure to get a report
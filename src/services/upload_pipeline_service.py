@@ -0,0 +1,74 @@
+import asyncio
+import hashlib
+import os
+
+import structlog
+from fastapi import UploadFile
+
+from src.models.client_config import ClientConfig
+from src.services import async_storage_service, s3_service
+from src.services.clam_av_service import ClamAVService
+
+logger = structlog.get_logger()
+
+
+def pipeline_mode_enabled() -> bool:
+    """
+    Pipeline mode is switched on with environment variable UPLOAD_PIPELINE_MODE="true" (case insensitive).
+    """
+    return os.getenv('UPLOAD_PIPELINE_MODE', 'false').lower() == 'true'
+
+
+async def scan_and_save(client_config: ClientConfig,
+                        file: UploadFile,
+                        file_name: str,
+                        metadata: dict | None = None) -> tuple[str, tuple]:
+    """
+    Reads the uploaded file once, in fixed-size chunks, passing each chunk to the virus scan, the SHA-256 digest and
+    the S3 writer at the same time. The object is only committed to the bucket once the scan verdict shows no virus
+    was found, otherwise anything already sent to S3 is discarded. Reading and scanning the file must finish within
+    the virus scan timeout.
+
+    The verdict cache is not used, as the checksum it is keyed on is not known until the whole file has been read.
+
+    Returns the hex checksum (empty if the file was not saved) and an error status tuple, which is empty on success.
+    """
+    chunk_size = int(os.getenv('UPLOAD_PIPELINE_CHUNK_SIZE', str(1024 * 1024)))
+    digest = hashlib.sha256()
+    writer = None
+    committed = False
+    clam_av = ClamAVService.get_instance()
+
+    try:
+        async with clam_av.instream() as scan:
+            writer = await async_storage_service.run_blocking(s3_service.open_object_writer,
+                                                              client_config, file_name, metadata)
+            async with asyncio.timeout(clam_av.scan_timeout):
+                await asyncio.to_thread(file.file.seek, 0)
+                while chunk := await asyncio.to_thread(file.file.read, chunk_size):
+                    await asyncio.gather(
+                        scan.send(chunk),
+                        asyncio.to_thread(digest.update, chunk),
+                        async_storage_service.run_blocking(writer.write, chunk),
+                    )
+                status, message = await scan.finish()
+        if status != 200:
+            return "", (status, message)
+
+        checksum = digest.hexdigest()
+        await async_storage_service.run_blocking(writer.commit, checksum)
+        committed = True
+        return checksum, ()
+    except TimeoutError:
+        logger.error(f"Virus scan did not complete within {clam_av.scan_timeout} seconds")
+        return "", (500, 'Virus scan timed out')
+    except Exception as e:
+        logger.error(f"An {e.__class__.__name__} occurred while scanning and saving the file: {e}")
+        return "", (500, f"The file {file_name} could not be saved")
+    finally:
+        if writer is not None and not committed:
+            try:
+                await async_storage_service.run_blocking(writer.abort)
+            except Exception as e:
+                logger.error(f"An {e.__class__.__name__} occurred while discarding upload of {file_name}: {e}")
+        await asyncio.to_thread(file.file.seek, 0)
@@ -0,0 +1,104 @@
+import asyncio
+import os
+import time
+
+import structlog
+
+from src.middleware import auth
+from src.models.status_report import ServiceObservations, Category
+from src.services import audit_service, client_config_service
+from src.services.clam_av_service import ClamAVService
+from src.services.s3_service import S3Service
+from src.utils.status_reporter import StatusReporter
+
+"""
+Builds the caches, clients and connections that are otherwise built on first use, so the first requests after a
+deploy or scaling event do not wait for them. The service only reports itself ready once warm-up has finished.
+"""
+
+logger = structlog.get_logger()
+
+# Outcome of each warm-up step, set once warm-up has finished
+_step_outcomes: dict[str, bool] = {}
+_finished = False
+
+
+async def warm_up():
+    """
+    Runs every warm-up step concurrently. A step that fails is logged and left to happen on first use instead, so
+    warm-up never prevents the service starting.
+    """
+    global _finished
+    started = time.monotonic()
+    steps = {
+        'client_configs': warm_up_client_configs,
+        'audit': warm_up_audit,
+        'antivirus': warm_up_antivirus,
+        'authentication': warm_up_authentication,
+    }
+    outcomes = await asyncio.gather(*(run_step(name, step) for name, step in steps.items()))
+    _step_outcomes.update(zip(steps, outcomes))
+    _finished = True
+    logger.info(f"Warm-up finished in {time.monotonic() - started:.2f} seconds: {_step_outcomes}")
+
+
+async def run_step(name: str, step) -> bool:
+    "Runs one warm-up step, counting it as failed if it raises or does not finish within WARM_UP_STEP_TIMEOUT"
+    timeout = float(os.getenv('WARM_UP_STEP_TIMEOUT', '20'))
+    try:
+        await asyncio.wait_for(step(), timeout)
+        return True
+    except TimeoutError:
+        logger.error(f"Warm-up step {name} did not finish within {timeout} seconds")
+        return False
+    except Exception as e:
+        logger.error(f"Warm-up step {name} failed: {e.__class__.__name__} {e}")
+        return False
+
+
+async def warm_up_client_configs():
+    "Loads every client config, and creates the S3 client and the S3Service for each client"
+    configs = await asyncio.to_thread(client_config_service.load_all_configs)
+    await asyncio.to_thread(S3Service.get_s3_client)
+    for config in configs:
+        S3Service.get_instance(config)
+    logger.info(f"Loaded {len(configs)} client configs")
+
+
+async def warm_up_audit():
+    await asyncio.to_thread(audit_service.AuditService.get_instance)
+
+
+async def warm_up_antivirus():
+    clam_av = ClamAVService.get_instance()
+    reachable = await clam_av.warm_up()
+    if reachable == 0:
+        raise ConnectionError(f"None of {len(clam_av.endpoints)} clamd endpoints could be reached")
+
+
+async def warm_up_authentication():
+    if not os.getenv('TENANT_ID'):
+        logger.info("No TENANT_ID set, skipping fetch of token signing keys")
+        return
+    await asyncio.to_thread(auth.prefetch_signing_keys)
+
+
+def is_finished() -> bool:
+    return _finished
+
+
+class WarmUpStatusReporter(StatusReporter):
+
+    @classmethod
+    def get_status(cls) -> ServiceObservations:
+        """
+        Complete once warm-up has finished, whether or not each step succeeded.
+
+        The outcome of each step is included in the details.
+        """
+        checks = ServiceObservations(label='warm_up')
+        complete = checks.add_check('complete')
+        if _finished:
+            complete.category = Category.success
+        checks.details['steps'] = dict(_step_outcomes)
+        return checks
@@ -0,0 +1,66 @@
+from typing import BinaryIO, Iterator
+
+"""
+Splits a text file into chunks of whole records, so each chunk can be read on its own and give the same rows as
+reading the file in one go.
+"""
+
+
+def read_chunks(file: BinaryIO, chunk_size: int, delimiter: bytes | None = None) -> Iterator[bytes]:
+    """
+    Reads the file chunk_size bytes at a time, yielding the data read up to the last line end, so each chunk
+    is about chunk_size bytes. When a CSV delimiter is given, a chunk only ends at a line end outside a quoted
+    field, so a value spanning lines is never split.
+    """
+    pending = b""
+    while True:
+        data = file.read(chunk_size)
+        if not data:
+            if pending:
+                yield pending
+            return
+        pending += data
+        if len(pending) < chunk_size:
+            continue
+        end = last_record_end(pending, delimiter)
+        if end:
+            yield pending[:end]
+            pending = pending[end:]
+
+
+def last_record_end(data: bytes, delimiter: bytes | None = None) -> int:
+    """
+    Returns the position just after the last line end in data that ends a record, or 0 if there is none. The data
+    must start at the start of a record.
+
+    Quotes are handled as csv.reader does by default: a quote at the start of a field opens a quoted field, a pair
+    of quotes inside one is an escaped quote, and any other quote outside a quoted field is part of the value.
+    Without a delimiter, every line end ends a record.
+    """
+    if delimiter is None:
+        return data.rfind(b"\n") + 1
+
+    end = 0
+    # Start of the current stretch of data outside a quoted field
+    outside_from = 0
+    in_quotes = False
+    position = data.find(b'"')
+    while position != -1:
+        if in_quotes:
+            following = data[position + 1:position + 2]
+            if following == b'"':
+                position = data.find(b'"', position + 2)
+                continue
+            if not following:
+                # Whether the quote closes the field depends on data not read yet
+                return end
+            in_quotes = False
+            outside_from = position + 1
+        elif position == 0 or data[position - 1] in b"\r\n" or data.endswith(delimiter, 0, position):
+            end = max(end, data.rfind(b"\n", outside_from, position) + 1)
+            in_quotes = True
+        position = data.find(b'"', position + 1)
+
+    if in_quotes:
+        return end
+    return max(end, data.rfind(b"\n", outside_from) + 1)
@@ -6,7 +6,8 @@ class StatusReporter:
     Implemented in components whose state or behaviour can be configured, to enable reporting of the health or status
     of the component, and hence also the parent service.
 
-    Subclasses of this are gathered and used for status reporting of the overall service.
+    Subclasses of this are gathered and used for status reporting of the overall service. A subclass checking another
+    service over the network may implement get_status as an async method, so the check does not block the event loop.
     """
     # Used in the human-readable status report
     label = 'status'
@@ -1,29 +1,121 @@
+import functools
 import inspect
-from typing import Any, Dict
+import os
+import threading
+from typing import Any, Dict, Sequence
 
 import structlog
+from cachetools import LRUCache
 from fastapi import UploadFile
 
 from src.models.file_validator_spec import FileValidatorSpec, FileCollectionValidatorSpec
-from src.validation.file_validator import FileValidator, ValidatorNotFoundError
+from src.validation.file_validator import (FileValidator, ValidatorNotFoundError, InvalidValidatorArgumentsError,
+                                           ValidatorCost)
 from src.validation.file_collection_validator import FileCollectionValidator
+# Imported so its validator is registered as a FileValidator subclass
+from src.validation import suspicious_content_validator  # noqa: F401
 
 logger = structlog.get_logger()
 
+# Validator classes by name, filled on first lookup
+_validator_classes: dict[str, type[FileValidator] | type[FileCollectionValidator]] = {}
+
+
+def get_validator_class(validator_name: str) -> type[FileValidator] | type[FileCollectionValidator]:
+    """
+    Returns a validator class by name, raising a ValidatorNotFoundError if the validator is not found.
+    """
+    if validator_name not in _validator_classes:
+        # Rebuilt on a miss, so validators defined after the first lookup are still found
+        for validator in FileValidator.__subclasses__() + FileCollectionValidator.__subclasses__():
+            _validator_classes[validator.__name__] = validator
+
+    if validator_name not in _validator_classes:
+        logger.error(f"Validator {validator_name} not found in {sorted(_validator_classes)}")
+        raise ValidatorNotFoundError(f"Validator {validator_name} not found")
+    return _validator_classes[validator_name]
+
 
 def get_validator(validator_name: str) -> FileValidator | FileCollectionValidator:
     """
     Returns a validator instance by name, raising a ValidatorNotFoundError if the validator is not found.
     """
-    validators = {}
-    # Change things so list is only created once? (Possibly create global list with all validators)
-    for validator in FileValidator.__subclasses__() + FileCollectionValidator.__subclasses__():
-        validators[validator.__name__] = validator
+    return get_validator_class(validator_name)()
 
-    if validator_name not in validators:
-        logger.error(f"Validator {validator_name} not found in {validators}")
-        raise ValidatorNotFoundError(f"Validator {validator_name} not found")
-    return validators[validator_name]()
+
+class CompiledValidator:
+    """
+    A client-configured validator ready to run: an instance of the validator with the arguments from its spec
+    already checked and bound. Each client's validators are compiled once, by get_validator_chain, so running them
+    needs no lookup or introspection per file.
+    """
+    __slots__ = ('name', 'validator', 'validate', 'is_async')
+
+    def __init__(self, validator_spec: FileValidatorSpec | FileCollectionValidatorSpec):
+        validator_type = FileCollectionValidator if isinstance(validator_spec, FileCollectionValidatorSpec) \
+            else FileValidator
+        validator_class = get_validator_class(validator_spec.name)
+        if not issubclass(validator_class, validator_type):
+            raise ValidatorNotFoundError(f"Validator {validator_spec.name} is not a {validator_type.__name__}")
+
+        self.name = validator_spec.name
+        self.validator = validator_class()
+        signature = inspect.signature(self.validator.validate)
+        # Every validate method takes **kwargs, so binding alone would accept any argument name
+        named_parameters = [name for name, parameter in signature.parameters.items()
+                            if parameter.kind in (parameter.POSITIONAL_OR_KEYWORD, parameter.KEYWORD_ONLY)]
+        unknown_arguments = [name for name in validator_spec.validator_kwargs if name not in named_parameters]
+        if unknown_arguments:
+            raise InvalidValidatorArgumentsError(f"Invalid arguments for validator {self.name}: unexpected "
+                                                 f"{unknown_arguments}, expected from {named_parameters[1:]}")
+        try:
+            # Placeholder for the file or files, so only the configured arguments are checked
+            signature.bind(None, **validator_spec.validator_kwargs)
+        except TypeError as e:
+            raise InvalidValidatorArgumentsError(f"Invalid arguments for validator {self.name}: {e}")
+        self.validate = functools.partial(self.validator.validate, **validator_spec.validator_kwargs)
+        self.is_async = inspect.iscoroutinefunction(self.validator.validate)
+
+    @property
+    def continue_to_next_validator_on_fail(self) -> bool:
+        return self.validator.continue_to_next_validator_on_fail
+
+    @property
+    def cost(self) -> ValidatorCost:
+        return self.validator.cost
+
+
+def compile_validators(
+            validator_specs: Sequence[FileValidatorSpec | FileCollectionValidatorSpec | CompiledValidator]
+        ) -> tuple[CompiledValidator, ...]:
+    """
+    Compiles validator specs into a chain of validators to run in order, raising a ValidatorNotFoundError or
+    InvalidValidatorArgumentsError if a spec is misconfigured. Validators that are already compiled are kept as-is.
+    """
+    return tuple(spec if isinstance(spec, CompiledValidator) else CompiledValidator(spec) for spec in validator_specs)
+
+
+# Compiled chains by the names and arguments of their validators, shared by every config with the same validators
+_validator_chains = LRUCache(maxsize=int(os.getenv('VALIDATOR_CHAIN_CACHE_SIZE', '1000')))
+_validator_chains_lock = threading.Lock()
+
+
+def get_validator_chain(
+            validator_specs: Sequence[FileValidatorSpec | FileCollectionValidatorSpec]
+        ) -> tuple[CompiledValidator, ...]:
+    """
+    Returns the compiled chain for a client config's validator specs, compiling it the first time the specs are seen.
+    The chain is looked up by the specs themselves, so it follows any change to the config's validators. Raises a
+    ValidatorNotFoundError or InvalidValidatorArgumentsError if a spec is misconfigured.
+    """
+    key = tuple((type(spec).__name__, spec.name, repr(spec.validator_kwargs)) for spec in validator_specs)
+    with _validator_chains_lock:
+        chain = _validator_chains.get(key)
+    if chain is None:
+        chain = compile_validators(validator_specs)
+        with _validator_chains_lock:
+            _validator_chains[key] = chain
+    return chain
 
 
 def get_validator_validate_docstring(validator: FileValidator) -> tuple[str, str]:
@@ -77,7 +169,8 @@ def get_kwargs_for_filevalidator(validator: str | FileValidator) -> Dict[str, An
     return validator_kwargs
 
 
-async def validate_file(file_object: UploadFile, validator_specs: list[FileValidatorSpec]) -> tuple[int, str | list]:
+async def validate_file(file_object: UploadFile,
+                        validator_specs: Sequence[FileValidatorSpec | CompiledValidator]) -> tuple[int, str | list]:
     """
     Validates the file object against a list of validators,
 
@@ -110,7 +203,8 @@ async def validate_file(file_object: UploadFile, validator_specs: list[FileValid
 
 
 async def validate_file_collection(files: list[UploadFile],
-                                   validator_specs: list[FileCollectionValidatorSpec]) -> list[tuple[int, str | list]]:
+                                   validator_specs: Sequence[FileCollectionValidatorSpec | CompiledValidator]
+                                   ) -> list[tuple[int, str | list]]:
     """
     Validates the list of file objects against a list of validators.
 
@@ -142,34 +236,39 @@ async def validate_file_collection(files: list[UploadFile],
 
 
 async def validate(validation_target: UploadFile | list[UploadFile],
-                   validator_specs: list[FileValidatorSpec | FileCollectionValidatorSpec]) -> list[tuple[int, str]]:
+                   validator_specs: Sequence[FileValidatorSpec | FileCollectionValidatorSpec | CompiledValidator]
+                   ) -> list[tuple[int, str]]:
     """
     Run list of client-configured validators which can include either file validators or file-collection validators
     but not a combination of both. Need to be approprate for the type of validation_target:
        When target is UploadFile, validators must be FileValidatorSpec
        When target is list[UploadFile], validators must be FileCollectionValidatorSpec
+    Validators compiled with the client config are run as they are, any specs are compiled first.
     """
     errors_found = []
-    for validator_spec in validator_specs:
-        validator = get_validator(validator_spec.name)
-        validator_kwargs = validator_spec.validator_kwargs
-        try:
-            if inspect.iscoroutinefunction(validator.validate):
-                status, detail = await validator.validate(validation_target, **validator_kwargs)
-            else:
-                status, detail = validator.validate(validation_target, **validator_kwargs)
-            if status != 200:
-                errors_found.append((status, detail))
-                if not validator.continue_to_next_validator_on_fail:
-                    break
-        except Exception as e:
-            logger.error(f"Error while running validator {validator.__class__.__name__}: {e}")
-            errors_found.append((500, "Internal error handling file"))
+    for validator in compile_validators(validator_specs):
+        status, detail = await run_validator(validation_target, validator)
+        if status != 200:
+            errors_found.append((status, detail))
             if not validator.continue_to_next_validator_on_fail:
                 break
     return errors_found if errors_found else [(200, "")]
 
 
+async def run_validator(validation_target: UploadFile | list[UploadFile],
+                        validator: CompiledValidator) -> tuple[int, str]:
+    """
+    Runs a single client-configured validator, reporting any unexpected exception as a 500 result.
+    """
+    try:
+        if validator.is_async:
+            return await validator.validate(validation_target)
+        return validator.validate(validation_target)
+    except Exception as e:
+        logger.error(f"Error while running validator {validator.name}: {e}")
+        return 500, "Internal error handling file"
+
+
 def get_status_code_for_response(validation_results: list[tuple[int, str]]) -> int:
     """
     From list of validation results, pick status code to respresent
@@ -2,6 +2,8 @@ import abc
 from typing import Iterable
 from fastapi import UploadFile
 
+from src.validation.file_validator import ValidatorCost
+
 """
 These validators concern collections of files, not individual files.
 Created for use with bulk_upload endpoint.
@@ -13,6 +15,8 @@ class FileCollectionValidator(abc.ABC):
     # i.e. if there is a sequence of validators, whether to proceed to the next validator
     # or to end the sequence.
     continue_to_next_validator_on_fail = False
+    # Collection validators only use the number and sizes of the files
+    cost = ValidatorCost.METADATA
 
     def validate(self, files: Iterable[UploadFile], **kwargs) -> tuple[int, str]:
         # Could change files parameter to also accept Iterable[str] to enable support
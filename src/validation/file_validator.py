@@ -1,4 +1,5 @@
 import abc
+import enum
 import os
 from typing import Tuple, List
 
@@ -16,11 +17,26 @@ class InvalidValidatorArgumentsError(Exception):
     pass
 
 
+class ValidatorCost(enum.IntEnum):
+    """
+    How expensive a validator is to run, so cheaper validators can be run first and reject a file before the
+    expensive ones start.
+    """
+    # Only uses the filename, size or content type
+    METADATA = 1
+    # Reads the file content
+    CONTENT = 2
+    # Sends the file to another service
+    EXTERNAL_SERVICE = 3
+
+
 class FileValidator(abc.ABC):
     # Boolean below used to specify expected run behaviour when validator has "fail" result,
     # i.e. if there is a sequence of validators, whether to proceed to the next validator
     # or to end the sequence.
     continue_to_next_validator_on_fail = False
+    # Assumed to read the file content unless the validator says otherwise
+    cost = ValidatorCost.CONTENT
 
     def validate(self, file_object: UploadFile, **kwargs) -> Tuple[int, str]:
         """
@@ -36,6 +52,7 @@ class FileValidator(abc.ABC):
 
 class MaxFileSize(FileValidator):
     continue_to_next_validator_on_fail = True
+    cost = ValidatorCost.METADATA
 
     def validate(self, file_object, size: int, **kwargs) -> Tuple[int, str]:
         """
@@ -59,6 +76,7 @@ class MaxFileSize(FileValidator):
 
 class MinFileSize(FileValidator):
     continue_to_next_validator_on_fail = True
+    cost = ValidatorCost.METADATA
 
     def validate(self, file_object, size: int, **kwargs) -> Tuple[int, str]:
         """
@@ -82,6 +100,7 @@ class MinFileSize(FileValidator):
 
 class AllowedFileExtensions(FileValidator):
     continue_to_next_validator_on_fail = True
+    cost = ValidatorCost.METADATA
 
     def validate(self, file_object, extensions: List[str] = list, **kwargs) -> Tuple[int, str]:
         """
@@ -106,6 +125,7 @@ class AllowedFileExtensions(FileValidator):
 
 class DisallowedFileExtensions(FileValidator):
     continue_to_next_validator_on_fail = True
+    cost = ValidatorCost.METADATA
 
     def validate(self, file_object, extensions: List[str] = list, **kwargs) -> Tuple[int, str]:
         """
@@ -127,6 +147,7 @@ class DisallowedFileExtensions(FileValidator):
 
 class DisallowedMimetypes(FileValidator):
     continue_to_next_validator_on_fail = True
+    cost = ValidatorCost.METADATA
 
     def validate(self, file_object, content_types: List[str] = list, **kwargs) -> Tuple[int, str]:
         """
@@ -153,6 +174,7 @@ class DisallowedMimetypes(FileValidator):
 
 class AllowedMimetypes(FileValidator):
     continue_to_next_validator_on_fail = True
+    cost = ValidatorCost.METADATA
 
     def validate(self, file_object, content_types: List[str] = list, **kwargs) -> Tuple[int, str]:
         """
@@ -3,9 +3,9 @@ from fastapi import UploadFile
 import re
 import structlog
 from typing import Tuple, Iterable
-import io
 import inspect
 from src.services.clam_av_service import virus_check
+from src.validation.file_validator import ValidatorCost
 
 
 logger = structlog.get_logger()
@@ -13,6 +13,9 @@ logger = structlog.get_logger()
 
 class MandatoryFileValidator(abc.ABC):
     """Base class for validators that always run and are not client-configurable."""
+    # Assumed to read the file content unless the validator says otherwise
+    cost = ValidatorCost.CONTENT
+
     def validate(self, file_object: UploadFile) -> Tuple[int, str]:
         """
         Runs the validator on the file object and returns a status code and a message.
@@ -25,6 +28,8 @@ class MandatoryFileValidator(abc.ABC):
 
 
 class HaveFile(MandatoryFileValidator):
+    cost = ValidatorCost.METADATA
+
     def validate(self, file_object: UploadFile, **kwargs) -> Tuple[int, str]:
         """
         Validate that we have a file object with a filename.
@@ -36,18 +41,22 @@ class HaveFile(MandatoryFileValidator):
 
 
 class NoVirusFoundInFile(MandatoryFileValidator):
-    async def validate(self, file_object: UploadFile, **kwargs) -> Tuple[int, str]:
+    cost = ValidatorCost.EXTERNAL_SERVICE
+
+    async def validate(self, file_object: UploadFile, checksum: str = "", **kwargs) -> Tuple[int, str]:
         """
-        Runs Clam AV virus scan
+        Runs Clam AV virus scan, streaming the file content to the scanner as it is read.
+        If the SHA-256 checksum is given, a cached clean verdict for the same content may be used instead.
         """
-        file_content = await file_object.read()
-        status, message = await virus_check(io.BytesIO(file_content))
+        status, message = await virus_check(file_object, checksum)
         # Return file reference point to start to make subsequent read possible
         await file_object.seek(0)
         return status, message
 
 
 class NoUrlInFilename(MandatoryFileValidator):
+    cost = ValidatorCost.METADATA
+
     def validate(self, file_object, **kwargs) -> Tuple[int, str]:
         """
         Validates that the filename does not contain any URLs.
@@ -69,6 +78,8 @@ class NoUrlInFilename(MandatoryFileValidator):
 
 
 class NoDirectoryPathInFilename(MandatoryFileValidator):
+    cost = ValidatorCost.METADATA
+
     def validate(self, file_object, **kwargs) -> Tuple[int, str]:
         """
         Validates that the filename does not contain directory path separators.
@@ -83,6 +94,8 @@ class NoDirectoryPathInFilename(MandatoryFileValidator):
 
 
 class NoWindowsVolumeInFilename(MandatoryFileValidator):
+    cost = ValidatorCost.METADATA
+
     def validate(self, file_object, **kwargs) -> Tuple[int, str]:
         """
         Validates that the filename does not contain Windows volume information (e.g., C:\\ or D:/).
@@ -98,6 +111,8 @@ class NoWindowsVolumeInFilename(MandatoryFileValidator):
 
 
 class NoUnacceptableCharactersInFilename(MandatoryFileValidator):
+    cost = ValidatorCost.METADATA
+
     def validate(self, file_object, **kwargs) -> Tuple[int, str]:
         """
         Validates that the filename does not contain unacceptable characters (based on AWS S3 docs).
@@ -139,32 +154,25 @@ def get_ordered_validators(run_order: Iterable[MandatoryFileValidator] = ()):
     return priority_validators + validators
 
 
-# Unspecified MandatoryFileValidator validators are also included but in default arbitrary order
-validator_classes_in_run_order = get_ordered_validators((HaveFile, NoVirusFoundInFile))
+# HaveFile first, then cheapest first, so the virus scan only runs once every other check has passed. Validators of
+# the same cost are run in default arbitrary order
+validator_classes_in_run_order = sorted(get_ordered_validators((HaveFile,)), key=lambda v: v.cost)
 
 
 async def run_selected_validators(file_object: UploadFile,
-                                  validators: Iterable[MandatoryFileValidator]) -> Tuple[int, str]:
+                                  validators: Iterable[MandatoryFileValidator],
+                                  **kwargs) -> Tuple[int, str]:
     for validator_class in validators:
         validator = validator_class()
         if inspect.iscoroutinefunction(validator.validate):
-            status, detail = await validator.validate(file_object)
+            status, detail = await validator.validate(file_object, **kwargs)
         else:
-            status, detail = validator.validate(file_object)
+            status, detail = validator.validate(file_object, **kwargs)
         if status != 200:
             return status, detail
     return 200, ""
 
 
-async def run_mandatory_validators(file_object: UploadFile) -> Tuple[int, str]:
-    """
-    This runs all mandatory validators, including virus scan. Intended for use
-    with file upload to S3.
-    """
-    result = await run_selected_validators(file_object, validator_classes_in_run_order)
-    return result
-
-
 async def run_virus_check(file_object: UploadFile) -> Tuple[int, str]:
     """
     This only runs the file validators particularly concerned with the virus scan.
@@ -0,0 +1,97 @@
+import threading
+from typing import Iterable
+
+from src.models.status_report import Category, ServiceObservations
+from src.utils.status_reporter import StatusReporter
+
+"""
+Figures gathered while scanning for suspicious content. Each scan has its own ScanStats, so scans can run at the
+same time, in threads or processes, without mixing their figures. The figures of every scan are added to totals
+for the process, reported in the service status.
+"""
+
+
+class CheckerStats:
+    "Figures for one checker"
+    __slots__ = ('values', 'characters', 'seconds')
+
+    def __init__(self):
+        self.values = 0
+        self.characters = 0
+        # Time spent checking values one at a time. Values passed by a block scan are not timed per checker.
+        self.seconds = 0.0
+
+    def add(self, values: int, characters: int, seconds: float = 0.0):
+        self.values += values
+        self.characters += characters
+        self.seconds += seconds
+
+    def get_details(self) -> dict:
+        return {'values': self.values, 'characters': self.characters, 'seconds': round(self.seconds, 3)}
+
+
+class ScanStats:
+    "Figures for a scan, or for several scans added together"
+
+    def __init__(self, checker_names: Iterable[str]):
+        self.checkers = {name: CheckerStats() for name in checker_names}
+        self.scans = 0
+        # Time spent scanning blocks of values for all the checkers at once
+        self.block_seconds = 0.0
+
+    def record_check(self, checker_name: str, characters: int, seconds: float):
+        "Records a value checked by one checker"
+        self.checkers[checker_name].add(1, characters, seconds)
+
+    def record_passed(self, values: int, characters: int):
+        "Records values that passed every checker without each checker being run on them"
+        for checker_stats in self.checkers.values():
+            checker_stats.add(values, characters)
+
+    def add(self, other: 'ScanStats'):
+        for name, other_checker_stats in other.checkers.items():
+            checker_stats = self.checkers.setdefault(name, CheckerStats())
+            checker_stats.add(other_checker_stats.values, other_checker_stats.characters, other_checker_stats.seconds)
+        self.block_seconds += other.block_seconds
+
+    def get_counts(self) -> dict[str, int]:
+        "Returns the number of values checked by each checker"
+        return {name: checker_stats.values for name, checker_stats in self.checkers.items()}
+
+    def get_details(self) -> dict[str, dict]:
+        details = {name: checker_stats.get_details() for name, checker_stats in self.checkers.items()}
+        details['scans'] = {'count': self.scans, 'block_seconds': round(self.block_seconds, 3)}
+        return details
+
+
+_totals = ScanStats([])
+_totals_lock = threading.Lock()
+
+
+def record_scan(stats: ScanStats):
+    "Adds the figures of a finished scan to the totals for the process"
+    with _totals_lock:
+        _totals.add(stats)
+        _totals.scans += 1
+
+
+def get_totals() -> dict[str, dict]:
+    with _totals_lock:
+        return _totals.get_details()
+
+
+class SuspiciousContentScanStatusReporter(StatusReporter):
+    label = 'suspicious_content_scan'
+
+    @classmethod
+    def get_status(cls) -> ServiceObservations:
+        """
+        Always available, as scans run in the service itself.
+
+        The totals of the scans run by this process are included in the details: for each checker, the values
+        checked, their length in characters and the time spent checking values one at a time.
+        """
+        checks = ServiceObservations(label=cls.label)
+        checks.add_check('available').category = Category.success
+        checks.details.update(get_totals())
+        return checks
@@ -1,43 +1,89 @@
-from typing import Tuple, Iterable, Any, Iterator, TextIO
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from typing import Tuple, Iterable, Any, Iterator, TextIO, Sequence, NamedTuple
+import bisect
 import csv
+import itertools
+import re
+import time
 import structlog
 import codecs
+from xml.etree import ElementTree
 from fastapi import UploadFile
-from src.validation.file_validator import FileValidator
-from src.validation.text_checkers import text_checkers
+from src.utils.record_chunks import read_chunks
+from src.validation.scan_stats import ScanStats, record_scan
+from src.validation.file_validator import FileValidator, ValidatorCost
+from src.validation.text_checkers import text_checkers, cell_separator
 from src.validation.text_checkers import StringCheck
+from src.validation.xml_value_reader import XmlValueReader, read_blocks
 
 
 logger = structlog.get_logger()
 
+# Number of rows whose values are joined into one block and scanned at once
+scan_batch_rows = 1000
+
+# Files of at least SCAN_PARALLEL_THRESHOLD bytes are scanned in chunks of SCAN_CHUNK_SIZE bytes in the scan process
+# pool, which has SCAN_MAX_WORKERS processes. Every API process has its own pool, and the container's CPU limit may
+# be well below the host's CPU count, so the pool is kept small unless configured otherwise
+parallel_scan_threshold = int(os.getenv('SCAN_PARALLEL_THRESHOLD', str(2 * 1024 * 1024)))
+scan_chunk_size = int(os.getenv('SCAN_CHUNK_SIZE', str(1024 * 1024)))
+_max_workers = int(os.getenv('SCAN_MAX_WORKERS', '2'))
+_executor: ProcessPoolExecutor | None = None
+
+
+class ScanOutcome(NamedTuple):
+    "Outcome of scanning a file, or one chunk of it"
+    status_code: int
+    # The checker's message if a value has a problem, otherwise the full message
+    message: str
+    # Index of the row with a problem, counted from the start of the content scanned
+    row_index: int | None
+    rows_read: int
+    stats: ScanStats
+    # Path of the element or attribute with a problem, when XML is parsed
+    element_path: str | None = None
+
 
 class ScanForSuspiciousContent(FileValidator):
+    cost = ValidatorCost.CONTENT
     all_scan_types: list[str] = list(text_checkers.keys())
     xml_scan_types: list[str] = [e for e in all_scan_types if e != "html_tag_check"]
 
-    def validate(self,
-                 file_object: UploadFile,
-                 delimiter: str = ",",
-                 xml_mode: bool = False,
-                 scan_types: Iterable[str] | None = None,
-                 **kwargs) -> Tuple[int, str]:
+    async def validate(self,
+                       file_object: UploadFile,
+                       delimiter: str = ",",
+                       xml_mode: bool = False,
+                       scan_types: Iterable[str] | None = None,
+                       parse_xml: bool = False,
+                       **kwargs) -> Tuple[int, str]:
         """
         Scans file for potentially malicious content
 
+        Files of at least SCAN_PARALLEL_THRESHOLD bytes are split into chunks of whole records and scanned in a
+        process pool, so a large file does not hold up the event loop. The result is the same either way.
+        Parsed XML cannot be split, so a large XML file is scanned in a thread instead.
+
         :param file_object: should be a text file
         :param delimiter: delimiter used in CSV file - optional, defaults to comma
         :param xml_mode: xml file scan when true.
         :param scan_types: optional iterable of chosen scan types. All supplied values must be valid
                            otherwise the scan will return a 400 error. Defaults to all scan types if
-                           xml_mode is False, but default excludes html_tag_check when xml_mode is True.
+                           xml_mode is False, but default excludes html_tag_check when xml_mode is True
+                           and parse_xml is False.
                            Note when manually specified, html_tag_check will run in xml_mode but will
                            almost certainly result in "fail" result because xml files typically include
-                           tags. Also if scan_type is repeated, it will still only run once.
+                           tags, unless parse_xml is True. Also if scan_type is repeated, it will still
+                           only run once.
+        :param parse_xml: in xml_mode, parse the XML and scan only its text and attribute values rather
+                          than each line. A problem is reported with the path of its element or attribute,
+                          e.g. /claims/claim/@id, rather than its row.
         :return: status_code: int, detail: str
         """
-        status_code = 200
-        message = ""
-
         if scan_types:
             invalid_scan_types = self.find_invalid_scan_types(scan_types)
             if invalid_scan_types:
@@ -46,38 +92,37 @@ class ScanForSuspiciousContent(FileValidator):
                              f" Must be from: {self.all_scan_types}.")
         else:
             scan_types = self.all_scan_types
-            if xml_mode:
+            if xml_mode and not parse_xml:
                 scan_types = self.xml_scan_types
 
         # each checker only included once even if listed more than once in scan_types
         checkers = get_checkers_from_scan_types(scan_types)
 
-        if xml_mode:
-            reader = line_reader
+        parse_xml = xml_mode and parse_xml
+        is_large = file_object.size is not None and file_object.size >= parallel_scan_threshold
+        if is_large and parse_xml:
+            outcome = await asyncio.to_thread(scan_content, file_object.file, file_object.filename, delimiter,
+                                              xml_mode, checkers, parse_xml)
+        elif is_large:
+            scan_types = [checker.name for checker in checkers]
+            try:
+                outcome = await scan_in_parallel(file_object, delimiter, xml_mode, scan_types)
+            except Exception as exc_err:
+                logger.error(f"Error checking file {file_object.filename}: {exc_err.__class__.__name__} {exc_err}")
+                if isinstance(exc_err, BrokenProcessPool):
+                    shutdown_executor()
+                outcome = ScanOutcome(500, f"Unexpected error when processing {file_object.filename}. ",
+                                      None, 0, ScanStats(scan_types))
         else:
-            reader = csv.reader
+            outcome = scan_content(file_object.file, file_object.filename, delimiter, xml_mode, checkers, parse_xml)
 
-        try:
-            # reader needs iterable that returns strings but FastAPI file_object.file
-            # returns bytes. codecs.iterdecode conveniently converts the byte values to str
-            # whilst retaining line-by-line iteration.
-            row_reader = reader(codecs.iterdecode(file_object.file, 'utf-8'), delimiter=delimiter)
-            for ri, row in enumerate(row_reader):
-                status_code, message = check_row_values(row, checkers)
-                if status_code != 200:
-                    message = f"Problem in {file_object.filename} row {ri} - {message}. "
-                    break
-        except (csv.Error, UnicodeDecodeError) as csv_err:
-            logger.error(f"ScanForMaliciousContent unable to process {file_object.filename}: "
-                         f"{csv_err.__class__.__name__} {csv_err}")
-            status_code = 400
-            message = f"Unable to process {file_object.filename}. Is it a valid file? "
-        except Exception as exc_err:
-            logger.error(f"Error checking file {file_object.filename}: {exc_err.__class__.__name__} {exc_err}")
-            status_code = 500
-            message = f"Unexpected error when processing {file_object.filename}. "
-        counts = {c.name: c.execution_count for c in checkers}
-        return status_code, message + f"Scans run: {counts}"
+        record_scan(outcome.stats)
+        message = outcome.message
+        if outcome.element_path is not None:
+            message = f"Problem in {file_object.filename} element {outcome.element_path} - {message}. "
+        elif outcome.row_index is not None:
+            message = f"Problem in {file_object.filename} row {outcome.row_index} - {message}. "
+        return outcome.status_code, message + f"Scans run: {outcome.stats.get_counts()}"
 
     def find_invalid_scan_types(self, scan_types: Iterable[str]) -> list[str]:
         return [st for st in scan_types if st not in self.all_scan_types]
@@ -87,7 +132,6 @@ def get_checkers_from_scan_types(scan_types: Iterable[str]) -> list[StringCheck]
     checkers = []
     for scan_type, checker in text_checkers.items():
         if scan_type in scan_types:
-            checker.execution_count = 0
             checkers.append(checker)
     return checkers
 
@@ -98,21 +142,255 @@ def line_reader(file: TextIO, **kwargs) -> Iterator[list[str]]:
         yield [row.strip()]
 
 
-def check_row_values(row_values: Iterable[Any], checkers: list[StringCheck]) -> Tuple[int, str]:
+def scan_content(lines: Iterable[bytes],
+                 filename: str,
+                 delimiter: str,
+                 xml_mode: bool,
+                 checkers: list[StringCheck],
+                 parse_xml: bool = False) -> ScanOutcome:
+    "Reads rows from lines of UTF-8 text, or the values of parsed XML, and scans them"
+    if xml_mode:
+        reader = line_reader
+    else:
+        reader = csv.reader
+
+    stats = ScanStats(checker.name for checker in checkers)
+    element_path = None
+    # Advanced once for each row read, so the next value is the number of rows read
+    row_counter = itertools.count()
+    try:
+        if parse_xml:
+            # The parser works out the encoding itself. Only the rows of the current batch can have a problem,
+            # so only their paths are kept.
+            row_reader = XmlValueReader(read_blocks(lines), paths_kept=scan_batch_rows)
+        else:
+            # reader needs iterable that returns strings but FastAPI file_object.file
+            # returns bytes. codecs.iterdecode conveniently converts the byte values to str
+            # whilst retaining line-by-line iteration.
+            row_reader = reader(codecs.iterdecode(lines, 'utf-8'), delimiter=delimiter)
+        rows = (row for row, _ in zip(row_reader, row_counter))
+        status_code, message, ri = scan_rows(rows, checkers, stats)
+        if parse_xml and ri is not None:
+            element_path, ri = row_reader.get_path(ri), None
+    except (csv.Error, UnicodeDecodeError, ElementTree.ParseError) as csv_err:
+        logger.error(f"ScanForMaliciousContent unable to process {filename}: "
+                     f"{csv_err.__class__.__name__} {csv_err}")
+        status_code, ri = 400, None
+        message = f"Unable to process {filename}. Is it a valid file? "
+    except Exception as exc_err:
+        logger.error(f"Error checking file {filename}: {exc_err.__class__.__name__} {exc_err}")
+        status_code, ri = 500, None
+        message = f"Unexpected error when processing {filename}. "
+    return ScanOutcome(status_code, message, ri, next(row_counter), stats, element_path)
+
+
+def scan_chunk(chunk: bytes, filename: str, delimiter: str, xml_mode: bool, scan_types: list[str]) -> ScanOutcome:
+    "Scans one chunk of a file, in a process of the scan process pool"
+    checkers = get_checkers_from_scan_types(scan_types)
+    return scan_content(BytesIO(chunk), filename, delimiter, xml_mode, checkers)
+
+
+async def scan_in_parallel(file_object: UploadFile,
+                           delimiter: str,
+                           xml_mode: bool,
+                           scan_types: list[str]) -> ScanOutcome:
+    """
+    Scans the file in chunks of whole records in the scan process pool, with outcomes combined in chunk order so the
+    result is the same as scanning the file in one go: the first row with a problem is numbered from the start of
+    the file, and the counts cover every chunk up to and including the one it is in. Once a chunk has failed, no
+    more chunks are read, and chunks after it that are still waiting to run are cancelled.
+    """
+    loop = asyncio.get_running_loop()
+    executor = get_executor()
+    chunks = read_chunks(file_object.file, scan_chunk_size, None if xml_mode else delimiter.encode())
+    # Chunks submitted to the pool, and outcomes received but not yet combined, by chunk index
+    pending: dict[int, asyncio.Future] = {}
+    outcomes: dict[int, ScanOutcome] = {}
+    chunks_read = 0
+    chunks_combined = 0
+    first_failed_chunk = None
+    more_chunks = True
+    rows_read = 0
+    stats = ScanStats(scan_types)
+    try:
+        while True:
+            # Keep the pool busy, with a chunk queued behind each one running
+            while more_chunks and first_failed_chunk is None and len(pending) < 2 * _max_workers:
+                chunk = await asyncio.to_thread(next, chunks, None)
+                if chunk is None:
+                    more_chunks = False
+                    break
+                pending[chunks_read] = loop.run_in_executor(executor, scan_chunk, chunk, file_object.filename,
+                                                            delimiter, xml_mode, scan_types)
+                chunks_read += 1
+
+            while chunks_combined in outcomes:
+                outcome = outcomes.pop(chunks_combined)
+                stats.add(outcome.stats)
+                if outcome.status_code != 200:
+                    row_index = None if outcome.row_index is None else rows_read + outcome.row_index
+                    return outcome._replace(row_index=row_index, rows_read=rows_read + outcome.rows_read,
+                                            stats=stats)
+                rows_read += outcome.rows_read
+                chunks_combined += 1
+
+            if not pending:
+                return ScanOutcome(200, "", None, rows_read, stats)
+
+            done, _ = await asyncio.wait(pending.values(), return_when=asyncio.FIRST_COMPLETED)
+            for index in sorted(index for index, future in pending.items() if future in done):
+                if index not in pending:
+                    # Dropped after an earlier chunk failed
+                    continue
+                outcome = pending.pop(index).result()
+                outcomes[index] = outcome
+                if outcome.status_code != 200 and (first_failed_chunk is None or index < first_failed_chunk):
+                    first_failed_chunk = index
+                    for later_index in [i for i in pending if i > index]:
+                        pending.pop(later_index).cancel()
+    finally:
+        for future in pending.values():
+            future.cancel()
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # Workers are spawned rather than forked, so they do not inherit the service's threads and connections
+        _executor = ProcessPoolExecutor(max_workers=_max_workers, mp_context=multiprocessing.get_context('spawn'))
+    return _executor
+
+
+def shutdown_executor():
+    "Shuts down the scan process pool, if started, cancelling any scans not yet running"
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def scan_rows(rows: Iterable[Sequence[str]],
+              checkers: list[StringCheck],
+              stats: ScanStats) -> Tuple[int, str, int | None]:
+    """
+    Checks the values in the rows, returning the status code and message for the first value with a problem and
+    the index of its row, or (200, "", None) if there are no problems.
+
+    The same as running check_row_values on each row in turn, but the values of a batch of rows are joined into one
+    block and scanned with a single pattern combining all the checkers. Only when that pattern matches is the match
+    traced back to its value, which is then checked on its own.
+    """
+    block_pattern = compile_block_pattern(checkers)
+    if block_pattern is None:
+        for ri, row in enumerate(rows):
+            status_code, message = check_row_values(row, checkers, stats)
+            if status_code != 200:
+                return status_code, message, ri
+        return 200, "", None
+
+    first_row = 0
+    for batch in batch_rows(rows, scan_batch_rows):
+        status_code, message, ri = scan_batch(batch, checkers, block_pattern, stats)
+        if status_code != 200:
+            return status_code, message, first_row + ri
+        first_row += len(batch)
+    return 200, "", None
+
+
+def batch_rows(rows: Iterable[Sequence[str]], size: int) -> Iterator[list[Sequence[str]]]:
+    """
+    Like itertools.batched, except that if reading a row raises an error, the rows read before it are yielded as a
+    batch before the error is raised, so they are still checked
+    """
+    rows = iter(rows)
+    while True:
+        batch = []
+        try:
+            for row in rows:
+                batch.append(row)
+                if len(batch) == size:
+                    break
+        except Exception:
+            if batch:
+                yield batch
+            raise
+        if not batch:
+            return
+        yield batch
+
+
+def compile_block_pattern(checkers: list[StringCheck]) -> re.Pattern | None:
+    """
+    Combines the block patterns of the checkers into one pattern, with a group named after each checker.
+    Returns None if there are no checkers, or any checker has no block pattern.
+    """
+    block_patterns = [checker.get_block_pattern() for checker in checkers]
+    if not checkers or None in block_patterns:
+        return None
+    combined = "|".join(f"(?P<{checker.name}>{block_pattern})"
+                        for checker, block_pattern in zip(checkers, block_patterns))
+    if all(checker.block_start_chars for checker in checkers):
+        # Lets the search rule out most positions with a single character test
+        start_chars = "".join(re.escape(c) for checker in checkers for c in checker.block_start_chars)
+        combined = f"(?=[{start_chars}])(?:{combined})"
+    return re.compile(combined, flags=re.IGNORECASE)
+
+
+def scan_batch(rows: Sequence[Sequence[str]],
+               checkers: list[StringCheck],
+               block_pattern: re.Pattern,
+               stats: ScanStats) -> Tuple[int, str, int | None]:
+    "Scans one batch of rows for scan_rows, returning the index within the batch of any row with a problem"
+    values = list(itertools.chain.from_iterable(rows))
+    block = cell_separator + cell_separator.join(values)
+    started = time.perf_counter()
+    match = block_pattern.search(block)
+    stats.block_seconds += time.perf_counter() - started
+    if match is None:
+        # The block has a separator before each value, or just one if there are no values
+        stats.record_passed(len(values), len(block) - max(len(values), 1))
+        return 200, "", None
+
+    # Position in the block of the separator before each value
+    value_starts = list(itertools.accumulate((len(value) + 1 for value in values), initial=0))
+    values_checked = 0
+    characters_checked = 0
+    while match is not None:
+        # A match can span values, so the value where it starts is checked on its own
+        vi = bisect.bisect_right(value_starts, match.start()) - 1
+        status_code, message = check_item(values[vi], checkers, stats)
+        if status_code != 200:
+            # Values before this one passed all checks
+            stats.record_passed(vi - values_checked, value_starts[vi] - vi - characters_checked)
+            row_ends = list(itertools.accumulate(len(row) for row in rows))
+            return status_code, message, bisect.bisect_right(row_ends, vi)
+        values_checked += 1
+        characters_checked += len(values[vi])
+        started = time.perf_counter()
+        match = block_pattern.search(block, value_starts[vi + 1])
+        stats.block_seconds += time.perf_counter() - started
+
+    stats.record_passed(len(values) - values_checked, len(block) - len(values) - characters_checked)
+    return 200, "", None
+
+
+def check_row_values(row_values: Iterable[Any],
+                     checkers: list[StringCheck],
+                     stats: ScanStats | None = None) -> Tuple[int, str]:
     # Need default return values because row_values could be empty (which is automatically safe)
     status_code = 200
     message = ""
     for item in row_values:
-        status_code, message = check_item(str(item), checkers)
+        status_code, message = check_item(str(item), checkers, stats)
         if status_code != 200:
             break
     return status_code, message
 
 
-def check_item(item: str, checkers: list[StringCheck]) -> Tuple[int, str]:
+def check_item(item: str, checkers: list[StringCheck], stats: ScanStats | None = None) -> Tuple[int, str]:
     result = (200, "")
     for checker in checkers:
-        result = checker.check(item)
+        result = checker.check(item, stats)
         if result[0] != 200:
             break
     return result
@@ -0,0 +1,68 @@
+from typing import Iterable, Sequence, Tuple
+
+from fastapi import UploadFile
+
+from src.validation.client_configured_validator import CompiledValidator, run_validator, \
+    get_status_code_for_response
+from src.validation.file_validator import ValidatorCost
+from src.validation.mandatory_file_validator import MandatoryFileValidator, NoVirusFoundInFile, \
+    run_selected_validators, validator_classes_in_run_order
+
+"""
+Runs the mandatory and client-configured validators for a file as a single sequence, cheapest first, so a file that
+a filename, size or type check would reject is not read or sent to the virus scanner.
+"""
+
+
+def schedule_validators(client_validators: Sequence[CompiledValidator],
+                        include_virus_check: bool = True,
+                        costs: Iterable[ValidatorCost] = ValidatorCost
+                        ) -> list[type[MandatoryFileValidator] | CompiledValidator]:
+    """
+    Returns the validators of the given costs in the order to run them: cheapest first, and within the same cost
+    the mandatory validators, in their run order, before the client's validators, in their configured order.
+    """
+    costs = set(costs)
+    mandatory_validators = [v for v in validator_classes_in_run_order
+                            if include_virus_check or v is not NoVirusFoundInFile]
+    # Sorting is stable, so the order within each cost is kept
+    return sorted((v for v in [*mandatory_validators, *client_validators] if v.cost in costs), key=lambda v: v.cost)
+
+
+async def run_file_validators(file_object: UploadFile,
+                              client_validators: Sequence[CompiledValidator],
+                              include_virus_check: bool = True,
+                              costs: Iterable[ValidatorCost] = ValidatorCost,
+                              **kwargs) -> Tuple[int, str | list]:
+    """
+    Runs the mandatory and client-configured validators of the given costs, cheapest first. Any kwargs, such as the
+    file's checksum, are passed to the mandatory validators.
+
+    When All Validators Pass
+    Returns: (200, "")
+
+    Mandatory Validator Fail
+    Validation ends at the first mandatory validator to fail, returning its result, e.g. (400, "Virus Found")
+
+    Client Validator Fail
+    As with client_configured_validator.validate_file, validation ends unless the validator's
+    continue_to_next_validator_on_fail attribute is True, and a "headline" status code is returned with the list of
+    results, e.g. (415, [(415, "File extension not allowed")]). Once a client validator has failed, no more
+    mandatory validators are run, so a rejected file is never sent to the virus scanner.
+    """
+    errors_found = []
+    for validator in schedule_validators(client_validators, include_virus_check, costs):
+        if isinstance(validator, CompiledValidator):
+            status, detail = await run_validator(file_object, validator)
+            if status != 200:
+                errors_found.append((status, detail))
+                if not validator.continue_to_next_validator_on_fail:
+                    break
+        elif not errors_found:
+            status, detail = await run_selected_validators(file_object, [validator], **kwargs)
+            if status != 200:
+                return status, detail
+
+    if errors_found:
+        return get_status_code_for_response(errors_found), errors_found
+    return 200, ""
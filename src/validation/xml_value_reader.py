@@ -0,0 +1,90 @@
+import collections
+import functools
+import itertools
+from typing import BinaryIO, Iterable, Iterator
+from xml.etree import ElementTree
+
+"""
+Reads the values in an XML document with an incremental parser, so a document of any size, or with no line ends at
+all, is scanned in constant memory and without its markup.
+"""
+
+# Bytes given to the parser at a time
+xml_block_size = 64 * 1024
+
+
+class XmlValueReader:
+    """
+    Iterates over the text and attribute values of an XML document in document order, as rows of one value each.
+    Values that are only whitespace are skipped.
+
+    Each element is removed from its parent once all the text around it has been read, so only the elements
+    enclosing the current one, and those parsed from the current block, are kept. The paths of the most recent
+    rows are kept, so the element, or attribute, a row came from can be found with get_path.
+    """
+
+    def __init__(self, blocks: Iterable[bytes], paths_kept: int):
+        self.blocks = blocks
+        self.rows_read = 0
+        self._paths = collections.deque(maxlen=paths_kept)
+
+    def __iter__(self) -> Iterator[list[str]]:
+        parser = ElementTree.XMLPullParser(events=("start", "end"))
+        # Elements not yet ended, with their paths
+        open_elements: list[tuple[ElementTree.Element, str]] = []
+        # Element whose tail text is still to be read
+        last_ended = None
+        for block in itertools.chain(self.blocks, [None]):
+            if block is None:
+                # Raises ParseError if the document is incomplete
+                parser.close()
+            else:
+                parser.feed(block)
+            for event, element in parser.read_events():
+                if last_ended is not None:
+                    # The text after an element is complete once another element starts or its parent ends
+                    parent, parent_path = open_elements[-1]
+                    if self._is_row(parent_path, last_ended.tail):
+                        yield [last_ended.tail]
+                    parent.remove(last_ended)
+                    last_ended = None
+
+                if event == "start":
+                    if open_elements:
+                        # The parent's text is complete once its first child starts
+                        parent, parent_path = open_elements[-1]
+                        if self._is_row(parent_path, parent.text):
+                            yield [parent.text]
+                        parent.text = None
+                        path = f"{parent_path}/{element.tag}"
+                    else:
+                        path = f"/{element.tag}"
+                    open_elements.append((element, path))
+                    for name, value in element.attrib.items():
+                        if self._is_row(f"{path}/@{name}", value):
+                            yield [value]
+                else:
+                    _, path = open_elements.pop()
+                    if self._is_row(path, element.text):
+                        yield [element.text]
+                    if open_elements:
+                        last_ended = element
+
+    def _is_row(self, path: str, value: str | None) -> bool:
+        "Returns whether the value is read as a row, keeping its path if it is"
+        if value and not value.isspace():
+            self._paths.append(path)
+            self.rows_read += 1
+            return True
+        return False
+
+    def get_path(self, row_index: int) -> str:
+        "Returns the path of one of the most recent rows"
+        return self._paths[row_index - (self.rows_read - len(self._paths))]
+
+
+def read_blocks(file: BinaryIO | Iterable[bytes]) -> Iterable[bytes]:
+    "Reads a file in blocks, rather than lines, so a document on one line is not read in one go"
+    if hasattr(file, 'read'):
+        return iter(functools.partial(file.read, xml_block_size), b"")
+    return file
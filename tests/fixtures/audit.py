@@ -12,5 +12,5 @@ def audit_service_mock():
     with patch.object(
         audit_service, "put_item",
         return_value=True,
-    ) as mock:
+    ) as mock, patch.object(audit_service, "put_items"):
         yield mock
@@ -1,10 +1,12 @@
 from io import BytesIO
-from unittest.mock import patch, MagicMock
+from unittest.mock import call, patch, MagicMock
 import pytest
 from fastapi import HTTPException
 
 from src.handlers.file_upload_handler import handle_file_upload_logic
 from src.utils.request_types import RequestType
+from src.validation.client_configured_validator import get_validator_chain
+from src.validation.file_validator import ValidatorCost
 
 
 # =========================== SUCCESSS =========================== #
@@ -26,14 +28,12 @@ from src.utils.request_types import RequestType
     ]
 )
 @patch("src.handlers.file_upload_handler.get_file_checksum", return_value=("123456789abcdef", ""))
-@patch("src.handlers.file_upload_handler.s3_service.save", return_value=True)
-@patch("src.handlers.file_upload_handler.s3_service.file_exists")
-@patch("src.handlers.file_upload_handler.audit_service.put_item")
-@patch("src.handlers.file_upload_handler.client_configured_validator.validate_file", return_value=(200, ""))
-@patch("src.handlers.file_upload_handler.run_mandatory_validators", return_value=(200, ""))
+@patch("src.services.s3_service.save", return_value=True)
+@patch("src.services.s3_service.file_exists")
+@patch("src.services.audit_service.put_item")
+@patch("src.handlers.file_upload_handler.run_file_validators", return_value=(200, ""))
 async def test_handle_file_upload_success(
-    mandatory_validators_mock,
-    validate_file_mock,
+    file_validators_mock,
     audit_put_item_mock,
     file_exists_mock,
     save_mock,
@@ -69,22 +69,59 @@ async def test_handle_file_upload_success(
     assert file_existed_return == file_existed
     audit_put_item_mock.assert_called_once()
     save_mock.assert_called_once()
-    mandatory_validators_mock.assert_called_once()
-    validate_file_mock.assert_called_once()
+    # Other checks run first, then the checksum is passed to the virus scan so it can reuse a cached verdict
+    chain = get_validator_chain(client_config.file_validators)
+    assert file_validators_mock.call_args_list == [
+        call(file, chain, costs=(ValidatorCost.METADATA, ValidatorCost.CONTENT)),
+        call(file, chain, costs=(ValidatorCost.EXTERNAL_SERVICE,), checksum="123456789abcdef"),
+    ]
     file_exists_mock.assert_called_once()
     get_file_checksum_mock.assert_called_once()
 
 
+@pytest.mark.asyncio
+@pytest.mark.parametrize("existence_hint", [True, False])
+@patch("src.handlers.file_upload_handler.get_file_checksum", return_value=("123456789abcdef", ""))
+@patch("src.services.s3_service.save", return_value=True)
+@patch("src.services.s3_service.file_exists")
+@patch("src.services.audit_service.put_item")
+@patch("src.handlers.file_upload_handler.run_file_validators", return_value=(200, ""))
+async def test_handle_file_upload_uses_existence_hint(
+    file_validators_mock,
+    audit_put_item_mock,
+    file_exists_mock,
+    save_mock,
+    get_file_checksum_mock,
+    existence_hint
+):
+    request = MagicMock(headers={"x-request-id": "1", "content-length": 1})
+    file = MagicMock()
+    file.filename = "test_file.txt"
+    file.file = BytesIO(b"Test content")
+    client_config = MagicMock()
+    client_config.azure_display_name = "Test Client"
+
+    _, file_existed = await handle_file_upload_logic(
+        request=request,
+        file=file,
+        client_config=client_config,
+        request_type=RequestType.PUT,
+        existence_hint=existence_hint
+    )
+
+    assert file_existed is existence_hint
+    file_exists_mock.assert_not_called()
+    save_mock.assert_called_once()
+
+
 # =========================== FAILURE =========================== #
 
 @pytest.mark.asyncio
-@patch("src.handlers.file_upload_handler.s3_service.file_exists", return_value=True)
-@patch("src.handlers.file_upload_handler.audit_service.put_item")
-@patch("src.handlers.file_upload_handler.client_configured_validator.validate_file", return_value=(200, ""))
-@patch("src.handlers.file_upload_handler.run_mandatory_validators", return_value=(200, ""))
+@patch("src.services.s3_service.file_exists", return_value=True)
+@patch("src.services.audit_service.put_item")
+@patch("src.handlers.file_upload_handler.run_file_validators", return_value=(200, ""))
 async def test_handle_file_upload_POST_existing_file_failure(
-    mandatory_validators_mock,
-    validate_file_mock,
+    file_validators_mock,
     audit_put_item_mock,
     file_exists_mock
 ):
@@ -109,17 +146,18 @@ async def test_handle_file_upload_POST_existing_file_failure(
 
     assert exc_info.value.status_code == 409
     assert f"File {file.filename} already exists and cannot be overwritten" in str(exc_info.value.detail)
-    mandatory_validators_mock.assert_called_once()
-    validate_file_mock.assert_called_once()
+    assert file_validators_mock.call_count == 2
     file_exists_mock.assert_called_once()
 
 
 @pytest.mark.asyncio
-@patch("src.handlers.file_upload_handler.audit_service.put_item")
-@patch("src.handlers.file_upload_handler.run_mandatory_validators")
-async def test_handle_file_upload_antivirus_failure(mandatory_validators_mock, audit_put_item_mock):
+@patch("src.services.audit_service.put_item")
+@patch("src.handlers.file_upload_handler.get_file_checksum", return_value=("123456789abcdef", ""))
+@patch("src.handlers.file_upload_handler.run_file_validators")
+async def test_handle_file_upload_antivirus_failure(file_validators_mock, audit_put_item_mock, get_file_checksum_mock):
 
-    mandatory_validators_mock.return_value = (400, "Virus Found")
+    # Virus scan is in the second run of validators
+    file_validators_mock.side_effect = [(200, ""), (400, "Virus Found")]
 
     request = MagicMock(headers={"x-request-id": "virus-scan-fail-1", "content-length": 1})
     file = MagicMock()
@@ -147,11 +185,13 @@ async def test_handle_file_upload_antivirus_failure(mandatory_validators_mock, a
 
 
 @pytest.mark.asyncio
-@patch("src.handlers.file_upload_handler.audit_service.put_item")
-@patch("src.handlers.file_upload_handler.run_mandatory_validators")
-async def test_handle_file_upload_antivirus_unexpected_result(mandatory_validators_mock, audit_put_item_mock):
+@patch("src.services.audit_service.put_item")
+@patch("src.handlers.file_upload_handler.get_file_checksum", return_value=("123456789abcdef", ""))
+@patch("src.handlers.file_upload_handler.run_file_validators")
+async def test_handle_file_upload_antivirus_unexpected_result(file_validators_mock, audit_put_item_mock,
+                                                              get_file_checksum_mock):
 
-    mandatory_validators_mock.return_value = (500, "Virus scan gave non-standard result")
+    file_validators_mock.side_effect = [(200, ""), (500, "Virus scan gave non-standard result")]
 
     request = MagicMock(headers={"x-request-id": "virus-scan-fail-1", "content-length": 1})
     file = MagicMock()
@@ -179,14 +219,12 @@ async def test_handle_file_upload_antivirus_unexpected_result(mandatory_validato
 
 
 @pytest.mark.asyncio
-@patch("src.handlers.file_upload_handler.s3_service.save", return_value=False)
-@patch("src.handlers.file_upload_handler.s3_service.file_exists", return_value=False)
-@patch("src.handlers.file_upload_handler.audit_service.put_item")
-@patch("src.handlers.file_upload_handler.client_configured_validator.validate_file", return_value=(200, ""))
-@patch("src.handlers.file_upload_handler.run_mandatory_validators", return_value=(200, ""))
+@patch("src.services.s3_service.save", return_value=False)
+@patch("src.services.s3_service.file_exists", return_value=False)
+@patch("src.services.audit_service.put_item")
+@patch("src.handlers.file_upload_handler.run_file_validators", return_value=(200, ""))
 async def test_handle_file_upload_save_failure(
-    mandatory_validators_mock,
-    validate_file_mock,
+    file_validators_mock,
     audit_put_item_mock,
     file_exists_mock,
     save_mock
@@ -215,8 +253,7 @@ async def test_handle_file_upload_save_failure(
     assert exc_info.value.status_code == 500
     assert "failed to save" in str(exc_info.value.detail)
 
-    mandatory_validators_mock.assert_called_once()
-    validate_file_mock.assert_called_once()
+    assert file_validators_mock.call_count == 2
     audit_put_item_mock.assert_called_once()
     save_mock.assert_called_once()
     file_exists_mock.assert_called_once()
@@ -224,12 +261,10 @@ async def test_handle_file_upload_save_failure(
 
 @pytest.mark.asyncio
 @patch("src.handlers.file_upload_handler.get_file_checksum", return_value=("", "Unexpected error getting checksum"))
-@patch("src.handlers.file_upload_handler.client_configured_validator.validate_file", return_value=(200, ""))
-@patch("src.handlers.file_upload_handler.audit_service.put_item")
-@patch("src.handlers.file_upload_handler.run_mandatory_validators", return_value=(200, ""))
-async def test_handle_file_upload_checksum_failure(mandatory_validators_mock,
+@patch("src.services.audit_service.put_item")
+@patch("src.handlers.file_upload_handler.run_file_validators", return_value=(200, ""))
+async def test_handle_file_upload_checksum_failure(file_validators_mock,
                                                    audit_put_item_mock,
-                                                   validate_file_mock,
                                                    get_file_checksum_mock):
 
     request = MagicMock(headers={"x-request-id": "checksum-failure-1", "content-length": 1})
@@ -253,3 +288,91 @@ async def test_handle_file_upload_checksum_failure(mandatory_validators_mock,
 
     assert exc_info.value.status_code == 500
     assert "Unexpected error getting checksum" in str(exc_info.value.detail)
+    # The virus scan is not reached
+    file_validators_mock.assert_called_once()
+
+
+@pytest.mark.asyncio
+@patch("src.handlers.file_upload_handler.upload_pipeline_service.scan_and_save", return_value=("abc123", ()))
+@patch("src.handlers.file_upload_handler.upload_pipeline_service.pipeline_mode_enabled", return_value=True)
+@patch("src.handlers.file_upload_handler.get_file_checksum")
+@patch("src.services.s3_service.save")
+@patch("src.services.s3_service.file_exists", return_value=False)
+@patch("src.services.audit_service.put_item")
+@patch("src.handlers.file_upload_handler.run_file_validators", return_value=(200, ""))
+async def test_handle_file_upload_pipeline_mode(
+    file_validators_mock,
+    audit_put_item_mock,
+    file_exists_mock,
+    save_mock,
+    get_file_checksum_mock,
+    pipeline_mode_mock,
+    scan_and_save_mock
+):
+    request = MagicMock(headers={"x-request-id": "1", "content-length": 1})
+    file = MagicMock()
+    file.filename = "test_file.txt"
+    file.file = BytesIO(b"Test content")
+    body = MagicMock()
+    body.model_dump.return_value = {"folder": "docs"}
+    client_config = MagicMock()
+    client_config.bucket_name = "test_bucket"
+    client_config.azure_display_name = "Test Client"
+
+    response, file_existed = await handle_file_upload_logic(
+        request=request,
+        file=file,
+        body=body,
+        client_config=client_config,
+        request_type=RequestType.POST
+    )
+
+    assert response["checksum"] == "abc123"
+    assert file_existed is False
+    # Virus scan and checksum are left to the pipeline, which replaces the separate save
+    chain = get_validator_chain(client_config.file_validators)
+    assert file_validators_mock.call_args_list == [
+        call(file, chain, costs=(ValidatorCost.METADATA, ValidatorCost.CONTENT)),
+        call(file, chain, include_virus_check=False, costs=(ValidatorCost.EXTERNAL_SERVICE,)),
+    ]
+    get_file_checksum_mock.assert_not_called()
+    save_mock.assert_not_called()
+    scan_and_save_mock.assert_called_once_with(client_config, file, "docs/test_file.txt", {})
+    audit_put_item_mock.assert_called_once()
+
+
+@pytest.mark.asyncio
+@patch("src.handlers.file_upload_handler.upload_pipeline_service.scan_and_save",
+       return_value=("", (400, "Virus Found")))
+@patch("src.handlers.file_upload_handler.upload_pipeline_service.pipeline_mode_enabled", return_value=True)
+@patch("src.services.s3_service.file_exists", return_value=False)
+@patch("src.services.audit_service.put_item")
+@patch("src.handlers.file_upload_handler.run_file_validators", return_value=(200, ""))
+async def test_handle_file_upload_pipeline_mode_virus_found(
+    file_validators_mock,
+    audit_put_item_mock,
+    file_exists_mock,
+    pipeline_mode_mock,
+    scan_and_save_mock
+):
+    request = MagicMock(headers={"x-request-id": "1", "content-length": 1})
+    file = MagicMock()
+    file.filename = "infected_file.txt"
+    file.file = BytesIO(b"Bad content")
+    body = MagicMock()
+    body.model_dump.return_value = {}
+    client_config = MagicMock()
+    client_config.azure_display_name = "Test Client"
+
+    with pytest.raises(HTTPException) as exc_info:
+        await handle_file_upload_logic(
+            request=request,
+            file=file,
+            body=body,
+            client_config=client_config,
+            request_type=RequestType.PUT
+        )
+
+    assert exc_info.value.status_code == 400
+    assert exc_info.value.detail == "Virus Found"
+    audit_put_item_mock.assert_called_once()
@@ -6,6 +6,7 @@ from jose import jwt, JWTError
 from jose.exceptions import JWTClaimsError, ExpiredSignatureError
 
 from src.main import app
+from src.middleware.auth import fetch_jwks
 
 test_client = TestClient(app)
 logger = structlog.get_logger()
@@ -214,3 +215,13 @@ def test_rsa_key_missing(oidc_mock, jwks_mock, unv_header_mock, key_construct_mo
     response = test_client.get('/retrieve_file?file_key=README.md', headers={'Authorization': 'Bearer token'})
     decode_mock.assert_not_called()
     assert response.status_code == 401
+
+
+@patch('src.middleware.auth.requests.get')
+def test_signing_key_fetches_time_out(get_mock, monkeypatch):
+    monkeypatch.setenv('AUTH_HTTP_TIMEOUT', '3')
+    get_mock.return_value.json.return_value = MOCK_JWKS
+
+    assert fetch_jwks('https://example.com/timeout-test/keys') == MOCK_JWKS
+
+    get_mock.assert_called_once_with('https://example.com/timeout-test/keys', timeout=3.0)
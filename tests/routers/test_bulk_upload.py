@@ -1,3 +1,5 @@
+import asyncio
+import contextlib
 from unittest.mock import patch
 from io import BytesIO
 import pytest
@@ -5,6 +7,13 @@ from fastapi import HTTPException
 # test_client is fixture auto-imported from tests/fixtures/auth.py
 
 
+@pytest.fixture(autouse=True)
+def find_existing_files_mock():
+    "Listing of files already in the bucket, made once for each bulk upload"
+    with patch("src.services.s3_service.find_existing_files", return_value=set()) as mock_find:
+        yield mock_find
+
+
 def make_file_tuple(filename: str, content: bytes = b"abc123", mimetype: str = "text/plain"):
     "Create tuple with individual file details for upload"
     return ("files", (filename, BytesIO(content), mimetype))
@@ -140,6 +149,89 @@ def test_bulk_upload_with_both_repeated_and_different_filenames(mock_handler, te
     assert response.json() == expected_result
 
 
+def test_bulk_upload_runs_files_concurrently_within_limit(monkeypatch, test_client):
+    monkeypatch.setenv("BULK_UPLOAD_CONCURRENCY", "3")
+    files = [make_file_tuple(f"file{n}.txt") for n in range(6)] + [make_file_tuple("file0.txt", b"again")]
+    in_flight = []
+    max_in_flight = 0
+    call_order = []
+
+    async def fake_upload(request, file, body, client_config, request_type, filename_position, existence_hint):
+        nonlocal max_in_flight
+        # Files sharing a name must never be processed at the same time
+        assert file.filename not in in_flight
+        in_flight.append(file.filename)
+        max_in_flight = max(max_in_flight, len(in_flight))
+        await asyncio.sleep(0.01)
+        in_flight.remove(file.filename)
+        call_order.append(filename_position)
+        return {"checksum": f"fakechecksum{filename_position}"}, filename_position == 6
+
+    with patch("src.routers.bulk_upload.handle_file_upload_logic", side_effect=fake_upload):
+        response = test_client.put("/bulk_upload", files=files)
+
+    assert response.status_code == 200
+    assert max_in_flight == 3
+    # The repeated filename is only processed after its earlier position
+    assert call_order.index(6) > call_order.index(0)
+    assert response.json()["file0.txt"] == make_file_result("file0.txt", [0, 6],
+                                                            [{"status_code": 201, "detail": "saved"},
+                                                             {"status_code": 200, "detail": "updated"}],
+                                                            "fakechecksum6")
+    assert list(response.json()) == [f"file{n}.txt" for n in range(6)]
+
+
+@patch("src.routers.bulk_upload.handle_file_upload_logic")
+def test_bulk_upload_lists_existing_files_once(mock_handler, find_existing_files_mock, test_client):
+    find_existing_files_mock.return_value = {"folder/old.txt"}
+    mock_handler.return_value = ({"checksum": "fakechecksum"}, False)
+    files = [make_file_tuple("old.txt"), make_file_tuple("new.txt"), make_file_tuple("new.txt")]
+
+    response = test_client.put("/bulk_upload", files=files, data={"body": '{"folder": "folder"}'})
+
+    assert response.status_code == 200
+    find_existing_files_mock.assert_called_once()
+    assert find_existing_files_mock.call_args.args[1] == ["folder/old.txt", "folder/new.txt", "folder/new.txt"]
+    # The second new.txt exists once the first has been saved
+    hints = [c.kwargs["existence_hint"] for c in mock_handler.call_args_list]
+    assert hints == [True, False, True]
+
+
+@patch("src.routers.bulk_upload.handle_file_upload_logic")
+def test_bulk_upload_checks_each_file_when_listing_fails(mock_handler, find_existing_files_mock, test_client):
+    find_existing_files_mock.side_effect = Exception("Access denied")
+    mock_handler.return_value = ({"checksum": "fakechecksum"}, False)
+
+    response = test_client.put("/bulk_upload", files=[make_file_tuple("file1.txt")])
+
+    assert response.status_code == 200
+    assert mock_handler.call_args.kwargs["existence_hint"] is None
+
+
+@patch("src.routers.bulk_upload.handle_file_upload_logic")
+def test_bulk_upload_gives_errors_when_audit_write_fails(mock_handler, test_client):
+    mock_handler.return_value = ({"checksum": "fakechecksum"}, False)
+
+    @contextlib.asynccontextmanager
+    async def failing_audit_records():
+        yield []
+        raise Exception("DynamoDB unavailable")
+
+    with patch("src.services.async_storage_service.buffered_audit_records", failing_audit_records):
+        response = test_client.put("/bulk_upload", files=[make_file_tuple("file1.txt")])
+
+    assert response.status_code == 200
+    failed = {"status_code": 500, "detail": "An error occurred while recording the upload"}
+    assert response.json() == {"file1.txt": make_file_result("file1.txt", [0], [failed], None)}
+
+
+@patch("src.routers.bulk_upload.upload_single_file", side_effect=RuntimeError("Unexpected"))
+def test_bulk_upload_raises_unexpected_error_from_uploads(mock_upload, test_client):
+    # Not reported as an audit failure
+    with pytest.raises(RuntimeError):
+        test_client.put("/bulk_upload", files=[make_file_tuple("file1.txt")])
+
+
 # ================== Request Body (data param) ================== #
 """
 In earlier version of API it was necessary to specify a `bucketName` value
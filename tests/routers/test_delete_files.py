@@ -24,8 +24,8 @@ def test_delete_files_permission_denied(test_client):
 def test_delete_files_missing_file(test_client):
     file_key = 'test_file.md'
 
-    with patch("src.routers.delete_files.s3_service.list_file_versions") as list_versions_mock, \
-         patch("src.routers.delete_files.audit_service.AuditService.get_instance"):
+    with patch("src.services.s3_service.list_file_versions") as list_versions_mock, \
+         patch("src.services.audit_service.put_items"):
 
         list_versions_mock.return_value = []
 
@@ -38,8 +38,8 @@ def test_delete_files_missing_file(test_client):
 def test_delete_files_unexpected_error(test_client):
     file_key = 'test_file.md'
 
-    with patch("src.routers.delete_files.s3_service.list_file_versions") as list_versions_mock, \
-         patch("src.routers.delete_files.audit_service.AuditService.get_instance"):
+    with patch("src.services.s3_service.list_file_versions") as list_versions_mock, \
+         patch("src.services.audit_service.put_items"):
 
         list_versions_mock.side_effect = RuntimeError("Unexpected failure")
 
@@ -52,10 +52,10 @@ def test_delete_files_unexpected_error(test_client):
 def test_delete_files_single_key(test_client):
     file_key = 'test_file.md'
 
-    with patch("src.routers.delete_files.s3_service.list_file_versions") as list_versions_mock, \
-         patch("src.routers.delete_files.s3_service.delete_file_version") as delete_version_mock, \
-         patch("src.routers.delete_files.s3_service.S3Service.get_instance") as mock_s3_instance, \
-         patch("src.routers.delete_files.audit_service.AuditService.get_instance") as mock_audit_instance:
+    with patch("src.services.s3_service.list_file_versions") as list_versions_mock, \
+         patch("src.services.s3_service.delete_file_versions") as delete_versions_mock, \
+         patch("src.services.s3_service.S3Service.get_instance") as mock_s3_instance, \
+         patch("src.services.audit_service.put_items"):
 
         # Mock S3Service
         mock_s3 = MagicMock()
@@ -63,14 +63,9 @@ def test_delete_files_single_key(test_client):
         mock_s3.list_object_versions.return_value = [{"VersionId": "v1"}]
         mock_s3.delete_object.return_value = {}
 
-        # Mock list_file_versions and delete_file_version
+        # Mock list_file_versions and delete_file_versions
         list_versions_mock.return_value = [{"VersionId": "v1"}]
-        delete_version_mock.return_value = True
-
-        # Mock audit service
-        mock_audit = MagicMock()
-        mock_audit_instance.return_value = mock_audit
-        mock_audit.log_event.return_value = None
+        delete_versions_mock.return_value = []
 
         # Perform the DELETE request
         response = test_client.delete(f'/delete_files?file_keys={file_key}')
@@ -84,10 +79,10 @@ def test_delete_files_multiple_keys(test_client):
     file_a = 'test_file_a.md'
     file_b = 'test_file_b.md'
 
-    with patch("src.routers.delete_files.s3_service.list_file_versions") as list_versions_mock, \
-         patch("src.routers.delete_files.s3_service.delete_file_version") as delete_version_mock, \
-         patch("src.routers.delete_files.s3_service.S3Service.get_instance") as mock_s3_instance, \
-         patch("src.routers.delete_files.audit_service.AuditService.get_instance") as mock_audit_instance:
+    with patch("src.services.s3_service.list_file_versions") as list_versions_mock, \
+         patch("src.services.s3_service.delete_file_versions") as delete_versions_mock, \
+         patch("src.services.s3_service.S3Service.get_instance") as mock_s3_instance, \
+         patch("src.services.audit_service.put_items") as put_items_mock:
 
         # Mock S3Service
         mock_s3 = MagicMock()
@@ -95,14 +90,9 @@ def test_delete_files_multiple_keys(test_client):
         mock_s3.list_object_versions.return_value = [{"VersionId": "v1"}]
         mock_s3.delete_object.return_value = {}
 
-        # Mock list_file_versions and delete_file_version
+        # Mock list_file_versions and delete_file_versions
         list_versions_mock.return_value = [{"VersionId": "v1"}]
-        delete_version_mock.return_value = True
-
-        # Mock audit service
-        mock_audit = MagicMock()
-        mock_audit_instance.return_value = mock_audit
-        mock_audit.log_event.return_value = None
+        delete_versions_mock.return_value = []
 
         # Perform the DELETE request
         response = test_client.delete(f'/delete_files?file_keys={file_a}&file_keys={file_b}')
@@ -111,6 +101,9 @@ def test_delete_files_multiple_keys(test_client):
         assert response.status_code == 200
         for file_key in [file_a, file_b]:
             assert response.json()[file_key] == 204
+        # Audit records for all files are written together once the deletes are done
+        put_items_mock.assert_called_once()
+        assert [r.file_id for r in put_items_mock.call_args.args[0]] == [file_a, file_b]
 
 
 def test_delete_files_multiple_status(test_client):
@@ -118,28 +111,30 @@ def test_delete_files_multiple_status(test_client):
     file_b = 'file_b.md'
     file_c = 'file_c.md'
 
-    with patch("src.routers.delete_files.s3_service.list_file_versions") as list_versions_mock, \
-         patch("src.routers.delete_files.s3_service.delete_file_version") as delete_version_mock, \
-         patch("src.routers.delete_files.s3_service.S3Service.get_instance") as mock_s3_instance, \
-         patch("src.routers.delete_files.audit_service.AuditService.get_instance") as mock_audit_instance:
+    with patch("src.services.s3_service.list_file_versions") as list_versions_mock, \
+         patch("src.services.s3_service.delete_file_versions") as delete_versions_mock, \
+         patch("src.services.s3_service.S3Service.get_instance") as mock_s3_instance, \
+         patch("src.services.audit_service.put_items"):
 
         # Mock S3Service
         mock_s3 = MagicMock()
         mock_s3_instance.return_value = mock_s3
         mock_s3.delete_object.return_value = {}
 
-        # Mock list_file_versions with different outcomes
-        list_versions_mock.side_effect = [
-            [{"VersionId": "v1"}],  # file_a: success
-            [],                     # file_b: not found
-            RuntimeError("Simulated error")  # file_c: error
-        ]
-        delete_version_mock.return_value = True
+        # Mock list_file_versions with different outcomes, keyed by file as files are listed concurrently
+        outcomes_by_file = {
+            file_a: [{"VersionId": "v1"}],  # file_a: success
+            file_b: [],                     # file_b: not found
+            file_c: RuntimeError("Simulated error")  # file_c: error
+        }
 
-        # Mock audit service
-        mock_audit = MagicMock()
-        mock_audit_instance.return_value = mock_audit
-        mock_audit.log_event.return_value = None
+        def list_versions(client, file_key, max_versions=None):
+            if isinstance(outcomes_by_file[file_key], Exception):
+                raise outcomes_by_file[file_key]
+            return outcomes_by_file[file_key]
+
+        list_versions_mock.side_effect = list_versions
+        delete_versions_mock.return_value = []
 
         # Perform the DELETE request
         response = test_client.delete(
@@ -157,16 +152,14 @@ def test_delete_files_multiple_status(test_client):
 def test_delete_files_partial_version_failure(test_client):
     file_a = 'file_a.md'
 
-    with patch("src.routers.delete_files.s3_service.list_file_versions") as list_versions_mock, \
-         patch("src.routers.delete_files.s3_service.delete_file_version") as delete_version_mock, \
-         patch("src.routers.delete_files.audit_service.AuditService.get_instance") as mock_audit_instance:
-
-        mock_audit = MagicMock()
-        mock_audit_instance.return_value = mock_audit
-        mock_audit.log_event.return_value = None
+    with patch("src.services.s3_service.list_file_versions") as list_versions_mock, \
+         patch("src.services.s3_service.delete_file_versions") as delete_versions_mock, \
+         patch("src.services.audit_service.put_items"):
 
         list_versions_mock.return_value = [{"VersionId": "v1"}, {"VersionId": "v2"}]
-        delete_version_mock.side_effect = [True, RuntimeError("Failed to delete v2")]
+        delete_versions_mock.return_value = [
+            {"Key": file_a, "VersionId": "v2", "Code": "AccessDenied", "Message": "Access Denied"}
+        ]
 
         response = test_client.delete(f'/delete_files?file_keys={file_a}')
         outcomes = response.json()
@@ -178,13 +171,13 @@ def test_delete_files_partial_version_failure(test_client):
 def test_delete_files_missing_version_id(test_client):
     file_key = 'file_with_bad_version.md'
 
-    with patch("src.routers.delete_files.s3_service.list_file_versions") as list_versions_mock, \
-         patch("src.routers.delete_files.s3_service.delete_file_version") as delete_version_mock, \
-         patch("src.routers.delete_files.audit_service.AuditService.get_instance"):
+    with patch("src.services.s3_service.list_file_versions") as list_versions_mock, \
+         patch("src.services.s3_service.delete_file_versions") as delete_versions_mock, \
+         patch("src.services.audit_service.put_items"):
 
         # Simulate a version dictionary missing the "VersionId" key
         list_versions_mock.return_value = [{"NoVersionId": "oops"}]
-        delete_version_mock.return_value = True  # Shouldn't be called
+        delete_versions_mock.return_value = []  # Shouldn't be called
         response = test_client.delete(f'/delete_files?file_keys={file_key}')
         outcomes = response.json()
 
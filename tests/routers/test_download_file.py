@@ -0,0 +1,109 @@
+from io import BytesIO
+from unittest.mock import patch
+
+from botocore.response import StreamingBody
+
+from src.models.execeptions.file_not_found import FileNotFoundException
+from src.models.execeptions.invalid_range import InvalidRangeException
+# test_client is fixture defined in tests/fixtures/auth.py
+# audit_service_mock is fixture defined in tests/fixtues/audit.py
+
+
+def make_get_object_response(content: bytes, status_code: int = 200, **fields) -> dict:
+    "Response as returned by S3 get_object, with a body that streams the content"
+    return {'ResponseMetadata': {'HTTPStatusCode': status_code},
+            'Body': StreamingBody(BytesIO(content), len(content)),
+            'ContentLength': len(content),
+            'ContentType': 'application/pdf',
+            'ETag': '"etag-1"',
+            **fields}
+
+
+def test_download_file_missing_key(test_client, audit_service_mock):
+    response = test_client.get('/download_file')
+
+    assert response.status_code == 400
+    assert response.json()['detail'] == 'File key is missing'
+
+
+@patch("src.routers.download_file.download_chunk_size", 4)
+@patch("src.services.s3_service.open_file")
+def test_download_file_streams_content(open_file_mock, test_client, audit_service_mock):
+    content = bytes(range(256)) * 4
+    open_file_mock.return_value = make_get_object_response(content)
+
+    response = test_client.get('/download_file', params={"file_key": "doc.pdf"})
+
+    assert response.status_code == 200
+    assert response.content == content
+    assert response.headers['etag'] == '"etag-1"'
+    assert response.headers['content-type'] == 'application/pdf'
+    assert response.headers['accept-ranges'] == 'bytes'
+    assert open_file_mock.call_args.args[1:] == ("doc.pdf", None, None)
+    audit_service_mock.assert_called()
+
+
+@patch("src.services.s3_service.open_file")
+def test_download_file_range(open_file_mock, test_client, audit_service_mock):
+    open_file_mock.return_value = make_get_object_response(b'0123456789', status_code=206,
+                                                           ContentRange='bytes 10-19/100')
+
+    response = test_client.get('/download_file', params={"file_key": "doc.pdf"}, headers={"Range": "bytes=10-19"})
+
+    assert response.status_code == 206
+    assert response.content == b'0123456789'
+    assert response.headers['content-range'] == 'bytes 10-19/100'
+    assert open_file_mock.call_args.args[1:] == ("doc.pdf", "bytes=10-19", None)
+
+
+@patch("src.services.s3_service.open_file")
+def test_download_file_ignores_multiple_ranges(open_file_mock, test_client, audit_service_mock):
+    open_file_mock.return_value = make_get_object_response(b'content')
+
+    response = test_client.get('/download_file', params={"file_key": "doc.pdf"},
+                               headers={"Range": "bytes=0-1,5-6"})
+
+    assert response.status_code == 200
+    assert open_file_mock.call_args.args[1:] == ("doc.pdf", None, None)
+
+
+@patch("src.services.s3_service.open_file")
+def test_download_file_not_modified(open_file_mock, test_client, audit_service_mock):
+    open_file_mock.return_value = {'ResponseMetadata': {'HTTPStatusCode': 304}, 'ETag': '"etag-1"'}
+
+    response = test_client.get('/download_file', params={"file_key": "doc.pdf"},
+                               headers={"If-None-Match": '"etag-1"'})
+
+    assert response.status_code == 304
+    assert response.content == b''
+    assert response.headers['etag'] == '"etag-1"'
+    assert open_file_mock.call_args.args[1:] == ("doc.pdf", None, '"etag-1"')
+
+
+@patch("src.services.s3_service.open_file")
+def test_download_file_not_found(open_file_mock, test_client, audit_service_mock):
+    open_file_mock.side_effect = FileNotFoundException('The file doc.pdf could not be found.', 'doc.pdf')
+
+    response = test_client.get('/download_file', params={"file_key": "doc.pdf"})
+
+    assert response.status_code == 404
+    assert response.json()['detail'] == 'The file doc.pdf could not be found.'
+
+
+@patch("src.services.s3_service.open_file")
+def test_download_file_unsatisfiable_range(open_file_mock, test_client, audit_service_mock):
+    open_file_mock.side_effect = InvalidRangeException('The range bytes=500- is not satisfiable', 'doc.pdf')
+
+    response = test_client.get('/download_file', params={"file_key": "doc.pdf"}, headers={"Range": "bytes=500-"})
+
+    assert response.status_code == 416
+
+
+@patch("src.services.s3_service.open_file")
+def test_download_file_unknown_exception(open_file_mock, test_client, audit_service_mock):
+    open_file_mock.side_effect = Exception('unknown exception')
+
+    response = test_client.get('/download_file', params={"file_key": "doc.pdf"})
+
+    assert response.status_code == 500
+    assert response.json()['detail'] == 'An error occurred while downloading the file'
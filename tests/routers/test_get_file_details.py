@@ -14,7 +14,7 @@ def test_get_file_details_missing_key(test_client, audit_service_mock):
 
 def test_get_file_details_file_not_found(test_client, audit_service_mock):
     file_key = 'missing_file.txt'
-    with patch("src.routers.file_details.list_file_versions", return_value=[]):
+    with patch("src.services.s3_service.list_file_versions", return_value=[]):
         response = test_client.get('/get_file_details', params={"file_key": file_key})
     assert response.status_code == 404
     assert response.json()['detail'] == f"No details found for file: {file_key}"
@@ -33,7 +33,7 @@ def test_get_file_details_returns_expected_details_with_1_version(test_client, a
     expected_result = {"version_history": [{"Key": file_key, "VersionId": "abc123",
                                             "IsLatest": True, "Size": 120, "LastModified": "2026-04-27T12:30:45"}]}
 
-    with patch("src.routers.file_details.list_file_versions", return_value=s3_version_details):
+    with patch("src.services.s3_service.list_file_versions", return_value=s3_version_details):
         response = test_client.get('/get_file_details', params={"file_key": file_key})
     assert response.status_code == 200
     assert response.json() == expected_result
@@ -56,8 +56,25 @@ def test_get_file_details_returns_expected_details_with_2_versions(test_client,
                                            {"Key": file_key, "VersionId": "abc123", "IsLatest": False,
                                            "Size": 120, "LastModified": "2026-03-20T11:29:44"}]}
 
-    with patch("src.routers.file_details.list_file_versions", return_value=s3_version_details):
+    with patch("src.services.s3_service.list_file_versions", return_value=s3_version_details):
         response = test_client.get('/get_file_details', params={"file_key": file_key})
     assert response.status_code == 200
     assert response.json() == expected_result
     audit_service_mock.assert_called()
+
+
+def test_get_file_details_passes_max_versions(test_client, audit_service_mock):
+    file_key = 'file_with_many_versions.txt'
+    s3_version_details = [{"Key": file_key, "VersionId": "xyz456", "IsLatest": True,
+                           "Size": 240, "LastModified": datetime.datetime(2026, 4, 27, 12, 30, 45)}]
+
+    with patch("src.services.s3_service.list_file_versions", return_value=s3_version_details) as list_mock:
+        response = test_client.get('/get_file_details', params={"file_key": file_key, "max_versions": 1})
+    assert response.status_code == 200
+    assert len(response.json()["version_history"]) == 1
+    assert list_mock.call_args.args[1:] == (file_key, 1)
+
+
+def test_get_file_details_rejects_invalid_max_versions(test_client, audit_service_mock):
+    response = test_client.get('/get_file_details', params={"file_key": "file.txt", "max_versions": 0})
+    assert response.status_code == 422
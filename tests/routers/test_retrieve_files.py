@@ -0,0 +1,57 @@
+from unittest.mock import patch
+
+from src.models.execeptions.file_not_found import FileNotFoundException
+# test_client is fixture defined in tests/fixtures/auth.py
+# audit_service_mock is fixture defined in tests/fixtues/audit.py
+
+
+def fake_retrieve_file_url(client, file_key):
+    if file_key == 'missing.txt':
+        raise FileNotFoundException(f'The file {file_key} could not be found', file_key)
+    if file_key == 'broken.txt':
+        raise Exception('unknown exception')
+    return f'https://example.com/{file_key}'
+
+
+def test_retrieve_files_missing_keys(test_client, audit_service_mock):
+    response = test_client.get('/get_files')
+
+    assert response.status_code == 400
+    assert response.json()['detail'] == 'File key is missing'
+
+
+@patch("src.services.s3_service.retrieve_file_url", side_effect=fake_retrieve_file_url)
+def test_retrieve_files_returns_outcome_for_each_key(retrieve_file_url_mock, test_client):
+    with patch("src.services.audit_service.put_items") as put_items_mock:
+        response = test_client.get('/get_files', params={"file_keys": ["a.txt", "missing.txt", "broken.txt"]})
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "a.txt": {"status_code": 200, "fileURL": "https://example.com/a.txt"},
+        "missing.txt": {"status_code": 404, "detail": "The file missing.txt could not be found"},
+        "broken.txt": {"status_code": 500, "detail": "An error occurred while retrieving the file"},
+    }
+    # Audit records for all files are written together
+    put_items_mock.assert_called_once()
+    records = put_items_mock.call_args.args[0]
+    assert [(r.file_id, r.filename_position) for r in records] == [("a.txt", 0), ("missing.txt", 1),
+                                                                   ("broken.txt", 2)]
+
+
+@patch("src.services.s3_service.retrieve_file_url", side_effect=fake_retrieve_file_url)
+def test_retrieve_files_fetches_repeated_key_once(retrieve_file_url_mock, test_client, audit_service_mock):
+    response = test_client.get('/get_files', params={"file_keys": ["a.txt", "a.txt"]})
+
+    assert response.status_code == 200
+    assert response.json() == {"a.txt": {"status_code": 200, "fileURL": "https://example.com/a.txt"}}
+    retrieve_file_url_mock.assert_called_once()
+
+
+@patch("src.services.s3_service.retrieve_file_url", side_effect=fake_retrieve_file_url)
+def test_retrieve_files_audit_failure(retrieve_file_url_mock, test_client):
+    with patch("src.services.audit_service.put_items", side_effect=Exception("DynamoDB unavailable")):
+        response = test_client.get('/get_files', params={"file_keys": ["a.txt"]})
+
+    # No links are given out when their access could not be audited
+    assert response.status_code == 200
+    assert response.json() == {"a.txt": {"status_code": 500, "detail": "An error occurred while retrieving the file"}}
@@ -73,3 +73,17 @@ def test_scan_for_suspicious_content_with_clean_xml_file(validate_mock, test_cli
     assert response.status_code == 200
     assert response.json() == {"success": f"(XML Scan) No malicious content detected. {text_from_mock}"}
     validate_mock.assert_called_once()
+
+
+@patch("src.routers.scan_for_suspicious_content.suspicious_content_validator.ScanForSuspiciousContent.validate")
+def test_scan_for_suspicious_content_passes_parse_xml(validate_mock, test_client):
+    validate_mock.return_value = (200, "")
+    files = {
+        "file": ("clean.zzz", BytesIO(b"<xml> mostly harmless</xml>"), "text/xml")
+    }
+
+    response = test_client.put("/scan_for_suspicious_content?parse_xml=true", files=files)
+
+    assert response.status_code == 200
+    assert validate_mock.call_args.kwargs["xml_mode"] is True
+    assert validate_mock.call_args.kwargs["parse_xml"] is True
@@ -0,0 +1,130 @@
+import asyncio
+import threading
+from unittest.mock import patch, MagicMock
+
+import pytest
+import structlog
+
+from src.services import async_storage_service
+from src.utils.operation_types import OperationType
+
+
+@pytest.mark.asyncio
+async def test_run_blocking_runs_off_event_loop_thread():
+    loop_thread = threading.get_ident()
+
+    result = await async_storage_service.run_blocking(threading.get_ident)
+
+    assert result != loop_thread
+
+
+@pytest.mark.asyncio
+async def test_run_blocking_keeps_context_vars():
+    structlog.contextvars.bind_contextvars(correlation_id="abc-123")
+    try:
+        result = await async_storage_service.run_blocking(structlog.contextvars.get_contextvars)
+    finally:
+        structlog.contextvars.unbind_contextvars("correlation_id")
+
+    assert result["correlation_id"] == "abc-123"
+
+
+@pytest.mark.asyncio
+async def test_run_blocking_propagates_exceptions():
+    def failing_call():
+        raise ValueError("Storage error")
+
+    with pytest.raises(ValueError, match="Storage error"):
+        await async_storage_service.run_blocking(failing_call)
+
+
+@pytest.mark.asyncio
+async def test_run_blocking_overlaps_calls():
+    # Both calls must be in flight at once for the barrier to release
+    barrier = threading.Barrier(2, timeout=5)
+
+    results = await asyncio.gather(async_storage_service.run_blocking(barrier.wait),
+                                   async_storage_service.run_blocking(barrier.wait))
+
+    assert sorted(results) == [0, 1]
+
+
+@pytest.mark.asyncio
+@patch("src.services.async_storage_service.s3_service.file_exists")
+async def test_file_exists_calls_s3_service(mock_file_exists):
+    mock_file_exists.return_value = True
+    client_config = MagicMock()
+
+    result = await async_storage_service.file_exists(client_config, "test_file.txt")
+
+    assert result is True
+    mock_file_exists.assert_called_once_with(client_config, "test_file.txt")
+
+
+@pytest.mark.asyncio
+@patch("src.services.async_storage_service.s3_service.save")
+async def test_save_calls_s3_service(mock_save):
+    mock_save.return_value = True
+    client_config = MagicMock()
+    file = MagicMock()
+
+    result = await async_storage_service.save(client_config, file, "test_file.txt", "checksum", {"key": "value"})
+
+    assert result is True
+    mock_save.assert_called_once_with(client_config, file, "test_file.txt", "checksum", {"key": "value"})
+
+
+@pytest.mark.asyncio
+@patch("src.services.async_storage_service.audit_service.add_record")
+async def test_add_audit_record_calls_audit_service(mock_add_record):
+    request = MagicMock()
+
+    await async_storage_service.add_audit_record(request=request,
+                                                 filename_position=0,
+                                                 service_id="Test Client",
+                                                 file_id="test_file.txt",
+                                                 operation_type=OperationType.READ)
+
+    mock_add_record.assert_called_once_with(request=request,
+                                            filename_position=0,
+                                            service_id="Test Client",
+                                            file_id="test_file.txt",
+                                            operation_type=OperationType.READ,
+                                            error_status=())
+
+
+@pytest.mark.asyncio
+@patch("src.services.async_storage_service.audit_service.put_items")
+@patch("src.services.async_storage_service.audit_service.put_item")
+async def test_buffered_audit_records_written_together(mock_put_item, mock_put_items):
+    request = MagicMock(headers={"x-request-id": "buffered-1"})
+
+    async with async_storage_service.buffered_audit_records():
+        await asyncio.gather(*(async_storage_service.add_audit_record(request=request,
+                                                                      filename_position=i,
+                                                                      service_id="Test Client",
+                                                                      file_id=f"file{i}.txt",
+                                                                      operation_type=OperationType.CREATE)
+                               for i in range(3)))
+        mock_put_items.assert_not_called()
+
+    mock_put_item.assert_not_called()
+    mock_put_items.assert_called_once()
+    assert sorted(r.filename_position for r in mock_put_items.call_args.args[0]) == [0, 1, 2]
+
+
+@pytest.mark.asyncio
+@patch("src.services.async_storage_service.audit_service.put_items")
+async def test_buffered_audit_records_written_when_block_fails(mock_put_items):
+    request = MagicMock(headers={"x-request-id": "buffered-2"})
+
+    with pytest.raises(ValueError):
+        async with async_storage_service.buffered_audit_records():
+            await async_storage_service.add_audit_record(request=request,
+                                                         filename_position=0,
+                                                         service_id="Test Client",
+                                                         file_id="file0.txt",
+                                                         operation_type=OperationType.CREATE)
+            raise ValueError("Unexpected failure")
+
+    mock_put_items.assert_called_once()
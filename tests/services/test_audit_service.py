@@ -1,10 +1,13 @@
 import os
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import patch, Mock
 import pytest
 from pydantic import ValidationError
 from src.models.audit_record import AuditRecord
-from src.services.audit_service import put_item, add_record, AuditService
+from src.services.audit_service import (put_item, put_items, add_record, buffered_records, flush_pending_records,
+                                        get_batches, AuditService, BackgroundAuditWriter)
 from src.utils.operation_types import OperationType
 
 """
@@ -325,3 +328,113 @@ def test_get_expected_error_with_invalid_operation_type():
             error_details="",
         )
     assert "Value error, 'SERENADE' is not a valid OperationType" in str(exc_info.value)
+
+
+def make_audit_records(count: int, request_id: str = "batch1") -> list[AuditRecord]:
+    return [AuditRecord(request_id=request_id, filename_position=i, service_id="pytest-test",
+                        file_id=f"file{i}.txt", operation_type="CREATE") for i in range(count)]
+
+
+def test_put_items_writes_in_batches_of_25():
+    mock_resource = Mock()
+    mock_resource.batch_write_item.return_value = {"UnprocessedItems": {}}
+
+    with patch("src.services.audit_service.AuditService.get_dynamodb_client", return_value=mock_resource), \
+         patch.object(AuditService, "_instance", None), \
+         patch.dict(os.environ, {"AUDIT_TABLE": "TEST_AUDIT_1"}):
+        put_items(make_audit_records(30))
+
+    batches = [c.kwargs["RequestItems"]["TEST_AUDIT_1"] for c in mock_resource.batch_write_item.call_args_list]
+    assert [len(b) for b in batches] == [25, 5]
+    assert batches[1][0]["PutRequest"]["Item"]["filename_position"] == 25
+
+
+def test_put_items_retries_unprocessed_items(monkeypatch):
+    monkeypatch.setenv("AUDIT_BATCH_RETRY_DELAY", "0")
+    unprocessed = {"TEST_AUDIT_1": [{"PutRequest": {"Item": {"request_id": "batch1"}}}]}
+    mock_resource = Mock()
+    mock_resource.batch_write_item.side_effect = [{"UnprocessedItems": unprocessed}, {"UnprocessedItems": {}}]
+
+    with patch("src.services.audit_service.AuditService.get_dynamodb_client", return_value=mock_resource), \
+         patch.object(AuditService, "_instance", None), \
+         patch.dict(os.environ, {"AUDIT_TABLE": "TEST_AUDIT_1"}):
+        put_items(make_audit_records(3))
+
+    assert mock_resource.batch_write_item.call_count == 2
+    assert mock_resource.batch_write_item.call_args.kwargs["RequestItems"] == unprocessed
+
+
+def test_put_items_raises_when_items_remain_unprocessed(monkeypatch):
+    monkeypatch.setenv("AUDIT_BATCH_RETRY_DELAY", "0")
+    monkeypatch.setenv("AUDIT_BATCH_MAX_RETRIES", "2")
+    unprocessed = {"TEST_AUDIT_1": [{"PutRequest": {"Item": {"request_id": "batch1"}}}]}
+    mock_resource = Mock()
+    mock_resource.batch_write_item.return_value = {"UnprocessedItems": unprocessed}
+
+    with patch("src.services.audit_service.AuditService.get_dynamodb_client", return_value=mock_resource), \
+         patch.object(AuditService, "_instance", None), \
+         patch.dict(os.environ, {"AUDIT_TABLE": "TEST_AUDIT_1"}), \
+         pytest.raises(RuntimeError) as exc_info:
+        put_items(make_audit_records(1))
+
+    assert mock_resource.batch_write_item.call_count == 3
+    assert str(exc_info.value) == "1 audit records not written after 2 retries"
+
+
+def test_get_batches_puts_repeated_key_in_new_batch():
+    records = make_audit_records(3) + make_audit_records(1)
+
+    batches = get_batches(records)
+
+    assert [[r.filename_position for r in b] for b in batches] == [[0, 1, 2], [0]]
+
+
+def test_add_record_holds_records_while_buffered():
+    fake_request = Mock()
+    fake_request.headers = {"x-request-id": "buffered-1"}
+
+    with patch("src.services.audit_service.put_item") as put_item_mock:
+        with buffered_records() as records:
+            for position in range(2):
+                add_record(request=fake_request, filename_position=position, service_id="pytest-test-service",
+                           file_id="held.txt", operation_type=OperationType.CREATE)
+        add_record(request=fake_request, filename_position=2, service_id="pytest-test-service",
+                   file_id="written.txt", operation_type=OperationType.CREATE)
+
+    assert [r.filename_position for r in records] == [0, 1]
+    # Only the record added outside the block is written straight away
+    put_item_mock.assert_called_once()
+    assert put_item_mock.call_args.args[0].file_id == "written.txt"
+
+
+def test_add_record_in_background_mode(monkeypatch):
+    monkeypatch.setenv("AUDIT_WRITE_MODE", "background")
+    fake_request = Mock()
+    fake_request.headers = {"x-request-id": "background-1"}
+
+    with patch("src.services.audit_service.put_items") as put_items_mock, \
+         patch("src.services.audit_service.put_item") as put_item_mock:
+        for position in range(3):
+            add_record(request=fake_request, filename_position=position, service_id="pytest-test-service",
+                       file_id="queued.txt", operation_type=OperationType.CREATE)
+        assert flush_pending_records(timeout=5) is True
+
+    put_item_mock.assert_not_called()
+    written = [r.filename_position for c in put_items_mock.call_args_list for r in c.args[0]]
+    assert written == [0, 1, 2]
+
+
+def test_background_writer_created_once_by_concurrent_first_uses():
+    original_init = BackgroundAuditWriter.__init__
+
+    def slow_init(self):
+        time.sleep(0.05)
+        original_init(self)
+
+    with patch.object(BackgroundAuditWriter, "_instance", None), \
+         patch.object(BackgroundAuditWriter, "__init__", slow_init), \
+         ThreadPoolExecutor(max_workers=8) as executor:
+        writers = list(executor.map(lambda _: BackgroundAuditWriter.get_instance(), range(8)))
+
+    assert all(writer is writers[0] for writer in writers)
+    assert writers[0]._queue is not None
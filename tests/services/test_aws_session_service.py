@@ -0,0 +1,65 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+
+from src.services import aws_session_service
+from src.services.aws_session_service import AwsSessionService
+
+
+@pytest.fixture
+def session_service():
+    with patch.object(AwsSessionService, '_instance', None):
+        yield AwsSessionService.get_instance()
+
+
+def test_get_instance_returns_one_instance(session_service):
+    assert AwsSessionService.get_instance() is session_service
+
+
+def test_get_client_shared_between_callers(session_service):
+    first = aws_session_service.get_client('s3', region_name='eu-west-2')
+    second = aws_session_service.get_client('s3', region_name='eu-west-2')
+
+    assert first is second
+
+
+def test_get_client_separate_for_different_args(session_service):
+    production = aws_session_service.get_client('s3', region_name='eu-west-2')
+    local = aws_session_service.get_client('s3', region_name='eu-west-2', endpoint_url='http://localhost:4566')
+
+    assert production is not local
+
+
+def test_get_client_created_once_when_requested_concurrently(session_service):
+    barrier = threading.Barrier(8, timeout=5)
+
+    def get_client():
+        barrier.wait()
+        return aws_session_service.get_client('s3', region_name='eu-west-2')
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        clients = list(executor.map(lambda _: get_client(), range(8)))
+
+    assert all(client is clients[0] for client in clients)
+
+
+def test_get_client_uses_tuned_config(session_service, monkeypatch):
+    monkeypatch.setenv('AWS_MAX_POOL_CONNECTIONS', '42')
+    monkeypatch.setenv('AWS_RETRY_MODE', 'adaptive')
+    monkeypatch.setenv('AWS_MAX_ATTEMPTS', '7')
+
+    with patch.object(AwsSessionService, '_instance', None):
+        client = aws_session_service.get_client('s3', region_name='eu-west-2')
+
+    assert client.meta.config.max_pool_connections == 42
+    assert client.meta.config.tcp_keepalive is True
+    assert client.meta.config.retries == {'mode': 'adaptive', 'total_max_attempts': 7}
+
+
+def test_get_resource_shared_between_callers(session_service):
+    first = aws_session_service.get_resource('dynamodb', region_name='eu-west-2')
+    second = aws_session_service.get_resource('dynamodb', region_name='eu-west-2')
+
+    assert first is second
@@ -1,54 +1,172 @@
+import asyncio
+import hashlib
+import socket
+import struct
+import time
 from io import BytesIO
-from unittest.mock import patch
+from unittest.mock import patch, AsyncMock
 
 import pytest
+from fastapi import UploadFile
 
 from src.models.status_report import Category
-from src.services.clam_av_service import ClamAVService, ClamAvServiceStatusReporter
+from src.services.clam_av_service import (ClamAVService, ClamAvServiceStatusReporter, ClamdEndpoint, ClamdSession,
+                                          VerdictCache, get_endpoint_addresses)
+
+
+class FakeClamd:
+    """
+    Minimal clamd speaking the IDSESSION, INSTREAM, VERSION and PING commands on a local port, recording the
+    content it is sent to scan.
+    """
+    def __init__(self, verdict: str = "OK", reply: bool = True, version: str = "ClamAV 1.4.1/27432"):
+        self.verdict = verdict
+        self.reply = reply
+        self.version = version
+        self.connections = 0
+        self.received = []
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        if await reader.readuntil(b'\0') == b'zPING\0':
+            writer.write(b'PONG\0')
+            writer.close()
+            return
+        command_id = 0
+        try:
+            while (command := await reader.readuntil(b'\0')) in (b'zINSTREAM\0', b'zVERSION\0'):
+                command_id += 1
+                if command == b'zVERSION\0':
+                    writer.write(f"{command_id}: {self.version}\0".encode())
+                    continue
+                content = b''
+                while size := struct.unpack('!L', await reader.readexactly(4))[0]:
+                    content += await reader.readexactly(size)
+                self.received.append(content)
+                if self.reply:
+                    writer.write(f"{command_id}: stream: {self.verdict}\0".encode())
+                    await writer.drain()
+        except asyncio.IncompleteReadError:
+            pass
+        writer.close()
+
+    async def __aenter__(self):
+        self.server = await asyncio.start_server(self.handle, '127.0.0.1', 0)
+        self.endpoint = ClamdEndpoint('127.0.0.1', self.server.sockets[0].getsockname()[1])
+        self.endpoints_patch = patch.object(ClamAVService.get_instance(), 'endpoints', [self.endpoint])
+        self.endpoints_patch.start()
+        return self
+
+    async def __aexit__(self, *args):
+        self.endpoints_patch.stop()
+        self.server.close()
+
+
+@pytest.fixture
+def verdict_cache():
+    cache = VerdictCache(maxsize=10, ttl=60)
+    with patch.object(ClamAVService.get_instance(), 'verdict_cache', cache):
+        yield cache
+
+
+def unused_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def mock_endpoints():
+    endpoints = [ClamdEndpoint('clamd-1', 3310), ClamdEndpoint('clamd-2', 3310)]
+    with patch.object(ClamAVService.get_instance(), 'endpoints', endpoints):
+        yield endpoints
 
 
 @pytest.mark.asyncio
-@patch.object(ClamAVService.get_instance(), '_clamd')
-@pytest.mark.parametrize("scan_result,expected_status,expected_message",  [
-    ({"stream": ["OK"]}, 200, ""),
-    ({"stream": ["FOUND"]}, 400, "Virus Found"),
-    ({"stream": ["ERROR"]}, 500, "Virus scan gave non-standard result")
+@pytest.mark.parametrize("verdict,expected_status,expected_message",  [
+    ("OK", 200, ""),
+    ("Eicar-Signature FOUND", 400, "Virus Found"),
+    ("Can't allocate memory ERROR", 500, "Virus scan gave non-standard result")
 ])
-async def test_check_av_service(mock_clamd, scan_result, expected_status, expected_message):
+async def test_check_av_service(verdict, expected_status, expected_message):
     # Create BytesIO object simulating a file
     file = BytesIO(b'test content')
     av_service = ClamAVService.get_instance()
 
-    mock_clamd.instream.return_value = scan_result
-
-    status, message = await av_service.check(file)
+    async with FakeClamd(verdict) as clamd_server:
+        status, message = await av_service.check(file)
 
     assert status == expected_status
     assert message == expected_message
+    assert clamd_server.received == [b'test content']
 
 
-@patch.object(ClamAVService.get_instance(), '_clamd')
-def test_status_reporter_success(mock_clamd):
-    # ClamAV mock returns without raising an exception, so each check passes
-    so = ClamAvServiceStatusReporter.get_status()
+@pytest.mark.asyncio
+async def test_check_streams_upload_file_in_chunks():
+    content = b'x' * (ClamdSession.max_chunk_size * 2 + 10)
+    file = UploadFile(file=BytesIO(content), filename='test_file.txt')
 
-    assert so.has_failures() is False
+    async with FakeClamd() as clamd_server:
+        status, _ = await ClamAVService.get_instance().check(file)
 
+    assert status == 200
+    assert clamd_server.received == [content]
 
-@patch.object(ClamAVService.get_instance(), '_clamd')
-def test_status_reporter_failure(mock_clamd):
-    mock_clamd.version.side_effect = Exception()
 
-    so = ClamAvServiceStatusReporter.get_status()
+@pytest.mark.asyncio
+async def test_check_reuses_session_connection():
+    av_service = ClamAVService.get_instance()
 
-    assert so.has_failures()
+    async with FakeClamd() as clamd_server:
+        results = [await av_service.check(BytesIO(f'file {i}'.encode())) for i in range(3)]
+
+    assert results == [(200, '')] * 3
+    assert clamd_server.received == [b'file 0', b'file 1', b'file 2']
+    assert clamd_server.connections == 1
+
+
+@pytest.mark.asyncio
+async def test_check_times_out_when_clamd_does_not_reply():
+    av_service = ClamAVService.get_instance()
+
+    with patch.object(av_service, 'scan_timeout', 0.1):
+        async with FakeClamd(reply=False) as clamd_server:
+            result = await av_service.check(BytesIO(b'test content'))
+            # The connection left waiting on a reply is discarded rather than reused
+            assert await av_service.check(BytesIO(b'more content')) == (500, 'Virus scan timed out')
+
+    assert result == (500, 'Virus scan timed out')
+    assert clamd_server.connections == 2
+
+
+@pytest.mark.asyncio
+async def test_status_reporter_success():
+    async with FakeClamd() as clamd_server:
+        so = await ClamAvServiceStatusReporter.get_status()
+
+    endpoint_name = clamd_server.endpoint.name
+    assert so.has_failures() is False
+    assert set(so.details) == {endpoint_name, 'verdict_cache'}
+    assert so.details[endpoint_name]['healthy'] is True
+    assert so.details[endpoint_name]['outstanding'] == 0
+    assert so.details[endpoint_name]['ping_ms'] is not None
 
 
-@patch.object(ClamAVService.get_instance(), '_clamd')
-def test_status_reporter_partial_failure(mock_clamd):
-    mock_clamd.ping.side_effect = Exception()
+@pytest.mark.asyncio
+async def test_status_reporter_failure(mock_endpoints):
+    with patch.object(ClamdEndpoint, 'get_signature_version', AsyncMock(return_value="")), \
+            patch.object(ClamdEndpoint, 'probe', AsyncMock(return_value=False)) as probe:
+        so = await ClamAvServiceStatusReporter.get_status()
 
-    so = ClamAvServiceStatusReporter.get_status()
+    assert so.has_failures()
+    probe.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_status_reporter_partial_failure(mock_endpoints):
+    with patch.object(ClamdEndpoint, 'get_signature_version', AsyncMock(return_value="ClamAV 1.4.1/27432")), \
+            patch.object(ClamdEndpoint, 'probe', AsyncMock(return_value=False)):
+        so = await ClamAvServiceStatusReporter.get_status()
 
     assert so.has_failures()
     for check in so.observations:
@@ -56,3 +174,207 @@ def test_status_reporter_partial_failure(mock_clamd):
             assert check.category == Category.success
         elif check.phenomenon == 'responding':
             assert check.category == Category.failure
+
+
+@pytest.mark.asyncio
+async def test_status_reporter_ejects_endpoint_failing_ping():
+    # A port nothing listens on
+    with socket.socket() as unused:
+        unused.bind(('127.0.0.1', 0))
+        unused_port = unused.getsockname()[1]
+    down = ClamdEndpoint('127.0.0.1', unused_port)
+
+    async with FakeClamd() as clamd_server:
+        with patch.object(ClamAVService.get_instance(), 'endpoints', [down, clamd_server.endpoint]):
+            so = await ClamAvServiceStatusReporter.get_status()
+
+    # The other endpoint can still take scans, so the service as a whole is not failing
+    assert so.has_failures() is False
+    assert so.details[down.name]['healthy'] is False
+    assert down.is_healthy() is False
+    assert clamd_server.endpoint.is_healthy() is True
+
+
+def test_choose_endpoint_prefers_least_outstanding(mock_endpoints):
+    mock_endpoints[0].outstanding = 2
+    mock_endpoints[1].outstanding = 1
+
+    assert ClamAVService.get_instance().choose_endpoint() is mock_endpoints[1]
+
+
+def test_choose_endpoint_skips_ejected_endpoint(mock_endpoints):
+    mock_endpoints[1].outstanding = 5
+    mock_endpoints[0].eject(ConnectionError())
+
+    assert ClamAVService.get_instance().choose_endpoint() is mock_endpoints[1]
+
+
+def test_choose_endpoint_falls_back_when_all_ejected(mock_endpoints):
+    for endpoint in mock_endpoints:
+        endpoint.eject(ConnectionError())
+
+    assert ClamAVService.get_instance().choose_endpoint() in mock_endpoints
+
+
+def test_eject_backs_off_on_repeated_failures(monkeypatch):
+    monkeypatch.setenv('CLAMD_EJECT_SECONDS', '10')
+    monkeypatch.setenv('CLAMD_MAX_EJECT_SECONDS', '25')
+    endpoint = ClamdEndpoint('clamd-1', 3310)
+    periods = []
+    for _ in range(3):
+        started = time.monotonic()
+        endpoint.eject(ConnectionError())
+        periods.append(round(endpoint.ejected_until - started))
+
+    assert periods == [10, 20, 25]
+
+
+@pytest.mark.parametrize("endpoints,expected", [
+    ("", [('clamd-host', 3311)]),
+    ("clamd-1:3310,clamd-2", [('clamd-1', 3310), ('clamd-2', 3311)]),
+])
+def test_get_endpoint_addresses(monkeypatch, endpoints, expected):
+    monkeypatch.setenv('CLAMD_HOST', 'clamd-host')
+    monkeypatch.setenv('CLAMD_PORT', '3311')
+    monkeypatch.setenv('CLAMD_ENDPOINTS', endpoints)
+
+    assert get_endpoint_addresses() == expected
+
+
+@pytest.mark.asyncio
+async def test_check_routes_to_least_busy_endpoint():
+    async with FakeClamd() as busy_server, FakeClamd() as idle_server:
+        endpoints = [busy_server.endpoint, idle_server.endpoint]
+        busy_server.endpoint.outstanding = 1
+        with patch.object(ClamAVService.get_instance(), 'endpoints', endpoints):
+            result = await ClamAVService.get_instance().check(BytesIO(b'test content'))
+
+    assert result == (200, '')
+    assert busy_server.received == []
+    assert idle_server.received == [b'test content']
+    assert idle_server.endpoint.latency is not None
+
+
+@pytest.mark.asyncio
+async def test_check_ejects_unreachable_endpoint():
+    unreachable = ClamdEndpoint('127.0.0.1', unused_port())
+
+    async with FakeClamd() as clamd_server:
+        endpoints = [unreachable, clamd_server.endpoint]
+        with patch.object(ClamAVService.get_instance(), 'endpoints', endpoints):
+            with pytest.raises(OSError):
+                await ClamAVService.get_instance().check(BytesIO(b'first'))
+            result = await ClamAVService.get_instance().check(BytesIO(b'second'))
+
+    assert unreachable.is_healthy() is False
+    assert result == (200, '')
+    assert clamd_server.received == [b'second']
+
+
+@pytest.mark.asyncio
+async def test_probe_reinstates_recovered_endpoint():
+    async with FakeClamd() as clamd_server:
+        endpoint = clamd_server.endpoint
+        endpoint.eject(ConnectionError())
+        endpoint.ejected_until = time.monotonic()
+
+        assert endpoint.is_due_probe()
+        assert await endpoint.probe(1) is True
+
+    assert endpoint.is_healthy()
+    assert endpoint.ping_latency is not None
+
+
+@pytest.mark.asyncio
+async def test_probe_keeps_unreachable_endpoint_ejected():
+    endpoint = ClamdEndpoint('127.0.0.1', unused_port())
+
+    assert await endpoint.probe(1) is False
+    assert endpoint.is_healthy() is False
+
+
+@pytest.mark.asyncio
+async def test_check_reuses_clean_verdict_for_same_content(verdict_cache):
+    av_service = ClamAVService.get_instance()
+    checksum = hashlib.sha256(b'test content').hexdigest()
+
+    async with FakeClamd() as clamd_server:
+        first = await av_service.check(BytesIO(b'test content'), checksum)
+        second = await av_service.check(BytesIO(b'test content'), checksum)
+
+    assert first == second == (200, '')
+    assert clamd_server.received == [b'test content']
+    assert verdict_cache.get_details() == {'hits': 1, 'misses': 1, 'size': 1}
+
+
+@pytest.mark.asyncio
+async def test_check_does_not_cache_infected_verdict(verdict_cache):
+    av_service = ClamAVService.get_instance()
+    checksum = hashlib.sha256(b'bad content').hexdigest()
+
+    async with FakeClamd("Eicar-Signature FOUND") as clamd_server:
+        results = [await av_service.check(BytesIO(b'bad content'), checksum) for _ in range(2)]
+
+    assert results == [(400, 'Virus Found')] * 2
+    assert len(clamd_server.received) == 2
+    assert verdict_cache.get_details()['size'] == 0
+
+
+@pytest.mark.asyncio
+async def test_check_rescans_when_signatures_change(verdict_cache, monkeypatch):
+    monkeypatch.setenv('CLAMD_VERSION_TTL', '0')
+    av_service = ClamAVService.get_instance()
+    checksum = hashlib.sha256(b'test content').hexdigest()
+
+    async with FakeClamd() as clamd_server:
+        await av_service.check(BytesIO(b'test content'), checksum)
+        clamd_server.version = "ClamAV 1.4.1/27433"
+        await av_service.check(BytesIO(b'test content'), checksum)
+
+    assert len(clamd_server.received) == 2
+    assert verdict_cache.hits == 0
+
+
+@pytest.mark.asyncio
+async def test_check_does_not_cache_verdict_from_other_endpoint(verdict_cache):
+    ejected = ClamdEndpoint('127.0.0.1', unused_port())
+    checksum = hashlib.sha256(b'test content').hexdigest()
+
+    async def version_then_eject(timeout):
+        ejected.eject(ConnectionResetError())
+        return "ClamAV 1.4.1/99999"
+
+    async with FakeClamd() as clamd_server:
+        with patch.object(ClamAVService.get_instance(), 'endpoints', [ejected, clamd_server.endpoint]), \
+             patch.object(ejected, 'get_signature_version', version_then_eject):
+            result = await ClamAVService.get_instance().check(BytesIO(b'test content'), checksum)
+
+    # The scan went to the other endpoint, whose signature version was not asked
+    assert result == (200, '')
+    assert clamd_server.received == [b'test content']
+    assert verdict_cache.get_details()['size'] == 0
+
+
+@pytest.mark.asyncio
+async def test_check_without_checksum_skips_cache(verdict_cache):
+    async with FakeClamd() as clamd_server:
+        for _ in range(2):
+            await ClamAVService.get_instance().check(BytesIO(b'test content'))
+
+    assert len(clamd_server.received) == 2
+    assert verdict_cache.get_details() == {'hits': 0, 'misses': 0, 'size': 0}
+
+
+@pytest.mark.asyncio
+async def test_warm_up_opens_session_to_each_endpoint():
+    unreachable = ClamdEndpoint('127.0.0.1', unused_port())
+
+    async with FakeClamd() as clamd_server:
+        with patch.object(ClamAVService.get_instance(), 'endpoints', [unreachable, clamd_server.endpoint]):
+            reachable = await ClamAVService.get_instance().warm_up()
+            # The first scan reuses the session opened by warm-up
+            await ClamAVService.get_instance().check(BytesIO(b'test content'))
+
+    assert reachable == 1
+    assert clamd_server.connections == 1
+    assert unreachable.is_healthy() is False
@@ -1,12 +1,17 @@
 import os
 import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import patch
 
+from cachetools import LRUCache, TTLCache
+
 from fastapi import HTTPException
 
 import src.services.client_config_service
 from src.models.status_report import Category
-from src.services.client_config_service import ClientConfigServiceStatusReporter
+from src.models.client_config import ClientConfig
+from src.services.client_config_service import ClientConfigService, ClientConfigServiceStatusReporter
 
 
 def test_unauthenticated_user_raises_exception():
@@ -43,13 +48,71 @@ def test_configs_are_cached():
         mock_load.assert_called_once()
 
 
-def test_config_ttl():
+def test_configs_reloaded_when_config_files_change(tmp_path, monkeypatch):
+    config_file = tmp_path / 'client_a.json'
+    config_file.write_text('{"azure_client_id": "client_a", "bucket_name": "bucket_a", "azure_display_name": "A"}')
+    monkeypatch.setenv('CONFIG_DIR', str(tmp_path))
     src.services.client_config_service.ClientConfigService.clear_cache()
-    src.services.client_config_service.ClientConfigService._config_default_ttl = 0
-    src.services.client_config_service.get_config_for_client('test_user')
+    index = src.services.client_config_service.ClientConfigIndex.get_instance()
+
+    assert src.services.client_config_service.get_config_for_client('client_a').bucket_name == 'bucket_a'
+
+    # Unchanged files leave cached configs in place
+    assert index.refresh() is False
     with patch.object(src.services.client_config_service.ClientConfigService, 'load') as mock_load:
-        src.services.client_config_service.get_config_for_client('test_user')
-        mock_load.assert_called()
+        src.services.client_config_service.get_config_for_client('client_a')
+        mock_load.assert_not_called()
+
+    config_file.write_text('{"azure_client_id": "client_a", "bucket_name": "bucket_b", "azure_display_name": "A"}')
+    os.utime(config_file, ns=(0, 0))
+    assert index.refresh() is True
+
+    assert src.services.client_config_service.get_config_for_client('client_a').bucket_name == 'bucket_b'
+    index.stop_refreshing()
+
+
+def test_config_index_only_parses_changed_files(tmp_path):
+    (tmp_path / 'client_a.json').write_text(
+        '{"azure_client_id": "client_a", "bucket_name": "bucket_a", "azure_display_name": "A"}')
+    index = src.services.client_config_service.ClientConfigIndex(str(tmp_path))
+    index.refresh()
+    (tmp_path / 'client_b.json').write_text(
+        '{"azure_client_id": "client_b", "bucket_name": "bucket_b", "azure_display_name": "B"}')
+
+    with patch.object(index, 'parse', wraps=index.parse) as mock_parse:
+        assert index.refresh() is True
+
+    mock_parse.assert_called_once_with(tmp_path / 'client_b.json')
+    assert index.generation == 2
+    assert sorted(c.azure_client_id for c in index.get_all()) == ['client_a', 'client_b']
+
+
+def test_config_index_drops_removed_and_duplicate_clients(tmp_path):
+    config = '{"azure_client_id": "client_a", "bucket_name": "bucket_a", "azure_display_name": "A"}'
+    (tmp_path / 'client_a.json').write_text(config)
+    (tmp_path / 'client_b.json').write_text(config.replace('client_a', 'client_b'))
+    index = src.services.client_config_service.ClientConfigIndex(str(tmp_path))
+    index.refresh()
+    assert index.get('client_b') is not None
+
+    # Conflicting configs for one client are not used
+    (tmp_path / 'copy').mkdir()
+    (tmp_path / 'copy' / 'client_a.json').write_text(config)
+    (tmp_path / 'client_b.json').unlink()
+    index.refresh()
+
+    assert index.get('client_a') is None
+    assert index.get('client_b') is None
+
+
+def test_config_index_skips_config_with_misconfigured_validator(tmp_path):
+    (tmp_path / 'client_a.json').write_text(
+        '{"azure_client_id": "client_a", "bucket_name": "bucket_a", "azure_display_name": "A",'
+        ' "file_validators": [{"name": "NoSuchValidator", "validator_kwargs": {}}]}')
+    index = src.services.client_config_service.ClientConfigIndex(str(tmp_path))
+    index.refresh()
+
+    assert index.get('client_a') is None
 
 
 @patch('pathlib.Path.rglob')
@@ -81,3 +144,93 @@ def test_status_reporter_partial_failure(mock_isdir, mock_pathlib):
             assert check.category == Category.success
         elif check.phenomenon == 'populated':
             assert check.category == Category.failure
+
+
+def test_load_all_configs(tmp_path, monkeypatch):
+    (tmp_path / 'team').mkdir()
+    (tmp_path / 'team' / 'client_a.json').write_text(
+        '{"azure_client_id": "client_a", "bucket_name": "bucket_a", "azure_display_name": "Client A"}')
+    (tmp_path / 'client_b.json').write_text(
+        '{"azure_client_id": "client_b", "bucket_name": "bucket_b", "azure_display_name": "Client B"}')
+    (tmp_path / 'broken.json').write_text('not json')
+    monkeypatch.setenv('CONFIG_DIR', str(tmp_path))
+    src.services.client_config_service.ClientConfigService.clear_cache()
+
+    configs = src.services.client_config_service.load_all_configs()
+
+    assert sorted(c.azure_client_id for c in configs) == ['client_a', 'client_b']
+    # Configs are cached, so are not loaded again on first use
+    with patch.object(src.services.client_config_service.ClientConfigService, 'load') as mock_load:
+        src.services.client_config_service.get_config_for_client('client_a')
+        mock_load.assert_not_called()
+    src.services.client_config_service.ClientConfigService.clear_cache()
+
+
+def test_config_index_not_built_without_file_source():
+    with patch.object(ClientConfigService, '_config_sources', ['env', 'other']), \
+            patch.object(src.services.client_config_service.ClientConfigIndex, 'get_instance') as mock_get_index, \
+            patch.object(ClientConfigService, 'load', return_value=None):
+        ClientConfigService.clear_cache()
+        assert src.services.client_config_service.get_config_for_client('test_user') is None
+        assert src.services.client_config_service.load_all_configs() == []
+        ClientConfigService.clear_cache()
+
+    mock_get_index.assert_not_called()
+
+
+def test_missing_configs_expire():
+    now = [0.0]
+    with patch.object(ClientConfigService, '_missing_configs', TTLCache(maxsize=10, ttl=30, timer=lambda: now[0])), \
+         patch.object(ClientConfigService, 'load', return_value=None) as mock_load:
+        ClientConfigService.clear_cache()
+        assert src.services.client_config_service.get_config_for_client('unknown') is None
+        assert src.services.client_config_service.get_config_for_client('unknown') is None
+        assert mock_load.call_count == 1
+
+        now[0] = 31
+        assert src.services.client_config_service.get_config_for_client('unknown') is None
+        assert mock_load.call_count == 2
+
+
+def test_unknown_clients_do_not_evict_known_clients():
+    config = ClientConfig(azure_client_id='known', bucket_name='bucket', azure_display_name='Known')
+
+    def load(self):
+        return config if self.username == 'known' else None
+
+    with patch.object(ClientConfigService, '_configs', LRUCache(maxsize=2)), \
+         patch.object(ClientConfigService, '_missing_configs', TTLCache(maxsize=2, ttl=30)), \
+         patch.object(ClientConfigService, 'load', autospec=True, side_effect=load) as mock_load:
+        ClientConfigService.clear_cache()
+        src.services.client_config_service.get_config_for_client('known')
+        for i in range(100):
+            src.services.client_config_service.get_config_for_client(f'unknown-{i}')
+
+        assert len(ClientConfigService._missing_configs) == 2
+        assert src.services.client_config_service.get_config_for_client('known') is config
+        assert mock_load.call_count == 101
+
+
+def test_concurrent_requests_share_one_load():
+    config = ClientConfig(azure_client_id='slow', bucket_name='bucket', azure_display_name='Slow')
+    load_started = threading.Event()
+    release_load = threading.Event()
+
+    def slow_load(self):
+        load_started.set()
+        release_load.wait(timeout=5)
+        return config
+
+    with patch.object(ClientConfigService, 'load', autospec=True, side_effect=slow_load) as mock_load:
+        ClientConfigService.clear_cache()
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            first = executor.submit(src.services.client_config_service.get_config_for_client, 'slow')
+            load_started.wait(timeout=5)
+            others = [executor.submit(src.services.client_config_service.get_config_for_client, 'slow')
+                      for _ in range(3)]
+            release_load.set()
+            configs = [first.result()] + [f.result() for f in others]
+
+    assert configs == [config] * 4
+    mock_load.assert_called_once()
+    ClientConfigService.clear_cache()
@@ -1,15 +1,20 @@
+import base64
+import hashlib
 import os
-from unittest.mock import patch
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch, MagicMock
 
-import boto3
 import pytest
 from botocore.exceptions import ClientError
 from io import BytesIO
 
 import src.services.s3_service
 from src.models.execeptions.file_not_found import FileNotFoundException
+from src.models.execeptions.invalid_range import InvalidRangeException
 from src.models.client_config import ClientConfig
-from src.services.s3_service import S3Service, S3ServiceStatusReporter
+from src.services.s3_service import PresignedUrlCache, S3Service, S3ServiceStatusReporter
 import structlog
 
 logger = structlog.get_logger()
@@ -36,8 +41,14 @@ def s3_service():
         return instance
 
 
+@pytest.fixture(autouse=True)
+def clear_url_cache(s3_service):
+    # The s3_service fixture is shared by the whole module, so URLs cached by one test must not leak into the next
+    s3_service.url_cache.clear()
+
+
 def test_get_s3_client_local(s3_service, mocker):
-    mock_client = mocker.patch.object(boto3, 'client')
+    mock_client = mocker.patch.object(src.services.s3_service.aws_session_service, 'get_client')
     s3_service.get_s3_client()
     mock_client.assert_called_once_with(
         's3',
@@ -71,6 +82,124 @@ def test_generate_file_url_missing_file(s3_service, mocker):
         assert str(e.filename) == 'test_key'
 
 
+def test_generate_file_url_reuses_cached_url(s3_service, mocker):
+    mocker.patch.object(s3_service.s3_client, 'generate_presigned_url', side_effect=['url-1', 'url-2'])
+    mock_head = mocker.patch.object(s3_service.s3_client, 'head_object')
+
+    assert s3_service.generate_file_url('test_key') == 'url-1'
+    assert s3_service.generate_file_url('test_key') == 'url-1'
+    mock_head.assert_called_once()
+
+    # A different lifetime needs a new URL
+    assert s3_service.generate_file_url('test_key', expiration=300) == 'url-2'
+
+
+def test_presigned_url_cache_expires_before_url():
+    cache = PresignedUrlCache(maxsize=10, lifetime_fraction=0.5)
+    create_url = MagicMock(side_effect=['url-1', 'url-2'])
+
+    assert cache.get_or_create('test_key', 0.2, create_url) == 'url-1'
+    assert cache.get_or_create('test_key', 0.2, create_url) == 'url-1'
+    # Kept for half of the URL's 0.2 second lifetime
+    time.sleep(0.15)
+    assert cache.get_or_create('test_key', 0.2, create_url) == 'url-2'
+
+
+def test_presigned_url_cache_waiter_creates_url_after_timeout():
+    cache = PresignedUrlCache(maxsize=10, lifetime_fraction=0.5, wait_timeout=0.05)
+    first_started = threading.Event()
+    release_first = threading.Event()
+
+    def slow_create_url():
+        first_started.set()
+        release_first.wait()
+        return 'url-1'
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        first = executor.submit(cache.get_or_create, 'test_key', 60, slow_create_url)
+        first_started.wait()
+        # The first request is still creating the URL, so the second stops waiting and creates its own
+        assert cache.get_or_create('test_key', 60, lambda: 'url-2') == 'url-2'
+        release_first.set()
+        assert first.result() == 'url-1'
+
+    assert cache.get_or_create('test_key', 60, lambda: 'url-3') == 'url-1'
+
+
+def test_generate_file_url_invalidated_by_upload(s3_service, mocker):
+    mocker.patch.object(s3_service.s3_client, 'generate_presigned_url', side_effect=['url-1', 'url-2'])
+    mock_head = mocker.patch.object(s3_service.s3_client, 'head_object')
+    mocker.patch.object(s3_service.s3_client, 'put_object')
+
+    s3_service.generate_file_url('test_key')
+    s3_service.upload_file_obj(BytesIO(b'content'), 'test_key', hashlib.sha256(b'content').hexdigest())
+
+    assert s3_service.generate_file_url('test_key') == 'url-2'
+    assert mock_head.call_count == 2
+
+
+def test_generate_file_url_invalidated_by_other_client_of_bucket(s3_service, mocker):
+    bucket_name = s3_service.client_config.bucket_name
+    other_client = S3Service(ClientConfig(azure_client_id='other_user', bucket_name=bucket_name,
+                                          azure_display_name='other'))
+    mocker.patch.object(s3_service.s3_client, 'generate_presigned_url', side_effect=['url-1', 'url-2'])
+    mocker.patch.object(s3_service.s3_client, 'head_object')
+    mocker.patch.object(s3_service.s3_client, 'put_object')
+
+    other_client.generate_file_url('test_key')
+    s3_service.upload_file_obj(BytesIO(b'content'), 'test_key', hashlib.sha256(b'content').hexdigest())
+
+    assert other_client.generate_file_url('test_key') == 'url-2'
+
+
+def test_generate_file_url_invalidated_by_delete(s3_service, mocker):
+    mocker.patch.object(s3_service.s3_client, 'generate_presigned_url', return_value='url')
+    mock_head = mocker.patch.object(s3_service.s3_client, 'head_object')
+    mocker.patch.object(s3_service.s3_client, 'delete_objects', return_value={})
+
+    s3_service.generate_file_url('test_key')
+    s3_service.delete_object_versions([('test_key', 'v1')])
+    mock_head.side_effect = ClientError(error_response={'Error': {'Code': '404', 'Message': 'Not Found'}},
+                                        operation_name='head')
+
+    with pytest.raises(FileNotFoundException):
+        s3_service.generate_file_url('test_key')
+
+
+def test_generate_file_url_missing_file_not_cached(s3_service, mocker):
+    mocker.patch.object(s3_service.s3_client, 'generate_presigned_url', return_value='url')
+    mock_head = mocker.patch.object(s3_service.s3_client, 'head_object')
+    mock_head.side_effect = [ClientError(error_response={'Error': {'Code': '404', 'Message': 'Not Found'}},
+                                         operation_name='head'),
+                             {}]
+
+    with pytest.raises(FileNotFoundException):
+        s3_service.generate_file_url('test_key')
+    assert s3_service.generate_file_url('test_key') == 'url'
+
+
+def test_generate_file_url_concurrent_requests_share_head(s3_service, mocker):
+    mocker.patch.object(s3_service.s3_client, 'generate_presigned_url', return_value='url')
+    head_started = threading.Event()
+    release_head = threading.Event()
+
+    def slow_head(**kwargs):
+        head_started.set()
+        release_head.wait(timeout=5)
+
+    mock_head = mocker.patch.object(s3_service.s3_client, 'head_object', side_effect=slow_head)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        first = executor.submit(s3_service.generate_file_url, 'test_key')
+        head_started.wait(timeout=5)
+        others = [executor.submit(s3_service.generate_file_url, 'test_key') for _ in range(3)]
+        release_head.set()
+        urls = [first.result()] + [f.result() for f in others]
+
+    assert urls == ['url'] * 4
+    mock_head.assert_called_once()
+
+
 def test_upload_file_obj_success(s3_service, mocker):
     # Arrange
     mock_put_object = mocker.patch.object(s3_service.s3_client, 'put_object')
@@ -153,60 +282,119 @@ def test_upload_file_obj_fails_when_checksum_is_wrong(s3_service, mocker):
 
 
 def test_list_object_versions_success(s3_service, mocker):
-    mock_list_versions = mocker.patch.object(
-        s3_service.s3_client,
-        'list_object_versions',
-        return_value={'Versions': [{'VersionId': 'v1'}, {'VersionId': 'v2'}]}
-    )
+    mock_paginator = mocker.patch.object(s3_service.s3_client, 'get_paginator').return_value
+    mock_paginator.paginate.return_value = [
+        {'Versions': [{'Key': 'test_file.md', 'VersionId': 'v1'}, {'Key': 'test_file.md', 'VersionId': 'v2'}]}
+    ]
 
     versions = s3_service.list_object_versions('test_file.md')
 
-    assert versions == [{'VersionId': 'v1'}, {'VersionId': 'v2'}]
-    mock_list_versions.assert_called_once_with(
+    assert versions == [{'Key': 'test_file.md', 'VersionId': 'v1'}, {'Key': 'test_file.md', 'VersionId': 'v2'}]
+    mock_paginator.paginate.assert_called_once_with(
         Bucket=s3_service.client_config.bucket_name,
         Prefix='test_file.md'
     )
 
 
-def test_delete_object_version_success(s3_service, mocker):
-    mock_delete = mocker.patch.object(s3_service.s3_client, 'delete_object')
-    filename = 'test_file.md'
-    version_id = 'v1'
+def test_list_object_versions_reads_all_pages_for_exact_key_only(s3_service, mocker):
+    pages_read = []
 
-    s3_service.delete_object_version(filename, version_id)
+    def paginate(**kwargs):
+        for page in [
+            {'Versions': [{'Key': 'report.pdf', 'VersionId': f'v{i}'} for i in range(1000)]},
+            {'Versions': [{'Key': 'report.pdf', 'VersionId': 'v1000'}, {'Key': 'report.pdf.bak', 'VersionId': 'b1'}]},
+            {'Versions': [{'Key': 'report.pdf.bak', 'VersionId': 'b2'}]},
+        ]:
+            pages_read.append(page)
+            yield page
 
-    mock_delete.assert_called_once_with(
+    mocker.patch.object(s3_service.s3_client, 'get_paginator').return_value.paginate.side_effect = paginate
+
+    versions = s3_service.list_object_versions('report.pdf')
+
+    assert [v['VersionId'] for v in versions] == [f'v{i}' for i in range(1001)]
+    # Listing stops at the first key past report.pdf, so the last page is never fetched
+    assert len(pages_read) == 2
+
+
+def test_list_object_versions_with_max_versions(s3_service, mocker):
+    mock_paginator = mocker.patch.object(s3_service.s3_client, 'get_paginator').return_value
+    mock_paginator.paginate.return_value = [
+        {'Versions': [{'Key': 'test_file.md', 'VersionId': f'v{i}'} for i in range(5)]}
+    ]
+
+    versions = s3_service.list_object_versions('test_file.md', max_versions=2)
+
+    assert [v['VersionId'] for v in versions] == ['v0', 'v1']
+    mock_paginator.paginate.assert_called_once_with(
         Bucket=s3_service.client_config.bucket_name,
-        Key=filename,
-        VersionId=version_id
+        Prefix='test_file.md',
+        PaginationConfig={'PageSize': 2}
     )
 
 
-def test_delete_object_version_not_found(s3_service, mocker):
-    mocker.patch.object(
-        s3_service.s3_client,
-        'delete_object',
-        side_effect=ClientError(
-            error_response={"Error": {"Code": "NoSuchKey", "Message": "Not Found"}},
-            operation_name='DeleteObject'
-        )
+def test_list_object_versions_error(s3_service, mocker):
+    mock_paginator = mocker.patch.object(s3_service.s3_client, 'get_paginator').return_value
+    mock_paginator.paginate.side_effect = ClientError(
+        error_response={"Error": {"Code": "AccessDenied", "Message": "Access Denied"}},
+        operation_name='ListObjectVersions'
     )
 
-    with pytest.raises(FileNotFoundError):
-        s3_service.delete_object_version('missing_file.md', 'v1')
+    with pytest.raises(RuntimeError, match="Failed to list versions for test_file.md"):
+        s3_service.list_object_versions('test_file.md')
 
 
-def test_delete_object_version_unexpected_error(s3_service, mocker):
-    mocker.patch.object(
-        s3_service.s3_client,
-        'delete_object',
-        side_effect=RuntimeError("Unexpected failure")
-    )
+def make_listing_pages(*pages: list[str]) -> list[dict]:
+    "Pages as returned by the list_objects_v2 paginator, each holding the given keys"
+    return [{'Contents': [{'Key': key} for key in keys], 'IsTruncated': i < len(pages) - 1}
+            for i, keys in enumerate(pages)]
+
+
+def test_find_existing_keys_lists_covering_range(s3_service, mocker):
+    mock_paginator = mocker.patch.object(s3_service.s3_client, 'get_paginator').return_value
+    mock_paginator.paginate.return_value = make_listing_pages(['folder/a.txt', 'folder/b.txt'],
+                                                              ['folder/c.txt', 'folder/d.txt'])
+    mock_head = mocker.patch.object(s3_service.s3_client, 'head_object')
+
+    found = s3_service.find_existing_keys(['folder/b.txt', 'folder/c.txt', 'folder/x.txt'])
+
+    assert found == {'folder/b.txt', 'folder/c.txt'}
+    mock_paginator.paginate.assert_called_once_with(Bucket='test_bucket', Prefix='folder/',
+                                                    StartAfter='folder/b.tx')
+    mock_head.assert_not_called()
+
 
-    with pytest.raises(RuntimeError) as exc_info:
-        s3_service.delete_object_version('test_file.md', 'v1')
+def test_find_existing_keys_stops_after_last_wanted_key(s3_service, mocker):
+    pages = make_listing_pages(['folder/a.txt', 'folder/b.txt', 'folder/z.txt'], ['folder/zz.txt'])
+    mock_paginator = mocker.patch.object(s3_service.s3_client, 'get_paginator').return_value
+    mock_paginator.paginate.return_value = iter(pages)
 
-    assert "unexpected failure" in str(exc_info.value).lower()
+    found = s3_service.find_existing_keys(['folder/a.txt', 'folder/b.txt'])
+
+    assert found == {'folder/a.txt', 'folder/b.txt'}
+    # The second page is never requested
+    assert next(mock_paginator.paginate.return_value) == pages[1]
+
+
+def test_find_existing_keys_falls_back_to_head_for_large_listing(s3_service, mocker):
+    mocker.patch.object(S3Service, 'existence_listing_max_keys', 2)
+    mock_paginator = mocker.patch.object(s3_service.s3_client, 'get_paginator').return_value
+    mock_paginator.paginate.return_value = make_listing_pages(['folder/a.txt', 'folder/b.txt'],
+                                                              ['folder/c.txt', 'folder/d.txt'])
+    mock_head = mocker.patch.object(s3_service.s3_client, 'head_object')
+
+    found = s3_service.find_existing_keys(['folder/a.txt', 'folder/aa.txt', 'folder/d.txt'])
+
+    assert found == {'folder/a.txt', 'folder/d.txt'}
+    # Only the key beyond the listed range needs a HEAD, aa.txt is known to be missing
+    mock_head.assert_called_once_with(Bucket='test_bucket', Key='folder/d.txt')
+
+
+def test_find_existing_keys_with_no_keys(s3_service, mocker):
+    mock_get_paginator = mocker.patch.object(s3_service.s3_client, 'get_paginator')
+
+    assert s3_service.find_existing_keys([]) == set()
+    mock_get_paginator.assert_not_called()
 
 
 @patch('src.services.s3_service.S3Service.get_s3_client')
@@ -237,3 +425,176 @@ def test_status_reporter_failure(mock_client, mocker):
 
     mock_client.assert_called()
     assert so.has_failures()
+
+
+def test_object_writer_small_object_uses_single_put(s3_service, mocker):
+    mock_put_object = mocker.patch.object(s3_service.s3_client, 'put_object')
+    mock_create = mocker.patch.object(s3_service.s3_client, 'create_multipart_upload')
+    checksum = "e27c8214be8b7cf5bccc7c08247e3cb0c1514a48ee1f63197fe4ef3ef51d7e6f"
+
+    writer = s3_service.open_object_writer('test_file', {'key1': 'value1'})
+    writer.write(b"Test ")
+    writer.write(b"data")
+    writer.commit(checksum)
+
+    mock_create.assert_not_called()
+    mock_put_object.assert_called_once_with(
+        Bucket='test_bucket',
+        Key='test_file',
+        Body=b"Test data",
+        ChecksumAlgorithm="SHA256",
+        ChecksumSHA256="4nyCFL6LfPW8zHwIJH48sMFRSkjuH2MZf+TvPvUdfm8=",
+        Metadata={'key1': 'value1'}
+    )
+
+
+def test_object_writer_large_object_uses_multipart_upload(s3_service, mocker):
+    mocker.patch.object(src.services.s3_service.S3ObjectWriter, 'minimum_part_size', 4)
+    mock_put_object = mocker.patch.object(s3_service.s3_client, 'put_object')
+    mocker.patch.object(s3_service.s3_client, 'create_multipart_upload').return_value = {'UploadId': 'upload-1'}
+    mock_upload_part = mocker.patch.object(s3_service.s3_client, 'upload_part')
+    mock_upload_part.side_effect = [{'ETag': 'etag-1'}, {'ETag': 'etag-2'}, {'ETag': 'etag-3'}]
+    mock_complete = mocker.patch.object(s3_service.s3_client, 'complete_multipart_upload')
+    mock_complete.return_value = {}
+
+    writer = src.services.s3_service.S3ObjectWriter(s3_service.s3_client, 'test_bucket', 'test_file', part_size=4)
+    writer.write(b"Test da")
+    writer.write(b"ta!!!")
+    writer.commit(hashlib.sha256(b"Test data!!!").hexdigest())
+
+    mock_put_object.assert_not_called()
+    assert [c.kwargs['Body'] for c in mock_upload_part.call_args_list] == [b"Test", b" dat", b"a!!!"]
+    assert [c.kwargs['PartNumber'] for c in mock_upload_part.call_args_list] == [1, 2, 3]
+    # Each part carries its own checksum
+    first_part_checksum = mock_upload_part.call_args_list[0].kwargs['ChecksumSHA256']
+    assert first_part_checksum == "Uy6qvZV0iA2/drm4zACDLCCm7BE9aCKZVQ16bg80XiU="
+    parts = mock_complete.call_args.kwargs['MultipartUpload']['Parts']
+    assert [(p['ETag'], p['PartNumber']) for p in parts] == [('etag-1', 1), ('etag-2', 2), ('etag-3', 3)]
+
+
+def test_upload_file_obj_large_file_uses_concurrent_parts(s3_service, mocker):
+    mocker.patch.object(src.services.s3_service.S3ObjectWriter, 'minimum_part_size', 4)
+    mocker.patch.dict(os.environ, {'S3_MULTIPART_THRESHOLD': '8', 'S3_PART_SIZE': '4',
+                                   'S3_MULTIPART_CONCURRENCY': '2'})
+    mock_put_object = mocker.patch.object(s3_service.s3_client, 'put_object')
+    mocker.patch.object(s3_service.s3_client, 'create_multipart_upload').return_value = {'UploadId': 'upload-1'}
+    mock_upload_part = mocker.patch.object(s3_service.s3_client, 'upload_part')
+    mock_upload_part.side_effect = lambda **kwargs: {'ETag': f"etag-{kwargs['PartNumber']}"}
+    mock_complete = mocker.patch.object(s3_service.s3_client, 'complete_multipart_upload')
+    mock_complete.return_value = {}
+
+    content = b"0123456789abcdefXY"
+    s3_service.upload_file_obj(BytesIO(content), 'test_file', hashlib.sha256(content).hexdigest(), {'key1': 'value1'})
+
+    mock_put_object.assert_not_called()
+    bodies = sorted((c.kwargs['PartNumber'], c.kwargs['Body']) for c in mock_upload_part.call_args_list)
+    assert bodies == [(1, b"0123"), (2, b"4567"), (3, b"89ab"), (4, b"cdef"), (5, b"XY")]
+    parts = mock_complete.call_args.kwargs['MultipartUpload']['Parts']
+    assert [p['PartNumber'] for p in parts] == [1, 2, 3, 4, 5]
+
+
+def test_upload_file_obj_in_parts_rejects_unexpected_composite_checksum(s3_service, mocker):
+    mocker.patch.object(src.services.s3_service.S3ObjectWriter, 'minimum_part_size', 4)
+    mocker.patch.dict(os.environ, {'S3_PART_SIZE': '4'})
+    mocker.patch.object(s3_service.s3_client, 'create_multipart_upload').return_value = {'UploadId': 'upload-1'}
+    mocker.patch.object(s3_service.s3_client, 'upload_part').return_value = {'ETag': 'etag'}
+    mocker.patch.object(s3_service.s3_client, 'complete_multipart_upload').return_value = {'ChecksumSHA256': 'bad-2'}
+    mock_abort = mocker.patch.object(s3_service.s3_client, 'abort_multipart_upload')
+
+    with pytest.raises(ValueError):
+        s3_service.upload_file_obj_in_parts(BytesIO(b"0123456"), 'test_file', hashlib.sha256(b"0123456").hexdigest())
+
+    mock_abort.assert_called_once()
+
+
+def test_upload_file_obj_in_parts_rejects_content_not_matching_checksum(s3_service, mocker):
+    "A short or corrupted upload is not completed, even though its parts are consistent with each other"
+    mocker.patch.object(src.services.s3_service.S3ObjectWriter, 'minimum_part_size', 4)
+    mocker.patch.dict(os.environ, {'S3_PART_SIZE': '4'})
+    mocker.patch.object(s3_service.s3_client, 'create_multipart_upload').return_value = {'UploadId': 'upload-1'}
+    mocker.patch.object(s3_service.s3_client, 'upload_part').return_value = {'ETag': 'etag'}
+    mock_complete = mocker.patch.object(s3_service.s3_client, 'complete_multipart_upload')
+    mock_abort = mocker.patch.object(s3_service.s3_client, 'abort_multipart_upload')
+
+    with pytest.raises(ValueError):
+        s3_service.upload_file_obj_in_parts(BytesIO(b"012345"), 'test_file', hashlib.sha256(b"0123456").hexdigest())
+
+    mock_complete.assert_not_called()
+    mock_abort.assert_called_once()
+
+
+def test_composite_checksum():
+    part_checksums = ["Uy6qvZV0iA2/drm4zACDLCCm7BE9aCKZVQ16bg80XiU=", "Uy6qvZV0iA2/drm4zACDLCCm7BE9aCKZVQ16bg80XiU="]
+    result = src.services.s3_service.composite_checksum([{'ChecksumSHA256': c} for c in part_checksums])
+    expected_digest = hashlib.sha256(hashlib.sha256(b"Test").digest() * 2).digest()
+    assert result == f"{base64.b64encode(expected_digest).decode()}-2"
+
+
+def test_object_writer_abort_discards_parts(s3_service, mocker):
+    mocker.patch.object(src.services.s3_service.S3ObjectWriter, 'minimum_part_size', 4)
+    mocker.patch.object(s3_service.s3_client, 'create_multipart_upload').return_value = {'UploadId': 'upload-1'}
+    mocker.patch.object(s3_service.s3_client, 'upload_part').return_value = {'ETag': 'etag-1'}
+    mock_abort = mocker.patch.object(s3_service.s3_client, 'abort_multipart_upload')
+
+    writer = src.services.s3_service.S3ObjectWriter(s3_service.s3_client, 'test_bucket', 'test_file', part_size=4)
+    writer.write(b"Test data")
+    writer.abort()
+
+    mock_abort.assert_called_once_with(Bucket='test_bucket', Key='test_file', UploadId='upload-1')
+
+
+def test_delete_object_versions_returns_errors(s3_service, mocker):
+    error = {"Key": "file_b.md", "VersionId": "v2", "Code": "AccessDenied", "Message": "Access Denied"}
+    mock_delete = mocker.patch.object(s3_service.s3_client, 'delete_objects', return_value={"Errors": [error]})
+
+    errors = s3_service.delete_object_versions([('file_a.md', 'v1'), ('file_b.md', 'v2')])
+
+    assert errors == [error]
+    mock_delete.assert_called_once_with(
+        Bucket=s3_service.client_config.bucket_name,
+        Delete={
+            'Objects': [{'Key': 'file_a.md', 'VersionId': 'v1'}, {'Key': 'file_b.md', 'VersionId': 'v2'}],
+            'Quiet': True
+        }
+    )
+
+
+def test_delete_object_versions_rejects_too_many_versions(s3_service, mocker):
+    mock_delete = mocker.patch.object(s3_service.s3_client, 'delete_objects')
+
+    with pytest.raises(ValueError):
+        s3_service.delete_object_versions([('file.md', f'v{i}') for i in range(1001)])
+    mock_delete.assert_not_called()
+
+
+def test_open_object_with_range(s3_service, mocker):
+    mock_get = mocker.patch.object(s3_service.s3_client, 'get_object', return_value={'ETag': '"abc"'})
+
+    response = s3_service.open_object('test_key', byte_range='bytes=0-9', if_none_match='"xyz"')
+
+    assert response == {'ETag': '"abc"'}
+    mock_get.assert_called_once_with(Bucket='test_bucket', Key='test_key', Range='bytes=0-9', IfNoneMatch='"xyz"')
+
+
+def test_open_object_not_modified(s3_service, mocker):
+    mocker.patch.object(s3_service.s3_client, 'get_object').side_effect = ClientError(
+        error_response={'Error': {'Code': '304', 'Message': 'Not Modified'},
+                        'ResponseMetadata': {'HTTPStatusCode': 304, 'HTTPHeaders': {'etag': '"abc"'}}},
+        operation_name='GetObject')
+
+    response = s3_service.open_object('test_key', if_none_match='"abc"')
+
+    assert response == {'ResponseMetadata': {'HTTPStatusCode': 304}, 'ETag': '"abc"'}
+
+
+@pytest.mark.parametrize("error_code,expected_exception", [
+    ('NoSuchKey', FileNotFoundException),
+    ('InvalidRange', InvalidRangeException),
+    ('AccessDenied', ClientError),
+])
+def test_open_object_errors(s3_service, mocker, error_code, expected_exception):
+    mocker.patch.object(s3_service.s3_client, 'get_object').side_effect = ClientError(
+        error_response={'Error': {'Code': error_code, 'Message': 'Error'}}, operation_name='GetObject')
+
+    with pytest.raises(expected_exception):
+        s3_service.open_object('test_key', byte_range='bytes=100-')
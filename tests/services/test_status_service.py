@@ -1,4 +1,10 @@
+from unittest.mock import patch
+
+import pytest
+
 from src.models.status_report import StatusReport, Category, ServiceObservations
+from src.services import status_service
+from src.utils.status_reporter import StatusReporter
 
 
 def test_serviceobservations_add_check():
@@ -88,3 +94,22 @@ def test_report_multiple_service_mixed():
     report = StatusReport(services=[so, so_other])
 
     assert report.has_failures()
+
+
+@pytest.mark.asyncio
+async def test_get_status_awaits_async_reporters():
+    # Not subclasses of StatusReporter, so they are not gathered by other tests
+    class SyncReporter:
+        @classmethod
+        def get_status(cls) -> ServiceObservations:
+            return ServiceObservations(label='sync')
+
+    class AsyncReporter:
+        @classmethod
+        async def get_status(cls) -> ServiceObservations:
+            return ServiceObservations(label='async')
+
+    with patch.object(StatusReporter, '__subclasses__', return_value=[SyncReporter, AsyncReporter]):
+        report = await status_service.get_status()
+
+    assert [service.label for service in report.services] == ['sync', 'async']
@@ -0,0 +1,110 @@
+import asyncio
+import hashlib
+from io import BytesIO
+from unittest.mock import patch, AsyncMock, MagicMock
+
+import pytest
+
+from src.services import upload_pipeline_service
+
+
+def make_file(content: bytes) -> MagicMock:
+    file = MagicMock()
+    file.filename = "test_file.txt"
+    file.file = BytesIO(content)
+    return file
+
+
+def mock_scan(mock_clamav: MagicMock, verdict: tuple[int, str] = (200, "")) -> AsyncMock:
+    scan = AsyncMock()
+    scan.finish.return_value = verdict
+    mock_clamav.return_value.scan_timeout = 60
+    mock_clamav.return_value.instream.return_value.__aenter__.return_value = scan
+    return scan
+
+
+@pytest.mark.parametrize("env_value,expected", [("true", True), ("True", True), ("false", False), ("", False)])
+def test_pipeline_mode_enabled(monkeypatch, env_value, expected):
+    monkeypatch.setenv("UPLOAD_PIPELINE_MODE", env_value)
+    assert upload_pipeline_service.pipeline_mode_enabled() is expected
+
+
+@pytest.mark.asyncio
+@patch("src.services.upload_pipeline_service.s3_service.open_object_writer")
+@patch("src.services.upload_pipeline_service.ClamAVService.get_instance")
+async def test_scan_and_save_commits_clean_file(mock_clamav, mock_open_writer, monkeypatch):
+    monkeypatch.setenv("UPLOAD_PIPELINE_CHUNK_SIZE", "4")
+    content = b"Test content for the pipeline"
+    scan = mock_scan(mock_clamav)
+    writer = mock_open_writer.return_value
+
+    checksum, error_status = await upload_pipeline_service.scan_and_save(MagicMock(), make_file(content),
+                                                                         "test_file.txt", {"key": "value"})
+
+    assert error_status == ()
+    assert checksum == hashlib.sha256(content).hexdigest()
+    # Every chunk goes to both the scanner and the writer, in the order read
+    assert b"".join(c.args[0] for c in scan.send.call_args_list) == content
+    assert b"".join(c.args[0] for c in writer.write.call_args_list) == content
+    assert scan.send.call_count == 8
+    writer.commit.assert_called_once_with(checksum)
+    writer.abort.assert_not_called()
+
+
+@pytest.mark.asyncio
+@patch("src.services.upload_pipeline_service.s3_service.open_object_writer")
+@patch("src.services.upload_pipeline_service.ClamAVService.get_instance")
+async def test_scan_and_save_discards_infected_file(mock_clamav, mock_open_writer):
+    mock_scan(mock_clamav, (400, "Virus Found"))
+    writer = mock_open_writer.return_value
+
+    checksum, error_status = await upload_pipeline_service.scan_and_save(MagicMock(), make_file(b"Bad content"),
+                                                                         "test_file.txt")
+
+    assert error_status == (400, "Virus Found")
+    assert checksum == ""
+    writer.commit.assert_not_called()
+    writer.abort.assert_called_once()
+
+
+@pytest.mark.asyncio
+@patch("src.services.upload_pipeline_service.s3_service.open_object_writer")
+@patch("src.services.upload_pipeline_service.ClamAVService.get_instance")
+async def test_scan_and_save_discards_file_when_write_fails(mock_clamav, mock_open_writer):
+    scan = mock_scan(mock_clamav)
+    writer = mock_open_writer.return_value
+    writer.write.side_effect = RuntimeError("Connection reset")
+
+    checksum, error_status = await upload_pipeline_service.scan_and_save(MagicMock(), make_file(b"Test content"),
+                                                                         "test_file.txt")
+
+    assert error_status == (500, "The file test_file.txt could not be saved")
+    assert checksum == ""
+    scan.finish.assert_not_awaited()
+    # The scan session is left with the error, so its connection is discarded
+    session_exit = mock_clamav.return_value.instream.return_value.__aexit__
+    assert session_exit.call_args.args[0] is RuntimeError
+    writer.commit.assert_not_called()
+    writer.abort.assert_called_once()
+
+
+@pytest.mark.asyncio
+@patch("src.services.upload_pipeline_service.s3_service.open_object_writer")
+@patch("src.services.upload_pipeline_service.ClamAVService.get_instance")
+async def test_scan_and_save_discards_file_when_scan_times_out(mock_clamav, mock_open_writer):
+    scan = mock_scan(mock_clamav)
+    mock_clamav.return_value.scan_timeout = 0.05
+
+    async def stuck_finish():
+        await asyncio.sleep(5)
+
+    scan.finish.side_effect = stuck_finish
+    writer = mock_open_writer.return_value
+
+    checksum, error_status = await upload_pipeline_service.scan_and_save(MagicMock(), make_file(b"Test content"),
+                                                                         "test_file.txt")
+
+    assert error_status == (500, "Virus scan timed out")
+    assert checksum == ""
+    writer.commit.assert_not_called()
+    writer.abort.assert_called_once()
@@ -0,0 +1,106 @@
+import asyncio
+from unittest.mock import patch, AsyncMock, MagicMock
+
+import pytest
+
+from src.models.client_config import ClientConfig
+from src.models.status_report import Category
+from src.services import warm_up_service
+from src.services.warm_up_service import WarmUpStatusReporter
+
+
+@pytest.fixture(autouse=True)
+def reset_warm_up_state():
+    with patch.object(warm_up_service, '_finished', False), patch.object(warm_up_service, '_step_outcomes', {}):
+        yield
+
+
+@pytest.mark.asyncio
+async def test_warm_up_runs_every_step():
+    with patch.object(warm_up_service, 'warm_up_client_configs', AsyncMock()) as configs, \
+         patch.object(warm_up_service, 'warm_up_audit', AsyncMock()) as audit, \
+         patch.object(warm_up_service, 'warm_up_antivirus', AsyncMock()) as antivirus, \
+         patch.object(warm_up_service, 'warm_up_authentication', AsyncMock()) as authentication:
+        await warm_up_service.warm_up()
+
+    for step in (configs, audit, antivirus, authentication):
+        step.assert_awaited_once()
+    assert warm_up_service.is_finished()
+
+
+@pytest.mark.asyncio
+async def test_warm_up_finishes_when_a_step_fails():
+    with patch.object(warm_up_service, 'warm_up_client_configs', AsyncMock()), \
+         patch.object(warm_up_service, 'warm_up_audit', AsyncMock(side_effect=ValueError("No AUDIT_TABLE"))), \
+         patch.object(warm_up_service, 'warm_up_antivirus', AsyncMock()), \
+         patch.object(warm_up_service, 'warm_up_authentication', AsyncMock()):
+        await warm_up_service.warm_up()
+
+    assert warm_up_service.is_finished()
+    so = WarmUpStatusReporter.get_status()
+    assert so.observations[0].category == Category.success
+    assert so.details['steps'] == {'client_configs': True, 'audit': False, 'antivirus': True,
+                                   'authentication': True}
+
+
+@pytest.mark.asyncio
+async def test_warm_up_finishes_when_a_step_is_stuck(monkeypatch):
+    monkeypatch.setenv('WARM_UP_STEP_TIMEOUT', '0.05')
+
+    async def stuck():
+        await asyncio.Event().wait()
+
+    with patch.object(warm_up_service, 'warm_up_client_configs', AsyncMock()), \
+         patch.object(warm_up_service, 'warm_up_audit', AsyncMock()), \
+         patch.object(warm_up_service, 'warm_up_antivirus', AsyncMock()), \
+         patch.object(warm_up_service, 'warm_up_authentication', stuck):
+        await asyncio.wait_for(warm_up_service.warm_up(), 5)
+
+    assert warm_up_service.is_finished()
+    assert warm_up_service._step_outcomes['authentication'] is False
+    assert warm_up_service._step_outcomes['antivirus'] is True
+
+
+def test_status_not_complete_before_warm_up():
+    so = WarmUpStatusReporter.get_status()
+
+    assert so.label == 'warm_up'
+    assert so.observations[0].category == Category.failure
+
+
+@pytest.mark.asyncio
+async def test_warm_up_client_configs_creates_s3_services():
+    config = ClientConfig(azure_client_id='test_user', bucket_name='test_bucket', azure_display_name='test')
+    with patch("src.services.warm_up_service.client_config_service.load_all_configs", return_value=[config]), \
+         patch("src.services.warm_up_service.S3Service") as s3_service_mock:
+        await warm_up_service.warm_up_client_configs()
+
+    s3_service_mock.get_s3_client.assert_called_once()
+    s3_service_mock.get_instance.assert_called_once_with(config)
+
+
+@pytest.mark.asyncio
+async def test_warm_up_antivirus_fails_when_no_endpoint_reachable():
+    clam_av = MagicMock(endpoints=[MagicMock()])
+    clam_av.warm_up = AsyncMock(return_value=0)
+    with patch("src.services.warm_up_service.ClamAVService.get_instance", return_value=clam_av):
+        with pytest.raises(ConnectionError):
+            await warm_up_service.warm_up_antivirus()
+
+
+@pytest.mark.asyncio
+async def test_warm_up_authentication_fetches_signing_keys(monkeypatch):
+    monkeypatch.setenv('TENANT_ID', 'tenant')
+    with patch("src.services.warm_up_service.auth.prefetch_signing_keys") as prefetch_mock:
+        await warm_up_service.warm_up_authentication()
+
+    prefetch_mock.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_warm_up_authentication_skipped_without_tenant(monkeypatch):
+    monkeypatch.delenv('TENANT_ID', raising=False)
+    with patch("src.services.warm_up_service.auth.prefetch_signing_keys") as prefetch_mock:
+        await warm_up_service.warm_up_authentication()
+
+    prefetch_mock.assert_not_called()
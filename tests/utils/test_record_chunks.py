@@ -0,0 +1,50 @@
+import csv
+import io
+
+import pytest
+
+from src.utils.record_chunks import last_record_end, read_chunks
+
+
+@pytest.mark.parametrize("data,expected", [
+    (b"", 0),
+    (b"1,2,3", 0),
+    (b"1,2\n3,4", 4),
+    (b"1,2\n3,4\n", 8),
+    # Line end inside a quoted field
+    (b'1,"a\nb"\n3,4', 8),
+    (b'1,"a\nb', 0),
+    (b'1,2\n"a\nb', 4),
+    # Escaped quotes inside a quoted field
+    (b'1,"a""\nb"\n2', 10),
+    (b'1,"a""b"""\n2', 11),
+    # Quotes not at the start of a field are part of the value
+    (b'1,a"b\n2,"c\n', 6),
+    (b'1,a"\nb"\n2', 8),
+    # A quote at the end could close the field or start an escaped quote
+    (b'1,2\n3,"a\n"', 4),
+])
+def test_last_record_end(data, expected):
+    assert last_record_end(data, b",") == expected
+
+
+def test_last_record_end_uses_delimiter():
+    assert last_record_end(b'1;"a\nb', b";") == 0
+    # With a different delimiter the quote is part of the value
+    assert last_record_end(b'1;"a\nb', b",") == 5
+
+
+def test_last_record_end_without_delimiter_splits_at_any_line_end():
+    assert last_record_end(b'<a>"\n</a>\n<b', None) == 10
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 5, 16, 1000])
+def test_read_chunks_gives_whole_records(chunk_size):
+    content = (b'1,"two\nlines",3\n4,"quote "" and\n newline",6\n7,8"9,10\n'
+               b'"a","b\r\n",c\r\n,,\n"end"')
+    chunks = list(read_chunks(io.BytesIO(content), chunk_size, b","))
+
+    assert b"".join(chunks) == content
+    rows_by_chunk = [list(csv.reader(io.StringIO(chunk.decode(), newline=""))) for chunk in chunks]
+    assert [row for rows in rows_by_chunk for row in rows] == list(csv.reader(io.StringIO(content.decode(),
+                                                                                          newline="")))
@@ -8,8 +8,9 @@ from fastapi import UploadFile
 
 from src.models.client_config import ClientConfig
 from src.models.file_validator_spec import FileValidatorSpec, FileCollectionValidatorSpec
-from src.validation.client_configured_validator import get_validator, validate, validate_file, validate_file_collection
-from src.validation.file_validator import InvalidValidatorArgumentsError
+from src.validation.client_configured_validator import (get_validator, get_validator_chain, validate, validate_file,
+                                                        validate_file_collection)
+from src.validation.file_validator import InvalidValidatorArgumentsError, ValidatorNotFoundError
 
 """
 This file was originally called test_file_validator.py and contained tests for
@@ -557,3 +558,74 @@ async def test_validator_misconfigured(
     validator = get_validator(validator)
     with pytest.raises(InvalidValidatorArgumentsError):
         validator.validate(file_object, **validator_kwargs)
+
+
+# Validators compiled for the client config
+
+def test_get_validator_chain_compiles_validators():
+    config = make_config([make_validatorspec("MaxFileSize", size=5)],
+                         [make_file_collection_validatorspec("MaxFileCount", max_count=2)])
+
+    assert [v.name for v in get_validator_chain(config.file_validators)] == ["MaxFileSize"]
+    assert [v.name for v in get_validator_chain(config.file_collection_validators)] == ["MaxFileCount"]
+    assert isinstance(get_validator_chain(config.file_validators), tuple)
+
+
+def test_get_validator_chain_compiles_each_set_of_specs_once():
+    config = make_config([make_validatorspec("MaxFileSize", size=5)])
+    other_config = make_config([make_validatorspec("MaxFileSize", size=5)])
+
+    assert get_validator_chain(config.file_validators) is get_validator_chain(other_config.file_validators)
+
+
+def test_get_validator_chain_follows_changed_validators():
+    config = make_config([make_validatorspec("MaxFileSize", size=5)])
+    get_validator_chain(config.file_validators)
+
+    config.file_validators = [make_validatorspec("AllowedFileExtensions", extensions=["txt"])]
+
+    assert [v.name for v in get_validator_chain(config.file_validators)] == ["AllowedFileExtensions"]
+
+
+@pytest.mark.parametrize("file_validator_specs, file_collection_validator_specs, expected_error", [
+    ([make_validatorspec("NoSuchValidator")], [], ValidatorNotFoundError),
+    # File-collection validator configured as a file validator, and the other way around
+    ([make_validatorspec("MaxFileCount", max_count=2)], [], ValidatorNotFoundError),
+    ([], [make_file_collection_validatorspec("MaxFileSize", size=5)], ValidatorNotFoundError),
+    # Required argument missing
+    ([make_validatorspec("MaxFileSize")], [], InvalidValidatorArgumentsError),
+    ([make_validatorspec("MaxFileSize", file_object="test.txt", size=5)], [], InvalidValidatorArgumentsError),
+    # Argument the validator does not take
+    ([make_validatorspec("MaxFileSize", size=5, max_size=10)], [], InvalidValidatorArgumentsError),
+    ([], [make_file_collection_validatorspec("MaxFileCount", max_count=2, size=5)], InvalidValidatorArgumentsError),
+])
+def test_get_validator_chain_with_misconfigured_validator(
+            file_validator_specs, file_collection_validator_specs, expected_error
+        ):
+    config = make_config(file_validator_specs, file_collection_validator_specs)
+
+    with pytest.raises(expected_error):
+        get_validator_chain(config.file_validators)
+        get_validator_chain(config.file_collection_validators)
+
+
+@pytest.mark.asyncio
+async def test_validate_compiled_chain_does_not_look_up_validators():
+    config = make_config([make_validatorspec("MaxFileSize", size=5),
+                          make_validatorspec("AllowedFileExtensions", extensions=["txt"])])
+    chain = get_validator_chain(config.file_validators)
+
+    with patch("src.validation.client_configured_validator.get_validator_class") as get_validator_class_mock:
+        result = await validate(make_uploadfile(b"123456", name="test.doc"), chain)
+
+    get_validator_class_mock.assert_not_called()
+    assert result == [(413, "File size is too large"), (415, "File extension not allowed")]
+
+
+@pytest.mark.asyncio
+async def test_validate_file_with_compiled_chain():
+    config = make_config([make_validatorspec("MaxFileSize", size=5)])
+
+    assert await validate_file(make_uploadfile(b"12345"), get_validator_chain(config.file_validators)) == (200, "")
+    assert await validate_file(make_uploadfile(b"123456"), get_validator_chain(config.file_validators)) == \
+        (413, [(413, "File size is too large")])
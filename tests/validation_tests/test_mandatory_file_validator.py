@@ -9,7 +9,6 @@ from src.validation.mandatory_file_validator import (
     NoUnacceptableCharactersInFilename,
     get_ordered_validators,
     run_selected_validators,
-    run_mandatory_validators,
     run_virus_check
 )
 from .test_client_configured_validator_validation import make_uploadfile
@@ -197,38 +196,6 @@ async def test_no_virus_found_get_processing_error_when_processing_error(mock_vi
     assert result == (500, 'Virus scan gave non-standard result')
 
 
-@pytest.mark.asyncio
-@pytest.mark.parametrize(
-    "filename, expected_status, expected_detail, assert_msg",
-    [
-        (
-            "safe_filename.txt",
-            200,
-            "",
-            "Should pass all mandatory validators"
-        ),
-        (
-            "bad|name.txt",
-            400,
-            "Filename contains characters that are not allowed",
-            "Should fail NoUnacceptableCharactersInFilename and stop at first failure"
-        ),
-        (
-            "www.&.com",
-            400,
-            "Filename must not contain URLs or web addresses",
-            "Should fail NoUrlInFilename and stop, despite also containing unacceptable characters"
-        ),
-    ]
-)
-@patch("src.validation.mandatory_file_validator.NoVirusFoundInFile.validate", return_value=(200, ""))
-async def test_run_mandatory_validators(mock_av_scan, filename, expected_status, expected_detail, assert_msg):
-    file = make_uploadfile(name=filename, content=b"dummy")
-    status, detail = await run_mandatory_validators(file)
-    assert status == expected_status, assert_msg
-    assert detail == expected_detail, assert_msg
-
-
 @pytest.mark.asyncio
 @patch("src.validation.mandatory_file_validator.virus_check", return_value=(200, ""))
 async def test_run_virus_check_pass(mock_virus_check):
@@ -0,0 +1,74 @@
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from unittest.mock import patch
+
+from src.models.status_report import Category
+from src.validation.scan_stats import ScanStats, SuspiciousContentScanStatusReporter, get_totals, record_scan
+from src.validation.suspicious_content_validator import scan_content
+from src.validation.text_checkers import text_checkers
+
+
+def test_scan_stats_records_checks_and_passed_values():
+    stats = ScanStats(["a_check", "b_check"])
+
+    stats.record_passed(3, 12)
+    stats.record_check("a_check", 5, 0.25)
+
+    assert stats.get_counts() == {"a_check": 4, "b_check": 3}
+    assert stats.get_details() == {
+        "a_check": {"values": 4, "characters": 17, "seconds": 0.25},
+        "b_check": {"values": 3, "characters": 12, "seconds": 0.0},
+        "scans": {"count": 0, "block_seconds": 0.0},
+    }
+
+
+def test_scan_stats_add():
+    stats = ScanStats(["a_check"])
+    stats.record_passed(2, 2)
+    other = ScanStats(["a_check", "b_check"])
+    other.record_passed(1, 4)
+    other.block_seconds = 0.5
+
+    stats.add(other)
+
+    assert stats.get_counts() == {"a_check": 3, "b_check": 1}
+    assert stats.block_seconds == 0.5
+
+
+def test_record_scan_adds_to_totals():
+    stats = ScanStats(["a_check"])
+    stats.record_passed(2, 10)
+
+    with patch("src.validation.scan_stats._totals", ScanStats([])):
+        record_scan(stats)
+        record_scan(stats)
+        totals = get_totals()
+
+    assert totals["a_check"] == {"values": 4, "characters": 20, "seconds": 0.0}
+    assert totals["scans"]["count"] == 2
+
+
+def test_status_reporter_includes_totals():
+    stats = ScanStats(["a_check"])
+    stats.record_passed(1, 1)
+
+    with patch("src.validation.scan_stats._totals", ScanStats([])):
+        record_scan(stats)
+        status = SuspiciousContentScanStatusReporter.get_status()
+
+    assert not status.has_failures()
+    assert status.observations[0].category == Category.success
+    assert status.details["a_check"]["values"] == 1
+
+
+def test_scans_at_the_same_time_keep_their_own_counts():
+    checkers = list(text_checkers.values())
+    contents = [b"1,2\n" * rows for rows in range(100, 120)]
+
+    def scan(content):
+        return scan_content(BytesIO(content), "test.csv", ",", False, checkers).stats.get_counts()
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        counts = list(executor.map(scan, contents))
+
+    assert counts == [{checker.name: len(content) // 2 for checker in checkers} for content in contents]
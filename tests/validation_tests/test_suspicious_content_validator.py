@@ -1,11 +1,19 @@
+import io
+
 import pytest
+from pydantic import ValidationError
 from unittest.mock import patch, MagicMock
-from src.validation.suspicious_content_validator import (check_item,
+from src.validation import suspicious_content_validator
+from src.validation.suspicious_content_validator import (batch_rows,
+                                                         check_item,
                                                          check_row_values,
+                                                         compile_block_pattern,
+                                                         scan_rows,
                                                          ScanForSuspiciousContent,
                                                          get_checkers_from_scan_types)
 
-from src.validation.text_checkers import text_checkers
+from src.validation.scan_stats import ScanStats
+from src.validation.text_checkers import text_checkers, StringCheck
 
 from fastapi import UploadFile
 
@@ -150,10 +158,11 @@ def test_check_row_values_only_detects_issue_associated_with_supplied_checker(ro
     ["1,2,3\n", "4,5,6\n", "7,8,9\n"],
     ["1 , 2, 3\n", "4, five, 6\n", "7, *, <\n"]
     ])
-def test_scan_for_suspicious_content_passes_good_csv_files(file_content):
+@pytest.mark.asyncio
+async def test_scan_for_suspicious_content_passes_good_csv_files(file_content):
     file_object = make_uploadfile(file_content)
     validator = ScanForSuspiciousContent()
-    result = validator.validate(file_object)
+    result = await validator.validate(file_object)
     assert result[0] == 200
     assert result[1].startswith("Scans run:")
 
@@ -163,15 +172,15 @@ def test_scan_for_suspicious_content_passes_good_csv_files(file_content):
                           (";", ["1;2;3", "4;5;6", "7;8;9"]),
                           ("#", ["1#2#3", "4#5#6", "7#8#9"])
                           ])
-def test_scan_for_suspicious_content_works_with_different_csv_delimiters(delimiter, file_content):
-    mock_scan = MagicMock(return_value=(200, ""))
+@pytest.mark.asyncio
+async def test_scan_for_suspicious_content_works_with_different_csv_delimiters(delimiter, file_content):
+    mock_scan = MagicMock(return_value=(200, "", None))
     file_object = make_uploadfile(file_content, "variety.csv")
     validator = ScanForSuspiciousContent()
-    with patch("src.validation.suspicious_content_validator.check_row_values", mock_scan):
-        result = validator.validate(file_object, delimiter=delimiter)
-    # Extract relevant part of mock's args_list into something more convenient
-    # Interested in the values supplied, not the checkers
-    wanted_args_list = [e[0][0] for e in mock_scan.call_args_list]
+    with patch("src.validation.suspicious_content_validator.scan_rows", mock_scan):
+        result = await validator.validate(file_object, delimiter=delimiter)
+    # Interested in the rows supplied, not the checkers
+    wanted_args_list = list(mock_scan.call_args[0][0])
     assert result[0] == 200
     # Checking that the values have been correctly separated
     assert wanted_args_list == [['1', '2', '3'], ['4', '5', '6'], ['7', '8', '9']]
@@ -185,20 +194,22 @@ def test_scan_for_suspicious_content_works_with_different_csv_delimiters(delimit
     (["1, 2, 3\n", "4, 5, 6\n", "7, 8, +9"],
      (400, "Problem in bad.csv row 2 - forbidden initial character found: `+9`"))
     ])
-def test_scan_for_suspicious_content_finds_bad_csv_rows(file_content, expected):
+@pytest.mark.asyncio
+async def test_scan_for_suspicious_content_finds_bad_csv_rows(file_content, expected):
     file_object = make_uploadfile(file_content, "bad.csv")
     validator = ScanForSuspiciousContent()
-    result = validator.validate(file_object)
+    result = await validator.validate(file_object)
     assert result[0] == expected[0]
     assert expected[1] in result[1]
 
 
-def test_scan_for_suspicious_content_passes_good_xml_file():
+@pytest.mark.asyncio
+async def test_scan_for_suspicious_content_passes_good_xml_file():
     file_content = ["<?xml version = '1.0' encoding = 'UTF-8'?>\n",
                     "<matterStart code=SCHEDULE_REF> 1234567890 </matterStart>"]
     file_object = make_uploadfile(file_content, "good.xml")
     validator = ScanForSuspiciousContent()
-    result = validator.validate(file_object, xml_mode=True)
+    result = await validator.validate(file_object, xml_mode=True)
     assert result[0] == 200
     # xml file with two rows, so two scans per check
     assert result[1] == "Scans run: {'sql_injection_check': 2, 'javascript_url_check': 2, 'excel_char_check': 2}"
@@ -207,47 +218,51 @@ def test_scan_for_suspicious_content_passes_good_xml_file():
 # Validator - tests with expected validation failures
 
 
-def test_scan_for_suspicious_content_finds_sql_injection_in_xml_file():
+@pytest.mark.asyncio
+async def test_scan_for_suspicious_content_finds_sql_injection_in_xml_file():
     file_content = ["<?xml version = '1.0' encoding = 'UTF-8'?>\n",
                     "<matterStart code=SCHEDULE_REF>Test' UNION SELECT * FROM users --</matterStart>"]
     file_object = make_uploadfile(file_content, "bad.xml")
     validator = ScanForSuspiciousContent()
-    result = validator.validate(file_object, xml_mode=True)
+    result = await validator.validate(file_object, xml_mode=True)
     expected_message = ("Problem in bad.xml row 1 - possible SQL injection found in: "
                         "`<matterStart code=SCHEDULE_REF>Test' UNION SELECT * FROM users --</matterStart>`")
     assert result[0] == 400
     assert result[1].startswith(expected_message)
 
 
-def test_scan_for_suspicious_content_with_invalid_file_data_gives_expected_error():
+@pytest.mark.asyncio
+async def test_scan_for_suspicious_content_with_invalid_file_data_gives_expected_error():
     "Not actual CSV data that can be checked"
     file_object = make_uploadfile([b"%PDF-1.4\r\n%\xe2\xe3\xcf\xd3\r\n"], "document.pdf", "application/pdf",
                                   to_bytes=False)
     validator = ScanForSuspiciousContent()
-    result = validator.validate(file_object)
+    result = await validator.validate(file_object)
     expected_message = ("Unable to process document.pdf. Is it a valid file?"
                         " Scans run: {'sql_injection_check': 0, 'html_tag_check': 0,"
                         " 'javascript_url_check': 0, 'excel_char_check': 0}")
     assert result == (400, expected_message)
 
 
-def test_scan_for_suspicious_content_returns_expected_error_when_invalid_scan_types_given():
+@pytest.mark.asyncio
+async def test_scan_for_suspicious_content_returns_expected_error_when_invalid_scan_types_given():
     "Result text has no 'Scans run:' counts because execution ends before scans attempted"
     file_object = make_uploadfile(["1,2,3"])
     validator = ScanForSuspiciousContent()
-    result = validator.validate(file_object,
-                                scan_types=["html_tag_check", "hidden_tiger_check", "crouching_dragon_check"])
+    result = await validator.validate(file_object,
+                                      scan_types=["html_tag_check", "hidden_tiger_check", "crouching_dragon_check"])
     assert result == (400, ("Invalid scan_types value(s) supplied: ['hidden_tiger_check', 'crouching_dragon_check']."
                             " Must be from: ['sql_injection_check', 'html_tag_check',"
                             " 'javascript_url_check', 'excel_char_check']."))
 
 
-def test_scan_for_suspicious_content_runs_html_tag_check_in_xml_mode_if_manually_chosen():
+@pytest.mark.asyncio
+async def test_scan_for_suspicious_content_runs_html_tag_check_in_xml_mode_if_manually_chosen():
     file_content = ["<?xml version = '1.0' encoding = 'UTF-8'?>\n",
                     "<matterStart code=SCHEDULE_REF> 1234567890 </matterStart>"]
     file_object = make_uploadfile(file_content, "good.xml")
     validator = ScanForSuspiciousContent()
-    result = validator.validate(file_object, xml_mode=True, scan_types=["html_tag_check"])
+    result = await validator.validate(file_object, xml_mode=True, scan_types=["html_tag_check"])
     expected_message = ("Problem in good.xml row 0 - "
                         "possible HTML tag(s) found in: `<?xml version = '1.0' encoding = 'UTF-8'?>`."
                         " Scans run: {'html_tag_check': 1}")
@@ -257,30 +272,32 @@ def test_scan_for_suspicious_content_runs_html_tag_check_in_xml_mode_if_manually
 # Validator - Checking that expected scans are included for default csv, default xml and for manual choice
 
 
-def test_scan_for_suspicious_content_applies_expected_default_csv_scan_types():
-    mock_scan = MagicMock(return_value=(200, ""))
+@pytest.mark.asyncio
+async def test_scan_for_suspicious_content_applies_expected_default_csv_scan_types():
+    mock_scan = MagicMock(return_value=(200, "", None))
     file_object = make_uploadfile(["1,2,3"])
     validator = ScanForSuspiciousContent()
-    with patch("src.validation.suspicious_content_validator.check_row_values", mock_scan):
-        result = validator.validate(file_object)
+    with patch("src.validation.suspicious_content_validator.scan_rows", mock_scan):
+        result = await validator.validate(file_object)
     # Mock should always return this but checking just in case
     assert result[0] == 200
-    # Extract relevant part of mock's args_list into something more convenient
-    # [0]on end because whole thing is in another list which only has one element
-    checker_instance_list = [e[0][1] for e in mock_scan.call_args_list][0]
+    # Rows are scanned in a single call, with the checkers as second argument
+    mock_scan.assert_called_once()
+    checker_instance_list = mock_scan.call_args[0][1]
     checker_names = [e.name for e in checker_instance_list]
     assert checker_names == ['sql_injection_check', 'html_tag_check', 'javascript_url_check', 'excel_char_check']
 
 
-def test_scan_for_suspicious_content_applies_expected_default_xml_scan_types():
+@pytest.mark.asyncio
+async def test_scan_for_suspicious_content_applies_expected_default_xml_scan_types():
     # 'html_tag_check' should be excluded from xml scan
-    mock_scan = MagicMock(return_value=(200, ""))
+    mock_scan = MagicMock(return_value=(200, "", None))
     file_object = make_uploadfile(["1,2,3"])
     validator = ScanForSuspiciousContent()
-    with patch("src.validation.suspicious_content_validator.check_row_values", mock_scan):
-        result = validator.validate(file_object, xml_mode=True)
+    with patch("src.validation.suspicious_content_validator.scan_rows", mock_scan):
+        result = await validator.validate(file_object, xml_mode=True)
     assert result[0] == 200
-    checker_instance_list = [e[0][1] for e in mock_scan.call_args_list][0]
+    checker_instance_list = mock_scan.call_args[0][1]
     checker_names = [e.name for e in checker_instance_list]
     assert checker_names == ['sql_injection_check', 'javascript_url_check', 'excel_char_check']
 
@@ -298,14 +315,15 @@ def test_scan_for_suspicious_content_applies_expected_default_xml_scan_types():
     (['sql_injection_check', 'html_tag_check', 'javascript_url_check'],
      ['sql_injection_check', 'html_tag_check', 'javascript_url_check'])
     ])
-def test_scan_for_suspicious_content_runs_expected_manually_chosen_scans(scan_types, expected_result):
-    mock_scan = MagicMock(return_value=(200, ""))
+@pytest.mark.asyncio
+async def test_scan_for_suspicious_content_runs_expected_manually_chosen_scans(scan_types, expected_result):
+    mock_scan = MagicMock(return_value=(200, "", None))
     file_object = make_uploadfile(["1,2,3"])
     validator = ScanForSuspiciousContent()
-    with patch("src.validation.suspicious_content_validator.check_row_values", mock_scan):
-        result = validator.validate(file_object, scan_types=scan_types)
+    with patch("src.validation.suspicious_content_validator.scan_rows", mock_scan):
+        result = await validator.validate(file_object, scan_types=scan_types)
     assert result[0] == 200
-    checker_instance_list = [e[0][1] for e in mock_scan.call_args_list][0]
+    checker_instance_list = mock_scan.call_args[0][1]
     checker_names = [e.name for e in checker_instance_list]
     assert checker_names == expected_result
 
@@ -324,20 +342,219 @@ def test_find_invalid_scan_types(scan_types, expected_result):
 
 
 def test_get_checkers_from_scan_types():
-    # Setting execution_count > 0 for all checkers so we can check it's reset to 0 for those chosen
-    for _, checker in text_checkers.items():
-        checker.execution_count = 123
-    returned_checkers = get_checkers_from_scan_types(['sql_injection_check', 'html_tag_check'])
-    checker0 = returned_checkers[0]
-    checker1 = returned_checkers[1]
-    # Chosen checkers returned and have execution_counts set to 0
-    assert len(returned_checkers) == 2
-    assert checker0.name == 'sql_injection_check'
-    assert checker0.execution_count == 0
-    assert checker0 is text_checkers['sql_injection_check']
-    assert checker1.name == 'html_tag_check'
-    assert checker1.execution_count == 0
-    assert checker1 is text_checkers['html_tag_check']
-    # Unchosen checkers retain original execution_count values
-    assert text_checkers["javascript_url_check"].execution_count == 123
-    assert text_checkers["excel_char_check"].execution_count == 123
+    returned_checkers = get_checkers_from_scan_types(['html_tag_check', 'sql_injection_check'])
+    # Chosen checkers returned in the order they are defined in
+    assert returned_checkers == [text_checkers['sql_injection_check'], text_checkers['html_tag_check']]
+    assert returned_checkers[0] is text_checkers['sql_injection_check']
+
+
+def test_checkers_cannot_be_changed():
+    with pytest.raises(ValidationError):
+        text_checkers['html_tag_check'].pattern = ".*"
+
+
+# scan_rows tests
+
+
+def make_stats(checkers):
+    return ScanStats(checker.name for checker in checkers)
+
+
+def scan_rows_one_by_one(rows, checkers, stats):
+    "What scan_rows should give, from checking each row in turn"
+    for ri, row in enumerate(rows):
+        status, message = check_row_values(row, checkers, stats)
+        if status != 200:
+            return status, message, ri
+    return 200, "", None
+
+
+@pytest.mark.parametrize("rows", [
+    [],
+    [[]],
+    [["1", "2", "3"], ["4", "five", "6"]],
+    [["1", "<ha>", "3"], ["4", "5", "6"]],
+    [["1", "2"], [], ["x", " javascript :"]],
+    [["1", "2"], ["3", " -4"]],
+    # Would match if values were not scanned separately
+    [["a <", "b >"], ["SEL", "ECT"], ["java", "script:"], [" ", "=1"]],
+    # Match spanning values hides a match within a value
+    [["<x", "<b>"]],
+    [["<x", "y"], ["1", "2"], ["' OR '1'='1'", "<b>"]],
+    [["café", "naïve"], ["x", "ünïcödé <tag>"]],
+    # Checks ignore case
+    [["1", "2"], ["x", "select * from users"]],
+    [["1", "JaVaScRiPt :alert(1)"]],
+])
+def test_scan_rows_matches_checking_one_by_one(rows):
+    checkers = list(text_checkers.values())
+    expected_stats = make_stats(checkers)
+    expected = scan_rows_one_by_one(rows, checkers, expected_stats)
+
+    stats = make_stats(checkers)
+    assert scan_rows(rows, checkers, stats) == expected
+    assert stats.get_counts() == expected_stats.get_counts()
+    assert {name: c.characters for name, c in stats.checkers.items()} == \
+        {name: c.characters for name, c in expected_stats.checkers.items()}
+
+
+def test_scan_rows_finds_row_in_later_batch():
+    checkers = list(text_checkers.values())
+    rows = [["1", "2"]] * 7 + [["3", "<b>"]] + [["4", "5"]] * 3
+
+    with patch("src.validation.suspicious_content_validator.scan_batch_rows", 3):
+        result = scan_rows(iter(rows), checkers, make_stats(checkers))
+
+    assert result == (400, "possible HTML tag(s) found in: `<b>`", 7)
+
+
+def test_scan_rows_checks_one_by_one_without_block_pattern():
+    checker = StringCheck(checker=lambda pattern, string, **kwargs: pattern in string, pattern="bad",
+                          message="bad value: ", name="bad_check")
+
+    assert compile_block_pattern([checker]) is None
+    assert scan_rows([["good"], ["not bad"]], [checker], make_stats([checker])) == (400, "bad value: `not bad`", 1)
+
+
+def test_compile_block_pattern_names_groups_after_checkers():
+    pattern = compile_block_pattern([text_checkers["html_tag_check"], text_checkers["excel_char_check"]])
+
+    assert pattern.search("\x00x\x00<b>").lastgroup == "html_tag_check"
+    assert pattern.search("\x00x\x00 =1").lastgroup == "excel_char_check"
+
+
+def test_batch_rows_yields_rows_read_before_an_error():
+    def rows():
+        yield ["1"]
+        yield ["2"]
+        raise ValueError("bad row")
+
+    batches = batch_rows(rows(), 5)
+
+    assert next(batches) == [["1"], ["2"]]
+    with pytest.raises(ValueError):
+        next(batches)
+
+
+@pytest.mark.asyncio
+async def test_scan_for_suspicious_content_reports_problem_before_invalid_data():
+    file_object = make_uploadfile([b"1,2\n", b"3,<b>\n", b"\xe2\xe3\n"], "bad.csv", to_bytes=False)
+    result = await ScanForSuspiciousContent().validate(file_object)
+    assert result[1].startswith("Problem in bad.csv row 1 - possible HTML tag(s) found in: `<b>`")
+
+
+# Scanning large files in parallel
+
+
+def make_sized_uploadfile(content: bytes, filename="big.csv") -> UploadFile:
+    return UploadFile(file=io.BytesIO(content), size=len(content), filename=filename,
+                      headers={'content-type': "text/plain"})
+
+
+@pytest.fixture(scope="module")
+def scan_pool():
+    "Shares one scan process pool between the tests, as starting one is slow"
+    with patch("src.validation.suspicious_content_validator._max_workers", 2):
+        yield
+    suspicious_content_validator.shutdown_executor()
+
+
+@pytest.fixture
+def parallel_scan(scan_pool):
+    "Scans every file in parallel, in small chunks"
+    with patch("src.validation.suspicious_content_validator.parallel_scan_threshold", 0), \
+            patch("src.validation.suspicious_content_validator.scan_chunk_size", 64):
+        yield
+
+
+clean_rows = b"".join(b'%d,"some\nvalue",%d\n' % (i, i * 2) for i in range(40))
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("content,xml_mode", [
+    (clean_rows, False),
+    (clean_rows + b"1,2,<b>\n" + clean_rows, False),
+    # The first problem is reported, not one from a chunk that finished first
+    (clean_rows + b"x,=1\n" + clean_rows + b"1,2,<b>\n", False),
+    (clean_rows + b'1,"<b\n>"\n' + clean_rows, False),
+    (clean_rows + b"1,\xe2\xe3\n" + clean_rows, False),
+    (clean_rows + b"<a> select * from users </a>\n" + clean_rows, True),
+])
+async def test_scan_for_suspicious_content_in_parallel_gives_same_result(content, xml_mode, parallel_scan):
+    validator = ScanForSuspiciousContent()
+    with patch("src.validation.suspicious_content_validator.parallel_scan_threshold", len(content) + 1):
+        expected = await validator.validate(make_sized_uploadfile(content), xml_mode=xml_mode)
+
+    assert await validator.validate(make_sized_uploadfile(content), xml_mode=xml_mode) == expected
+
+
+@pytest.mark.asyncio
+async def test_scan_for_suspicious_content_in_parallel_stops_reading_after_failure(parallel_scan):
+    file_object = make_sized_uploadfile(b"1,<b>\n" + clean_rows * 10)
+
+    result = await ScanForSuspiciousContent().validate(file_object)
+
+    assert result[1].startswith("Problem in big.csv row 0")
+    assert file_object.file.tell() < file_object.size
+
+
+# Parsed XML
+
+
+good_xml = (b"<?xml version='1.0' encoding='UTF-8'?>"
+            b"<claims><claim id='1'><matterStart code='SCHEDULE_REF'>1234567890</matterStart></claim></claims>")
+
+
+@pytest.mark.asyncio
+async def test_scan_for_suspicious_content_parsed_xml_passes_good_file_with_all_scan_types():
+    file_object = make_uploadfile([good_xml], "good.xml", to_bytes=False)
+    result = await ScanForSuspiciousContent().validate(file_object, xml_mode=True, parse_xml=True)
+    # Only the three values are scanned, not the markup, so html_tag_check is run too
+    assert result == (200, "Scans run: {'sql_injection_check': 3, 'html_tag_check': 3,"
+                           " 'javascript_url_check': 3, 'excel_char_check': 3}")
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("file_content,expected", [
+    ([b"<claims><claim>Test' UNION SELECT * FROM users --</claim></claims>"],
+     "Problem in bad.xml element /claims/claim - possible SQL injection found in: "
+     "`Test' UNION SELECT * FROM users --`."),
+    ([b"<claims>\n", b"<claim id='1'>ok</claim>\n", b"<claim id='=1+2'>ok</claim>\n", b"</claims>"],
+     "Problem in bad.xml element /claims/claim/@id - forbidden initial character found: `=1+2`."),
+    ([b"<claims><claim>&lt;b&gt;bold&lt;/b&gt;</claim></claims>"],
+     "Problem in bad.xml element /claims/claim - possible HTML tag(s) found in: `<b>bold</b>`."),
+])
+async def test_scan_for_suspicious_content_parsed_xml_reports_element_path(file_content, expected):
+    file_object = make_uploadfile(file_content, "bad.xml", to_bytes=False)
+    result = await ScanForSuspiciousContent().validate(file_object, xml_mode=True, parse_xml=True)
+    assert result[0] == 400
+    assert result[1].startswith(expected)
+
+
+@pytest.mark.asyncio
+async def test_scan_for_suspicious_content_parsed_xml_with_invalid_xml_gives_expected_error():
+    file_object = make_uploadfile([b"<claims><claim>1</claims>"], "bad.xml", to_bytes=False)
+    result = await ScanForSuspiciousContent().validate(file_object, xml_mode=True, parse_xml=True)
+    assert result[0] == 400
+    assert result[1].startswith("Unable to process bad.xml. Is it a valid file?")
+
+
+@pytest.mark.asyncio
+async def test_scan_for_suspicious_content_parse_xml_ignored_without_xml_mode():
+    file_object = make_uploadfile(["1,<b>"], "bad.csv")
+    result = await ScanForSuspiciousContent().validate(file_object, parse_xml=True)
+    assert result[1].startswith("Problem in bad.csv row 0")
+
+
+@pytest.mark.asyncio
+async def test_scan_for_suspicious_content_parsed_xml_large_file_gives_same_result():
+    content = b"<claims>" + b"<claim id='1'>ok</claim>" * 3000 + b"<claim>javascript:1</claim></claims>"
+    validator = ScanForSuspiciousContent()
+    expected = await validator.validate(make_sized_uploadfile(content, "big.xml"), xml_mode=True, parse_xml=True)
+
+    with patch("src.validation.suspicious_content_validator.parallel_scan_threshold", 0), \
+            patch("src.validation.xml_value_reader.xml_block_size", 100):
+        result = await validator.validate(make_sized_uploadfile(content, "big.xml"), xml_mode=True, parse_xml=True)
+
+    assert result == expected
+    assert result[1].startswith("Problem in big.xml element /claims/claim - suspected javascript URL")
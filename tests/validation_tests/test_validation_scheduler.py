@@ -0,0 +1,135 @@
+from unittest.mock import patch
+
+import pytest
+
+from src.validation.client_configured_validator import get_validator_chain
+from src.validation.file_validator import ValidatorCost
+from src.validation.mandatory_file_validator import HaveFile, NoVirusFoundInFile, validator_classes_in_run_order
+from src.validation.validation_scheduler import run_file_validators, schedule_validators
+from .test_client_configured_validator_validation import make_config, make_uploadfile, make_validatorspec
+
+
+def test_mandatory_validators_run_virus_scan_last():
+    assert validator_classes_in_run_order[0] is HaveFile
+    assert validator_classes_in_run_order[-1] is NoVirusFoundInFile
+
+
+def test_schedule_validators_orders_by_cost():
+    config = make_config([make_validatorspec("ScanForSuspiciousContent"),
+                          make_validatorspec("MaxFileSize", size=5),
+                          make_validatorspec("AllowedFileExtensions", extensions=["txt"])])
+
+    scheduled = schedule_validators(get_validator_chain(config.file_validators))
+    costs = [v.cost for v in scheduled]
+    client_names = [v.name for v in scheduled if v in get_validator_chain(config.file_validators)]
+
+    assert costs == sorted(costs)
+    assert scheduled[0] is HaveFile
+    assert scheduled[-1] is NoVirusFoundInFile
+    # Client validators of the same cost keep their configured order
+    assert client_names == ["MaxFileSize", "AllowedFileExtensions", "ScanForSuspiciousContent"]
+
+
+def test_schedule_validators_selects_costs():
+    config = make_config([make_validatorspec("MaxFileSize", size=5)])
+    chain = get_validator_chain(config.file_validators)
+
+    assert schedule_validators(chain, costs=[ValidatorCost.EXTERNAL_SERVICE]) == [NoVirusFoundInFile]
+    assert NoVirusFoundInFile not in schedule_validators(chain, include_virus_check=False)
+
+
+@pytest.mark.asyncio
+@patch("src.validation.mandatory_file_validator.virus_check", return_value=(200, ""))
+async def test_run_file_validators_pass(virus_check_mock):
+    config = make_config([make_validatorspec("MaxFileSize", size=5)])
+    file = make_uploadfile(b"12345", name="test.txt")
+
+    assert await run_file_validators(file, get_validator_chain(config.file_validators), checksum="abc") == (200, "")
+    virus_check_mock.assert_called_once_with(file, "abc")
+
+
+@pytest.mark.asyncio
+@patch("src.validation.mandatory_file_validator.virus_check", return_value=(200, ""))
+async def test_run_file_validators_rejected_file_is_not_scanned(virus_check_mock):
+    config = make_config([make_validatorspec("MaxFileSize", size=5),
+                          make_validatorspec("AllowedFileExtensions", extensions=["txt"])])
+    file = make_uploadfile(b"123456", name="test.doc")
+
+    result = await run_file_validators(file, get_validator_chain(config.file_validators))
+
+    # Both client validators continue on fail, so both are reported
+    assert result == (422, [(413, "File size is too large"), (415, "File extension not allowed")])
+    virus_check_mock.assert_not_called()
+
+
+@pytest.mark.asyncio
+@patch("src.validation.mandatory_file_validator.virus_check", return_value=(200, ""))
+async def test_run_file_validators_stops_on_client_failure_without_continue(virus_check_mock):
+    config = make_config([make_validatorspec("MaxFileSize", size=5),
+                          make_validatorspec("AllowedFileExtensions", extensions=["txt"])])
+    file = make_uploadfile(b"123456", name="test.doc")
+
+    with patch("src.validation.file_validator.MaxFileSize.continue_to_next_validator_on_fail", False):
+        result = await run_file_validators(file, get_validator_chain(config.file_validators))
+
+    assert result == (413, [(413, "File size is too large")])
+    virus_check_mock.assert_not_called()
+
+
+@pytest.mark.asyncio
+@patch("src.validation.mandatory_file_validator.virus_check", return_value=(200, ""))
+async def test_run_file_validators_mandatory_failure_stops_before_client_validators(virus_check_mock):
+    config = make_config([make_validatorspec("AllowedFileExtensions", extensions=["txt"])])
+    file = make_uploadfile(b"12345", name="www.example.doc")
+
+    result = await run_file_validators(file, get_validator_chain(config.file_validators))
+
+    assert result == (400, "Filename must not contain URLs or web addresses")
+    virus_check_mock.assert_not_called()
+
+
+@pytest.mark.asyncio
+@patch("src.validation.mandatory_file_validator.virus_check", return_value=(400, "Virus Found"))
+async def test_run_file_validators_virus_found(virus_check_mock):
+    config = make_config([make_validatorspec("MaxFileSize", size=5)])
+    file = make_uploadfile(b"12345", name="test.txt")
+
+    assert await run_file_validators(file, get_validator_chain(config.file_validators)) == (400, "Virus Found")
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "filename, expected_status, expected_detail, assert_msg",
+    [
+        (
+            "safe_filename.txt",
+            200,
+            "",
+            "Should pass all mandatory validators"
+        ),
+        (
+            "bad|name.txt",
+            400,
+            "Filename contains characters that are not allowed",
+            "Should fail NoUnacceptableCharactersInFilename and stop at first failure"
+        ),
+        (
+            "www.&.com",
+            400,
+            "Filename must not contain URLs or web addresses",
+            "Should fail NoUrlInFilename and stop, despite also containing unacceptable characters"
+        ),
+    ]
+)
+@patch("src.validation.mandatory_file_validator.NoVirusFoundInFile.validate", return_value=(200, ""))
+async def test_run_file_validators_mandatory_validators(mock_av_scan, filename, expected_status, expected_detail,
+                                                        assert_msg):
+    file = make_uploadfile(name=filename, content=b"dummy")
+    status, detail = await run_file_validators(file, ())
+    assert status == expected_status, assert_msg
+    assert detail == expected_detail, assert_msg
+
+
+@pytest.mark.asyncio
+async def test_run_file_validators_missing_file():
+    assert await run_file_validators(None, ()) == (400, "File is required")
@@ -0,0 +1,74 @@
+from io import BytesIO
+from unittest.mock import patch
+from xml.etree import ElementTree
+
+import pytest
+
+from src.validation.xml_value_reader import XmlValueReader, read_blocks
+
+
+def read_values(content: bytes, block_size: int = 7) -> list[tuple[str, str]]:
+    "Returns each value with its path, feeding the parser a few bytes at a time"
+    blocks = [content[i:i + block_size] for i in range(0, len(content), block_size)]
+    reader = XmlValueReader(blocks, paths_kept=1)
+    return [(row[0], reader.get_path(i)) for i, row in enumerate(reader)]
+
+
+def test_reads_text_and_attribute_values_in_document_order():
+    content = (b"<?xml version='1.0' encoding='UTF-8'?>\n"
+               b"<claims source='web'>\n"
+               b"  <claim id='1'>first <b>bold</b> after bold</claim>\n"
+               b"  <claim id='2'><![CDATA[<cdata>]]></claim>\n"
+               b"  trailing text\n"
+               b"</claims>")
+
+    assert read_values(content) == [
+        ("web", "/claims/@source"),
+        ("1", "/claims/claim/@id"),
+        ("first ", "/claims/claim"),
+        ("bold", "/claims/claim/b"),
+        (" after bold", "/claims/claim"),
+        ("2", "/claims/claim/@id"),
+        ("<cdata>", "/claims/claim"),
+        ("\n  trailing text\n", "/claims"),
+    ]
+
+
+def test_reads_entities_as_text():
+    assert read_values(b"<a>&lt;script&gt; &amp;</a>") == [("<script> &", "/a")]
+
+
+def test_reads_namespaced_tags():
+    assert read_values(b"<a xmlns='urn:x'><b>1</b></a>") == [("1", "/{urn:x}a/{urn:x}b")]
+
+
+def test_ended_elements_are_not_kept():
+    "Elements are removed once read, so a long document is held in constant memory"
+    roots = []
+
+    class RecordingParser(ElementTree.XMLPullParser):
+        def read_events(self):
+            for event, element in super().read_events():
+                if not roots:
+                    roots.append(element)
+                yield event, element
+
+    reader = XmlValueReader([b"<a>", *[b"<b>1</b>"] * 1000, b"</a>"], paths_kept=1)
+    with patch("src.validation.xml_value_reader.ElementTree.XMLPullParser", RecordingParser):
+        most_children = max(len(roots[0]) for _ in reader)
+
+    assert reader.rows_read == 1000
+    assert most_children <= 1
+
+
+@pytest.mark.parametrize("content", [b"<a><b></a>", b"<a>", b"not xml", b"<a>1</a><b>2</b>"])
+def test_invalid_xml_raises_parse_error(content):
+    with pytest.raises(ElementTree.ParseError):
+        list(XmlValueReader([content], paths_kept=1))
+
+
+def test_read_blocks_reads_file_in_blocks():
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr("src.validation.xml_value_reader.xml_block_size", 4)
+        assert list(read_blocks(BytesIO(b"<a>12345</a>"))) == [b"<a>1", b"2345", b"</a>"]
+    assert read_blocks([b"<a/>"]) == [b"<a/>"]